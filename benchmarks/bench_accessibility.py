@@ -0,0 +1,113 @@
+# benchmarks/bench_accessibility.py
+"""
+Confronta l'estrattore di accessibilità single-pass con la versione
+precedente (una find() per ogni campo form) su una pagina sintetica grande.
+
+    python -m benchmarks.bench_accessibility [--fields 3000] [--repeat 3]
+"""
+
+import argparse
+import time
+from bs4 import BeautifulSoup
+from wp_analyzer.accessibility import accessibility_extract
+from wp_analyzer.utils import HTML_PARSER
+
+
+def synthetic_page(fields, links, images):
+    """
+    Pagina stile checkout: molti campi form (metà con label), link e immagini.
+    """
+    parts = ['<html><head><title>Checkout</title></head><body>',
+             '<header><nav><a href="#main">Salta al contenuto</a></nav></header>',
+             '<main id="main"><h1>Checkout</h1><form>']
+    for i in range(fields):
+        if i % 2 == 0:
+            parts.append(f'<label for="f{i}">Campo {i}</label>')
+        parts.append(f'<p><input id="f{i}" name="f{i}" type="text"></p>')
+        if i % 50 == 0:
+            parts.append(f'<h2>Sezione {i // 50}</h2><select id="s{i}"><option>1</option></select>')
+    parts.append('</form><aside>')
+    for i in range(links):
+        text = '' if i % 10 == 0 else f'Link {i}'
+        parts.append(f'<a href="/p/{i}/">{text}</a>')
+    for i in range(images):
+        alt = '' if i % 3 == 0 else f' alt="img {i}"'
+        parts.append(f'<img src="/img/{i}.jpg"{alt}>')
+    parts.append('</aside></main><footer>Fine</footer></body></html>')
+    return ''.join(parts)
+
+
+def legacy_extract(soup):
+    """
+    Implementazione precedente: una scansione completa per ogni campo form
+    e per ogni tipo di landmark/heading.
+    """
+    imgs = soup.find_all('img')
+    missing_alt_list = [img.get('src', '') for img in imgs if not img.get('alt')]
+    fields = soup.find_all(['input', 'textarea', 'select'])
+    missing_labels = 0
+    for f in fields:
+        fid = f.get('id')
+        if not (fid and soup.find('label', {'for': fid})):
+            missing_labels += 1
+    empty_links_list = []
+    skip_links = 0
+    for a in soup.find_all('a'):
+        href = a.get('href', '') or ''
+        if href.startswith('#'):
+            skip_links += 1
+        if not a.get_text(strip=True):
+            empty_links_list.append(href)
+    landmarks = sum(len(soup.find_all(tag)) for tag in ['header', 'nav', 'main', 'aside', 'footer'])
+    headings = {f'h{i}': len(soup.find_all(f'h{i}')) for i in range(1, 7)}
+    return {
+        'total_images': len(imgs),
+        'missing_alt': len(missing_alt_list),
+        'missing_labels': missing_labels,
+        'empty_links': len(empty_links_list),
+        'empty_links_list': empty_links_list,
+        'skip_links': skip_links,
+        'landmarks': landmarks,
+        'headings': headings,
+        'missing_alt_list': missing_alt_list
+    }
+
+
+def best_of(func, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--fields', type=int, default=3000)
+    parser.add_argument('--links', type=int, default=3000)
+    parser.add_argument('--images', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    html = synthetic_page(args.fields, args.links, args.images)
+    print(f"pagina: {len(html) / 1024:.0f} KiB, parser: {HTML_PARSER}")
+
+    parse_time, soup = best_of(lambda: BeautifulSoup(html, HTML_PARSER), args.repeat)
+    if HTML_PARSER != 'html.parser':
+        stdlib_time, _ = best_of(lambda: BeautifulSoup(html, 'html.parser'), args.repeat)
+        print(f"parse html.parser: {stdlib_time * 1000:.1f} ms")
+    print(f"parse {HTML_PARSER}: {parse_time * 1000:.1f} ms")
+
+    legacy_time, legacy = best_of(lambda: legacy_extract(soup), args.repeat)
+    single_time, single = best_of(lambda: accessibility_extract(soup), args.repeat)
+    assert legacy == single, 'i due estrattori devono produrre lo stesso risultato'
+
+    print(f"estrazione precedente: {legacy_time * 1000:.1f} ms")
+    print(f"estrazione single-pass: {single_time * 1000:.1f} ms")
+    print(f"speedup: {legacy_time / single_time:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
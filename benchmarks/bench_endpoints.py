@@ -0,0 +1,177 @@
+# benchmarks/bench_endpoints.py
+"""
+Benchmark end-to-end degli endpoint /analyze/* contro un finto WordPress locale.
+Per ogni scala e endpoint misura tempo totale, richieste servite al secondo
+e picco di memoria (RSS) e scrive i risultati in JSON.
+
+    python -m benchmarks.bench_endpoints [--scales 1000,10000,100000]
+        [--endpoints content,seo,accessibility,theme-plugin,broken]
+        [--page-kb 20] [--latency-ms 0] [--output risultati.json]
+
+Ogni misura gira in un processo separato, così il picco di RSS è quello del
+solo endpoint; il finto sito gira nel processo principale. La cache HTTP su
+disco e quella dei link sono disattivate per misurare sempre il lavoro reale.
+Per /analyze/accessibility, che analizza una sola pagina, la scala è il
+numero di blocchi (heading, immagine, form) della pagina.
+"""
+
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import subprocess
+from .fake_wp import FakeWordPress
+
+ENDPOINTS = ('content', 'seo', 'accessibility', 'theme-plugin', 'broken')
+
+
+def peak_rss_mb():
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux riporta KiB, macOS byte
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def request_for(endpoint, base, scale, sizes):
+    """
+    (path, body JSON) della richiesta da misurare.
+    """
+    pages = sizes['pages'] + sizes['posts']
+    page_urls = [f"{base}/p/{i}/" for i in range(1, pages + 1)]
+    if endpoint == 'content':
+        return '/analyze/content', {'url': base}
+    if endpoint == 'seo':
+        return '/analyze/seo', {'url': base}
+    if endpoint == 'accessibility':
+        return '/analyze/accessibility', {'url': f"{base}/p/1/"}
+    if endpoint == 'theme-plugin':
+        return '/analyze/theme-plugin', {'url': base, 'urls': page_urls}
+    if endpoint == 'broken':
+        media = [f"{base}/media/{i}.jpg" for i in range(1, sizes['media'] + 1)]
+        return '/analyze/broken', {
+            'groups': [{'category': 'Pagine', 'items': [{'link': u} for u in page_urls]},
+                       {'category': 'Media Library', 'items': [{'link': u} for u in media]}],
+            'refresh': True
+        }
+    raise ValueError(endpoint)
+
+
+def count_items(endpoint, data):
+    if endpoint == 'content':
+        return sum(len(g['items']) for g in data.get('groups', []))
+    if endpoint == 'seo':
+        return len(data)
+    if endpoint == 'theme-plugin':
+        return len(data.get('plugins', [])) + len(data.get('themes', []))
+    if endpoint == 'broken':
+        return len(data)
+    return data.get('total_images', 0)
+
+
+def run_child(endpoint, path, body):
+    """
+    Eseguito nel processo figlio: chiama l'endpoint tramite il test client
+    di Flask e stampa la misura come JSON.
+    """
+    from wp_analyzer import create_app
+    client = create_app().test_client()
+    start = time.perf_counter()
+    resp = client.post(path, json=body)
+    payload = resp.get_data()
+    wall = time.perf_counter() - start
+    try:
+        items = count_items(endpoint, json.loads(payload))
+    except ValueError:
+        items = None
+    print(json.dumps({
+        'status': resp.status_code,
+        'wall_s': round(wall, 3),
+        'response_bytes': len(payload),
+        'items': items,
+        'peak_rss_mb': peak_rss_mb()
+    }))
+
+
+def measure(site, endpoint, scale, timeout):
+    path, body = request_for(endpoint, site.base, scale, site.sizes)
+    env = dict(os.environ, WP_HTTP_CACHE='0')
+    before = site.requests
+    proc = subprocess.run(
+        [sys.executable, '-m', 'benchmarks.bench_endpoints', '--child', endpoint],
+        input=json.dumps({'path': path, 'body': body}),
+        capture_output=True, text=True, timeout=timeout, env=env
+    )
+    served = site.requests - before
+    if proc.returncode != 0:
+        return {'endpoint': endpoint, 'scale': scale, 'error': proc.stderr.strip()[-2000:]}
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    result.update({
+        'endpoint': endpoint,
+        'scale': scale,
+        'requests': served,
+        'req_per_s': round(served / result['wall_s'], 1) if result['wall_s'] else None
+    })
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--scales', default='1000,10000,100000')
+    parser.add_argument('--endpoints', default=','.join(ENDPOINTS))
+    parser.add_argument('--page-kb', type=int, default=20)
+    parser.add_argument('--latency-ms', type=float, default=0)
+    parser.add_argument('--timeout', type=int, default=3600, help='secondi massimi per misura')
+    parser.add_argument('--output', help='file JSON di output (default stdout)')
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        request = json.loads(sys.stdin.read())
+        run_child(args.child, request['path'], request['body'])
+        return
+
+    endpoints = [e for e in args.endpoints.split(',') if e]
+    unknown = set(endpoints) - set(ENDPOINTS)
+    if unknown:
+        parser.error(f"endpoint sconosciuti: {', '.join(sorted(unknown))}")
+
+    results = []
+    for scale in (int(s) for s in args.scales.split(',') if s):
+        for endpoint in endpoints:
+            page_kb = args.page_kb
+            if endpoint == 'accessibility':
+                # ~350 byte per blocco
+                page_kb = max(args.page_kb, scale * 350 // 1024)
+            with FakeWordPress(scale, page_kb, args.latency_ms) as site:
+                try:
+                    result = measure(site, endpoint, scale, args.timeout)
+                except subprocess.TimeoutExpired:
+                    result = {'endpoint': endpoint, 'scale': scale, 'error': f"timeout dopo {args.timeout}s"}
+            results.append(result)
+            print(f"{endpoint:>14} {scale:>7}: " + (
+                f"{result['wall_s']:.2f}s, {result['req_per_s']} req/s, {result['peak_rss_mb']} MB"
+                if 'error' not in result else f"errore: {result['error'][:200]}"
+            ), file=sys.stderr)
+
+    report = {
+        'meta': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'page_kb': args.page_kb,
+            'latency_ms': args.latency_ms,
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S')
+        },
+        'results': results
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as fh:
+            fh.write(output + '\n')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
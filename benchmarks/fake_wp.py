@@ -0,0 +1,218 @@
+# benchmarks/fake_wp.py
+"""
+Finto sito WordPress locale per i benchmark: collection REST paginate con
+X-WP-TotalPages, pagine HTML generate di dimensione configurabile, media e
+latenza artificiale per richiesta. Gli elementi sono generati al volo a
+partire dall'ID, così anche 100k elementi non occupano memoria.
+
+    python -m benchmarks.fake_wp --items 10000 --page-kb 30 --latency-ms 20
+"""
+
+import json
+import time
+import argparse
+import threading
+from datetime import datetime, timedelta
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+
+# Ripartizione degli elementi tra le collection (il resto sono pagine)
+SHARES = {'posts': 0.6, 'media': 0.2, 'categories': 0.05, 'tags': 0.05}
+THEME = 'benchtheme'
+PLUGINS = ('woocommerce', 'contact-form-7', 'wordpress-seo')
+EPOCH = datetime(2020, 1, 1)
+
+
+def collection_sizes(items):
+    sizes = {name: int(items * share) for name, share in SHARES.items()}
+    sizes['pages'] = items - sum(sizes.values())
+    sizes['users'] = 1
+    return sizes
+
+
+class FakeWordPress:
+    """
+    Server HTTP in un thread. `broken_every` rende 404 una pagina ogni N.
+    """
+
+    def __init__(self, items=1000, page_kb=20, latency_ms=0, broken_every=50, host='127.0.0.1', port=0):
+        self.sizes = collection_sizes(items)
+        self.page_kb = page_kb
+        self.latency = latency_ms / 1000
+        self.broken_every = broken_every
+        self.requests = 0
+        self.bytes_sent = 0
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer((host, port), self._handler())
+        self.server.daemon_threads = True
+        self.base = f"http://{host}:{self.server.server_address[1]}"
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    # --- contenuti generati ---
+
+    def item(self, collection, i):
+        # gli ID delle collection non si sovrappongono: 1..N per le pagine, poi i post, ...
+        offset = 0
+        for name in ('pages', 'posts', 'media'):
+            if name == collection:
+                break
+            offset += self.sizes[name]
+        item_id = offset + i
+        date = (EPOCH + timedelta(hours=item_id * 7)).isoformat()
+        if collection in ('pages', 'posts'):
+            return {
+                'id': item_id, 'date': date, 'modified': date, 'slug': f'item-{item_id}',
+                'status': 'publish', 'type': collection[:-1],
+                'link': f"{self.base}/p/{item_id}/",
+                'title': {'rendered': f"{collection[:-1].title()} {item_id}"}
+            }
+        if collection == 'media':
+            details = {'filesize': 50000 + item_id} if item_id % 2 else {}
+            return {
+                'id': item_id, 'date': date, 'modified': date, 'slug': f'media-{item_id}',
+                'title': {'rendered': f"Media {item_id}"},
+                'source_url': f"{self.base}/media/{item_id}.jpg",
+                'media_details': details
+            }
+        if collection == 'users':
+            return {'id': i, 'name': 'Admin', 'slug': 'admin'}
+        prefix = 'cat' if collection == 'categories' else 'tag'
+        return {'id': i, 'name': f"{prefix} {i}", 'slug': f"{prefix}-{i}"}
+
+    def html_page(self, item_id):
+        links = ''.join(f'<a href="/p/{(item_id + k) % 1000 + 1}/">Link {k}</a>' for k in range(1, 21))
+        head = (
+            f'<!doctype html><html lang="it"><head><title>Pagina {item_id}</title>'
+            f'<meta name="description" content="Descrizione di prova della pagina {item_id} per il benchmark degli analyzer.">'
+            f'<link rel="canonical" href="{self.base}/p/{item_id}/">'
+            f'<meta property="og:title" content="Pagina {item_id}">'
+            f'<link rel="stylesheet" href="/wp-content/themes/{THEME}/style.css?ver=1.2.3">'
+            + ''.join(f'<script src="/wp-content/plugins/{p}/main.js?ver=4.5"></script>' for p in PLUGINS)
+            + '</head><body><header><nav><a href="#main">Salta</a></nav></header><main id="main">'
+            f'<h1>Pagina {item_id}</h1>{links}'
+        )
+        tail = '</main><footer>Fine</footer></body></html>'
+        block = (
+            '<h2>Sezione</h2><p>Lorem ipsum dolor sit amet, consectetur adipiscing elit, sed do '
+            'eiusmod tempor incididunt ut labore et dolore magna aliqua.</p>'
+            '<img src="/media/1.jpg" alt="immagine"><form><label for="q">Cerca</label><input id="q"></form>'
+        )
+        body = []
+        size = len(head) + len(tail)
+        while size < self.page_kb * 1024:
+            body.append(block)
+            size += len(block)
+        return (head + ''.join(body) + tail).encode()
+
+    # --- HTTP ---
+
+    def _handler(self):
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def send(self, status, body=b'', content_type='text/html; charset=UTF-8', headers=None, head=False):
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                for k, v in (headers or {}).items():
+                    self.send_header(k, v)
+                self.end_headers()
+                if not head:
+                    self.wfile.write(body)
+                with site._lock:
+                    site.bytes_sent += 0 if head else len(body)
+
+            def handle_request(self, head=False):
+                with site._lock:
+                    site.requests += 1
+                if site.latency:
+                    time.sleep(site.latency)
+                parts = urlsplit(self.path)
+                path = parts.path
+                if path.startswith('/wp-json/wp/v2/'):
+                    return self.rest(path[len('/wp-json/wp/v2/'):].strip('/'), parse_qs(parts.query), head)
+                if path.startswith('/p/'):
+                    try:
+                        item_id = int(path.strip('/').split('/')[1])
+                    except (IndexError, ValueError):
+                        return self.send(404, b'not found', head=head)
+                    if site.broken_every and item_id % site.broken_every == 0:
+                        return self.send(404, b'not found', head=head)
+                    return self.send(200, site.html_page(item_id), head=head)
+                if path.startswith('/media/'):
+                    return self.send(200, b'\xff\xd8' + b'0' * 2048, 'image/jpeg', head=head)
+                if path == '/robots.txt':
+                    return self.send(200, b'User-agent: *\nDisallow: /wp-admin/\n', 'text/plain', head=head)
+                if path == '/':
+                    return self.send(200, site.html_page(1), head=head)
+                return self.send(404, b'not found', head=head)
+
+            def rest(self, route, query, head):
+                if route == 'types':
+                    types = {t: {'slug': t, 'viewable': True} for t in ('post', 'page', 'attachment')}
+                    types['attachment']['viewable'] = False
+                    return self.send(200, json.dumps(types).encode(), 'application/json', head=head)
+                if route not in site.sizes:
+                    return self.send(404, b'{"code":"rest_no_route"}', 'application/json', head=head)
+                total = site.sizes[route]
+                per_page = min(int(query.get('per_page', ['10'])[0]), 100)
+                page = int(query.get('page', ['1'])[0])
+                pages = max(1, -(-total // per_page))
+                if page > pages:
+                    return self.send(400, b'{"code":"rest_post_invalid_page_number"}', 'application/json', head=head)
+                start = (page - 1) * per_page
+                items = [site.item(route, i) for i in range(start + 1, min(start + per_page, total) + 1)]
+                fields = query.get('_fields', [''])[0]
+                if fields:
+                    # i campi annidati (media_details.filesize) tengono l'intero oggetto
+                    keep = {f.split('.')[0] for f in fields.split(',')}
+                    items = [{k: v for k, v in it.items() if k in keep} for it in items]
+                headers = {'X-WP-Total': str(total), 'X-WP-TotalPages': str(pages)}
+                return self.send(200, json.dumps(items).encode(), 'application/json', headers, head)
+
+            def do_GET(self):
+                self.handle_request()
+
+            def do_HEAD(self):
+                self.handle_request(head=True)
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--items', type=int, default=1000)
+    parser.add_argument('--page-kb', type=int, default=20)
+    parser.add_argument('--latency-ms', type=float, default=0)
+    parser.add_argument('--port', type=int, default=8099)
+    args = parser.parse_args()
+    site = FakeWordPress(args.items, args.page_kb, args.latency_ms, port=args.port)
+    print(f"Finto WordPress su {site.base} ({args.items} elementi)")
+    try:
+        site.server.serve_forever()
+    except KeyboardInterrupt:
+        site.stop()
+
+
+if __name__ == '__main__':
+    main()
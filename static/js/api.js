@@ -25,6 +25,45 @@ export async function fetchContent(body) {
   return safeJson(res);
 }
 
+// Content in streaming (NDJSON): onGroup per ogni categoria appena pronta,
+// restituisce il summary che arriva per ultimo
+export async function fetchContentStream(body, onGroup) {
+  const res = await fetch('/analyze/content', {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json', 'Accept': 'application/x-ndjson' },
+    body: JSON.stringify({ ...body, format: 'ndjson' })
+  });
+  if (!res.ok) throw new Error(`Content Error: ${res.status} ${await res.text()}`);
+  let summary = null;
+  await readNdjson(res, line => {
+    if (line.group) onGroup(line.group);
+    else if (line.summary) summary = line.summary;
+  });
+  return summary;
+}
+
+// Inventario da sitemap / link interni, per i siti senza REST API
+export async function fetchCrawl(body) {
+  const res = await fetch('/analyze/crawl', {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify(body)
+  });
+  if (!res.ok) throw new Error(`Crawl Error: ${res.status} ${await res.text()}`);
+  return safeJson(res);
+}
+
+// Dimensioni dei media mancanti nel payload REST
+export async function fetchMediaSizes(urls) {
+  const res = await fetch('/analyze/content/media-sizes', {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify({ urls })
+  });
+  if (!res.ok) throw new Error(`Media Sizes Error: ${res.status}`);
+  return safeJson(res);
+}
+
 // SEO
 export async function fetchSEO(body) {
   const res = await fetch('/analyze/seo', {
@@ -36,6 +75,36 @@ export async function fetchSEO(body) {
   return safeJson(res);
 }
 
+// SEO in streaming (NDJSON): onItem viene chiamato per ogni pagina analizzata
+export async function fetchSEOStream(body, onItem) {
+  const res = await fetch('/analyze/seo', {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json', 'Accept': 'application/x-ndjson' },
+    body: JSON.stringify({ ...body, format: 'ndjson' })
+  });
+  if (!res.ok) throw new Error(`SEO Error: ${res.status} ${await res.text()}`);
+  await readNdjson(res, onItem);
+}
+
+// Legge una risposta NDJSON riga per riga
+export async function readNdjson(response, onItem) {
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+  for (;;) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    let nl;
+    while ((nl = buffer.indexOf('\n')) >= 0) {
+      const line = buffer.slice(0, nl).trim();
+      buffer = buffer.slice(nl + 1);
+      if (line) onItem(JSON.parse(line));
+    }
+  }
+  if (buffer.trim()) onItem(JSON.parse(buffer));
+}
+
 // Performance base
 export async function fetchPerf(body) {
   const res = await fetch('/analyze/performance', {
@@ -81,11 +150,11 @@ export async function fetchSecurity(body) {
 }
 
 // Broken links
-export async function fetchBroken(groups) {
+export async function fetchBroken(groups, details = false) {
   const res = await fetch('/analyze/broken', {
     method: 'POST',
     headers: { 'Content-Type': 'application/json' },
-    body: JSON.stringify({ groups })
+    body: JSON.stringify({ groups, details })
   });
   if (!res.ok) throw new Error(`Broken Links Error: ${res.status}`);
   return safeJson(res);
@@ -5,7 +5,10 @@ import * as R from './renderers.js';
 
 let currentBody = { url: '', username: '', password: '' };
 let currentGroups = [];
+let currentSummary = {};
 let currentSEO = [];
+let currentBroken = [];
+let currentLinkStatus = {};
 
 /**
  * Inizializza i listener UI: form submit, filtri, export, ecc.
@@ -82,15 +85,38 @@ export async function startAnalysis() {
   document.getElementById('loader').classList.add('d-flex');     // applica il flex container
 
   try {
-    // 1) Content
-    const content = await API.fetchContent(currentBody);
-    currentGroups = content.groups;
-    R.renderSummary(content.summary);
+    // 1) Content (i gruppi arrivano in streaming, una categoria alla volta)
+    currentGroups = [];
+    const summary = await API.fetchContentStream(currentBody, group => {
+      currentGroups.push(group);
+      R.renderAccordion(currentGroups);
+    });
+    // REST API disattivata (o stream interrotto senza riepilogo e senza
+    // contenuti): inventario da sitemap o link interni
+    let contentSummary = summary;
+    if (!currentGroups.some(g => g.items.length) && (!summary || summary.errors?.length)) {
+      const crawl = await API.fetchCrawl(currentBody);
+      currentGroups = crawl.groups;
+      contentSummary = crawl.summary;
+    } else if (!summary) {
+      throw new Error('Content Error: inventario interrotto prima del riepilogo');
+    }
+    currentSummary = contentSummary;
+    R.renderSummary(contentSummary);
     R.renderChart(currentGroups);
     R.renderAccordion(currentGroups);
+    fillMediaSizes(currentGroups);
 
-    // 2) SEO
-    currentSEO = await API.fetchSEO(currentBody);
+    // 2) SEO (i risultati arrivano in streaming, un frame di render alla volta)
+    currentSEO = [];
+    let seoFrame = null;
+    const seoBody = contentSummary.source ? { ...currentBody, groups: currentGroups } : currentBody;
+    await API.fetchSEOStream(seoBody, item => {
+      currentSEO.push(item);
+      if (!seoFrame) {
+        seoFrame = requestAnimationFrame(() => { seoFrame = null; R.renderSEO(currentSEO); });
+      }
+    });
     R.renderSEO(currentSEO);
 
     // 3) Base Performance
@@ -110,8 +136,10 @@ export async function startAnalysis() {
     R.renderSecurity(sec);
 
     // 7) Broken Links
-    const broken = await API.fetchBroken(currentGroups);
-    R.renderBroken(broken);
+    const broken = await API.fetchBroken(currentGroups, true);
+    currentBroken = broken.broken;
+    currentLinkStatus = broken.statuses;
+    R.renderBroken(currentBroken);
 
     // 8) Themes & Plugins
     const tpBody = { ...currentBody, urls: currentGroups.flatMap(g => g.items.map(i => i.link)) };
@@ -133,6 +161,21 @@ export async function startAnalysis() {
   }
 }
 
+/**
+ * Completa in background le dimensioni dei media che il payload REST non riporta.
+ */
+function fillMediaSizes(groups) {
+  const missing = groups.flatMap(g => g.items).filter(i => i.status === 'media' && !i.size);
+  if (!missing.length) return;
+  API.fetchMediaSizes(missing.map(i => i.link))
+    .then(({ sizes }) => {
+      missing.forEach(i => { i.size = sizes[i.link] || ''; });
+      // le dimensioni arrivano dopo il primo render: ridisegna l'elenco
+      R.renderAccordion(currentGroups);
+    })
+    .catch(() => {});
+}
+
 // Esponi funzioni per inline handlers (se necessario)
 export function exportCSV() {
   fetch('/download_csv', {
@@ -182,8 +225,11 @@ export function saveReport() {
     headers: { 'Content-Type': 'application/json' },
     body: JSON.stringify({
       groups: currentGroups,
-      seo: currentSEO
-      // aggiungi performance, access, security, lighthouse, broken...
+      summary: currentSummary,
+      seo: currentSEO,
+      broken: currentBroken,
+      link_status: currentLinkStatus
+      // aggiungi performance, access, security, lighthouse...
     })
   })
   .then(r => r.json())
@@ -200,7 +246,8 @@ export function handleUpload(evt) {
       const rpt = JSON.parse(e.target.result);
       if (rpt.groups) {
         currentGroups = rpt.groups;
-        R.renderSummary(rpt.summary || {});
+        currentSummary = rpt.summary || {};
+        R.renderSummary(currentSummary);
         R.renderChart(currentGroups);
         R.renderAccordion(currentGroups);
         R.renderBroken(rpt.broken || []);
@@ -0,0 +1,25 @@
+// static/js/lighthouse_metrics.mjs
+
+import desktopConfig from 'lighthouse/core/config/desktop-config.js';
+
+// Estrae dal report Lighthouse (lhr) le metriche usate dal frontend
+export function extractMetrics(lhr) {
+  return {
+    FCP: lhr.audits['first-contentful-paint'].numericValue,
+    LCP: lhr.audits['largest-contentful-paint'].numericValue,
+    CLS: lhr.audits['cumulative-layout-shift'].numericValue,
+    TBT: lhr.audits['total-blocking-time'].numericValue,
+    SI: lhr.audits['speed-index'].numericValue,
+    TTI: lhr.audits['interactive'].numericValue,
+    score: lhr.categories.performance.score * 100
+  };
+}
+
+// Flags e config Lighthouse per form factor ('mobile' | 'desktop') e
+// metodo di throttling ('simulate' | 'devtools' | 'provided')
+export function runSettings(port, { formFactor, throttling } = {}) {
+  const flags = { port, output: 'json', logLevel: 'error' };
+  if (throttling) flags.throttlingMethod = throttling;
+  const config = formFactor === 'desktop' ? desktopConfig : undefined;
+  return { flags, config };
+}
@@ -0,0 +1,80 @@
+// static/js/lighthouse_worker.mjs
+
+// Worker Lighthouse persistente: tiene un Chrome headless "caldo" e
+// riceve i job su stdin, una riga JSON per job:
+//   { "id": 1, "url": "https://example.com", "form_factor": "desktop", "throttling": "simulate" }
+// e risponde su stdout con una riga JSON per job:
+//   { "id": 1, "ok": true, "result": { FCP, LCP, ... } }
+//   { "id": 1, "ok": false, "error": "..." }
+// I job vengono eseguiti uno alla volta (Lighthouse non supporta run
+// concorrenti nello stesso processo): la concorrenza si ottiene avviando
+// più worker. Chrome viene riavviato ogni LH_RECYCLE_AFTER run.
+
+import readline from 'node:readline';
+import lighthouse from 'lighthouse';
+import { launch } from 'chrome-launcher';
+import { extractMetrics, runSettings } from './lighthouse_metrics.mjs';
+
+const recycleAfter = parseInt(process.env.LH_RECYCLE_AFTER || '20', 10);
+
+let chrome = null;
+let runs = 0;
+
+async function killChrome() {
+  if (!chrome) return;
+  try {
+    await chrome.kill();
+  } catch (err) {
+    console.error(err);
+  }
+  chrome = null;
+}
+
+async function getChrome() {
+  if (chrome && runs >= recycleAfter) await killChrome();
+  if (!chrome) {
+    chrome = await launch({ chromeFlags: ['--headless'] });
+    runs = 0;
+  }
+  return chrome;
+}
+
+async function runJob(job) {
+  const browser = await getChrome();
+  runs += 1;
+  const { flags, config } = runSettings(browser.port, {
+    formFactor: job.form_factor,
+    throttling: job.throttling
+  });
+  const runnerResult = await lighthouse(job.url, flags, config);
+  return extractMetrics(runnerResult.lhr);
+}
+
+function reply(msg) {
+  process.stdout.write(JSON.stringify(msg) + '\n');
+}
+
+process.on('SIGTERM', async () => {
+  await killChrome();
+  process.exit(0);
+});
+
+const rl = readline.createInterface({ input: process.stdin });
+for await (const line of rl) {
+  if (!line.trim()) continue;
+  let job;
+  try {
+    job = JSON.parse(line);
+  } catch (err) {
+    reply({ id: null, ok: false, error: `Job non valido: ${err.message}` });
+    continue;
+  }
+  try {
+    reply({ id: job.id, ok: true, result: await runJob(job) });
+  } catch (err) {
+    // dopo un errore il browser potrebbe essere in uno stato sporco
+    await killChrome();
+    reply({ id: job.id, ok: false, error: String((err && err.message) || err) });
+  }
+}
+await killChrome();
@@ -6,33 +6,26 @@ import lighthouse from 'lighthouse';
 // 2) Import il named export launch (non default)
 import { launch } from 'chrome-launcher';
 
-async function runLighthouse(url) {
+import { extractMetrics, runSettings } from './lighthouse_metrics.mjs';
+
+async function runLighthouse(url, formFactor, throttling) {
   // 3) usa launch() direttamente
   const chrome = await launch({ chromeFlags: ['--headless'] });
-  const options = { port: chrome.port, output: 'json', logLevel: 'error' };
-  const runnerResult = await lighthouse(url, options);
+  const { flags, config } = runSettings(chrome.port, { formFactor, throttling });
+  const runnerResult = await lighthouse(url, flags, config);
   await chrome.kill();
 
-  const lhr = runnerResult.lhr;
-  return {
-    FCP: lhr.audits['first-contentful-paint'].numericValue,
-    LCP: lhr.audits['largest-contentful-paint'].numericValue,
-    CLS: lhr.audits['cumulative-layout-shift'].numericValue,
-    TBT: lhr.audits['total-blocking-time'].numericValue,
-    SI: lhr.audits['speed-index'].numericValue,
-    TTI: lhr.audits['interactive'].numericValue,
-    score: lhr.categories.performance.score * 100
-  };
+  return extractMetrics(runnerResult.lhr);
 }
 
-const url = process.argv[2];
+const [url, formFactor, throttling] = process.argv.slice(2);
 if (!url) {
-  console.error('Usage: node performance.mjs <url>');
+  console.error('Usage: node performance.mjs <url> [mobile|desktop] [simulate|devtools|provided]');
   process.exit(1);
 }
 
 try {
-  const metrics = await runLighthouse(url);
+  const metrics = await runLighthouse(url, formFactor, throttling);
   console.log(JSON.stringify(metrics));
 } catch (err) {
   console.error(err);
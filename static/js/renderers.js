@@ -46,7 +46,7 @@ export function renderAccordion(groups) {
     const itemsHtml = g.items.map(it => `
       <li class="list-group-item d-flex justify-content-between">
         <a href="${it.link}" target="_blank">${it.title}</a>
-        <span>${it.status}</span>
+        <span>${it.size ? `${Math.round(it.size / 1024)} KB · ` : ''}${it.status}</span>
       </li>`).join('');
     acc.innerHTML += `
       <div class="accordion-item">
@@ -20,15 +20,935 @@ def test_download_csv():
     assert 'Pages,1,Home,http://example.com,publish' in data
 
 
+def test_download_csv_accepts_column_list_or_string():
+    client = app.test_client()
+    groups = [{'category': 'Pages', 'items': [{'id': 1, 'title': 'Home', 'link': 'http://example.com'}]}]
+    for columns in ('link,title', ['link', 'title']):
+        resp = client.post('/download_csv', json={'groups': groups, 'columns': columns})
+        assert resp.get_data(as_text=True).splitlines() == ['link,title', 'http://example.com,Home']
+    for columns in ('link,nope', ['nope'], 5):
+        assert client.post('/download_csv', json={'groups': groups, 'columns': columns}).status_code == 400
+
+
 def test_performance_endpoint():
     client = app.test_client()
     mock_resp = Mock()
     mock_resp.status_code = 200
     mock_resp.elapsed.total_seconds.return_value = 0.1
     mock_resp.headers = {'Content-Length': '123'}
-    with patch('requests.get', return_value=mock_resp):
+    with patch('wp_analyzer.http_client.get', return_value=mock_resp):
         resp = client.post('/analyze/performance', json={'url': 'https://example.com'})
     assert resp.status_code == 200
     data = resp.get_json()
     assert data['status_code'] == 200
     assert data['content_length'] == 123
+
+
+def test_fetch_all_parallel_keeps_page_order():
+    from wp_analyzer.utils import fetch_all
+
+    def fake_get(url, auth=None, params=None, timeout=None):
+        page = params['page']
+        resp = Mock()
+        resp.raise_for_status.return_value = None
+        resp.headers = {'X-WP-TotalPages': '5'}
+        resp.json.return_value = [{'id': page * 10 + i} for i in range(2)]
+        return resp
+
+    with patch('wp_analyzer.http_client.get', side_effect=fake_get):
+        items = fetch_all('https://example.com/wp-json/wp/v2/posts', workers=4)
+    assert [i['id'] for i in items] == [10, 11, 20, 21, 30, 31, 40, 41, 50, 51]
+
+
+def test_fetch_all_projects_fields_and_compacts_items():
+    from wp_analyzer.utils import fetch_all
+    from wp_analyzer.content import post_item, POST_FIELDS
+
+    seen = []
+
+    def fake_get(url, auth=None, params=None, timeout=None):
+        seen.append(params['_fields'])
+        resp = Mock()
+        resp.raise_for_status.return_value = None
+        resp.headers = {'X-WP-TotalPages': '2'}
+        resp.json.return_value = [{'id': params['page'], 'title': {'rendered': 'T'},
+                                   'link': 'https://example.com/', 'status': 'publish'}]
+        return resp
+
+    with patch('wp_analyzer.http_client.get', side_effect=fake_get):
+        items = fetch_all('https://example.com/wp-json/wp/v2/posts', fields=POST_FIELDS, transform=post_item)
+    assert seen == [POST_FIELDS, POST_FIELDS]
+    assert [i.id for i in items] == [1, 2]
+    assert items[0].to_dict() == {'id': 1, 'title': 'T', 'link': 'https://example.com/', 'status': 'publish'}
+
+
+def test_request_workers_are_bounded_by_configuration():
+    from wp_analyzer.utils import bounded
+    assert bounded(10000, 16) == 16
+    assert bounded(None, 16) == 16 and bounded('abc', 16) == 16
+    assert bounded(-5, 16) == 1 and bounded('4', 16) == 4
+
+
+def test_seo_endpoint_streams_ndjson():
+    client = app.test_client()
+    items = [{'id': i, 'title': {'rendered': f'P{i}'}, 'link': f'https://example.com/p{i}/'} for i in range(3)]
+    page = Mock()
+    page.raise_for_status.return_value = None
+    page.text = '<html><head><title>T</title></head><body><h1>H</h1></body></html>'
+
+    def fake_fetch_all(endpoint, auth=None, params=None, fields=None, limiter=None):
+        assert fields == 'id,title,link'
+        return items if endpoint.endswith('/pages') else []
+
+    with patch('wp_analyzer.seo.fetch_all', side_effect=fake_fetch_all), \
+         patch('wp_analyzer.http_client.get', return_value=page):
+        resp = client.post('/analyze/seo', json={'url': 'example.com', 'format': 'ndjson'})
+        lines = resp.get_data(as_text=True).splitlines()
+    assert resp.mimetype == 'application/x-ndjson'
+    records = [json.loads(line) for line in lines]
+    assert sorted(r['id'] for r in records) == [0, 1, 2]
+    assert all(r['title_tag'] == 'T' for r in records)
+
+
+def test_broken_dedupes_and_falls_back_to_get():
+    from wp_analyzer import linkcheck
+    linkcheck._status_cache.clear()
+    client = app.test_client()
+    groups = [
+        {'category': 'Pagine', 'items': [{'link': 'https://example.com/ok'}, {'link': 'https://example.com/gone'}]},
+        {'category': 'Archivi', 'items': [{'link': 'HTTPS://EXAMPLE.COM/ok#top'}, {'link': 'https://example.com/nohead'}]},
+    ]
+    head_status = {'https://example.com/ok': 200, 'https://example.com/gone': 404, 'https://example.com/nohead': 405}
+
+    def fake_head(url, **kwargs):
+        return Mock(status_code=head_status[url])
+
+    with patch('wp_analyzer.http_client.head', side_effect=fake_head) as head, \
+         patch('wp_analyzer.http_client.get', return_value=Mock(status_code=206)) as get:
+        resp = client.post('/analyze/broken', json={'groups': groups})
+    assert resp.get_json() == ['https://example.com/gone']
+    assert head.call_count == 3
+    assert get.call_count == 1
+    assert get.call_args.kwargs['headers'] == {'Range': 'bytes=0-0'}
+
+    # i link non http(s) non vengono richiesti ma risultano broken
+    groups.append({'category': 'Altro', 'items': [{'link': '/relative/'}, {'link': 'mailto:a@example.com'}]})
+    with patch('wp_analyzer.http_client.head', side_effect=fake_head) as head:
+        data = client.post('/analyze/broken', json={'groups': groups, 'details': True}).get_json()
+    assert data['broken'] == ['/relative/', 'https://example.com/gone', 'mailto:a@example.com']
+    assert data['statuses']['/relative/'] == data['statuses']['mailto:a@example.com'] == 'invalid'
+    assert head.call_count == 0
+    linkcheck._status_cache.clear()
+
+
+def test_link_checks_do_not_retry_or_cache_transient_errors():
+    from wp_analyzer import linkcheck
+    linkcheck._status_cache.clear()
+    session = Mock()
+    session.request.side_effect = lambda method, url, **kw: Mock(
+        status_code=503 if url.endswith('/down') else 404
+    )
+    with patch('wp_analyzer.http_client.get_session', return_value=session) as get_session:
+        statuses = linkcheck.check_links(['https://example.com/down', 'https://example.com/gone'])
+    assert statuses == {'https://example.com/down': 503, 'https://example.com/gone': 404}
+    assert {c.args for c in get_session.call_args_list} == {(False,)}
+    assert linkcheck._status_cache.get('https://example.com/down') is None
+    assert linkcheck._status_cache.get('https://example.com/gone') == 404
+    linkcheck._status_cache.clear()
+
+
+def test_media_sizes_from_payload_and_head_pass():
+    from wp_analyzer.content import media_filesize
+    assert media_filesize({'media_details': {'filesize': 2048}}) == '2048'
+    assert media_filesize({'media_details': {'sizes': {'full': {'filesize': 10}}}}) == '10'
+    assert media_filesize({'media_details': {}}) == ''
+
+    client = app.test_client()
+    with patch('wp_analyzer.http_client.head', return_value=Mock(headers={'Content-Length': '99'})):
+        resp = client.post('/analyze/content/media-sizes', json={'urls': ['https://example.com/a.pdf']})
+    assert resp.get_json() == {'sizes': {'https://example.com/a.pdf': '99'}}
+
+
+def test_page_pipeline_fetches_once():
+    client = app.test_client()
+    page = Mock()
+    page.raise_for_status.return_value = None
+    page.text = ('<html><head><title>Home</title>'
+                 '<link rel="stylesheet" href="/wp-content/themes/astra/style.css">'
+                 '<script src="/wp-content/plugins/woocommerce/app.js"></script></head>'
+                 '<body><h1>Hi</h1><img src="a.png"></body></html>')
+    page.content = page.text.encode()
+    with patch('wp_analyzer.http_client.get', return_value=page) as get:
+        resp = client.post('/analyze/page', json={'url': 'https://example.com'})
+    assert get.call_count == 1
+    data = resp.get_json()
+    result = data['pages'][0]
+    assert result['seo']['title_tag'] == 'Home'
+    assert result['accessibility']['missing_alt'] == 1
+    assert data['theme_plugin']['themes'] == ['astra']
+    assert data['theme_plugin']['plugins'] == ['woocommerce']
+
+
+def test_theme_plugin_streams_and_reports_versions():
+    client = app.test_client()
+    page = Mock()
+    page.raise_for_status.return_value = None
+    page.iter_content.return_value = iter([
+        b'<html><head><link href="/wp-content/themes/astra/style.css?ver=4.1.2">',
+        b'<script src="/wp-content/plugins/woocommerce/a.js?ver=8.0"></script></head><body>',
+        b'<script src="/wp-content/plugins/late/x.js"></script>',
+    ])
+    with patch('wp_analyzer.http_client.get', return_value=page):
+        resp = client.post('/analyze/theme-plugin', json={'urls': ['https://example.com/'], 'head_budget': 0})
+    data = resp.get_json()
+    assert data['themes'] == ['astra']
+    assert data['plugins'] == ['woocommerce']
+    assert data['versions']['plugins'] == {'woocommerce': ['8.0']}
+    page.close.assert_called_once()
+
+
+def test_theme_plugin_validates_head_budget():
+    from wp_analyzer.theme_plugin import TP_MAX_HEAD_BUDGET
+    client = app.test_client()
+    assert client.post('/analyze/theme-plugin', json={'urls': [], 'head_budget': 'x'}).status_code == 400
+    with patch('wp_analyzer.theme_plugin.fetch_assets', return_value=None) as fetch:
+        for value, expected in ((10 ** 12, TP_MAX_HEAD_BUDGET), (-50, -1), ('0', 0)):
+            resp = client.post('/analyze/theme-plugin', json={'urls': ['https://example.com/'], 'head_budget': value})
+            assert resp.status_code == 200
+            assert fetch.call_args.args[2] == expected
+
+
+def test_theme_plugin_only_reads_href_and_src_attributes():
+    from wp_analyzer.theme_plugin import AssetScanner
+    scanner = AssetScanner(head_budget=-1)
+    for chunk in (
+        b'<!-- /wp-content/plugins/commented/x.js --><p>see /wp-content/themes/prose/</p>',
+        b'<script>var c = {"u": "https:\\/\\/e.com\\/wp-content\\/plugins\\/inline\\/a.js"};</script>',
+        b'<link rel="stylesheet" HREF="https://e.com/wp-content/themes/astra/style.css?ver=4.1">',
+        b'<img src=/wp-content/plugins/gallery/i.png><script sr',
+        b'c="/wp-content/plugins/split/a.js"></script>',
+        b'<script>var t = {"html": "<link href=\\"https:\\/\\/e.com\\/wp-content\\/plugins\\/escaped\\/a.css?ver=2\\">"};</script>',
+    ):
+        scanner.feed(chunk)
+    found = scanner.close()
+    assert found['themes'] == {'astra': {'4.1'}}
+    assert found['plugins'] == {'gallery': set(), 'split': set(), 'escaped': {'2'}}
+
+
+def test_lighthouse_uses_worker_pool_and_caches_results():
+    from concurrent.futures import Future
+    from wp_analyzer import lighthouse
+    lighthouse._results.clear()
+    client = app.test_client()
+
+    def fake_submit(url, **options):
+        fut = Future()
+        fut.set_result({'url': url, 'score': 90})
+        return fut
+
+    pool = Mock()
+    pool.submit.side_effect = fake_submit
+    with patch('wp_analyzer.lighthouse.get_pool', return_value=pool):
+        resp = client.post('/analyze/lighthouse', json={'url': 'example.com'})
+        assert resp.get_json() == {'url': 'https://example.com', 'score': 90}
+        resp = client.post('/analyze/lighthouse/batch',
+                           json={'urls': ['example.com', 'https://example.com/b/']})
+    data = resp.get_json()
+    assert [r['cached'] for r in data] == [True, False]
+    assert pool.submit.call_count == 2
+    pool.submit.assert_any_call('https://example.com', form_factor='mobile', throttling='simulate')
+
+
+def test_seo_job_reports_progress_and_result():
+    import time
+    client = app.test_client()
+    items = [{'id': i, 'title': {'rendered': f'P{i}'}, 'link': f'https://example.com/p{i}/'} for i in range(4)]
+    with patch('wp_analyzer.jobs.seo_items', return_value=items), \
+         patch('wp_analyzer.seo.seo_analyze_page', side_effect=lambda url, auth=None: {
+             'title_tag': url, 'meta_desc': '', 'headings': {}, 'score': 0,
+             'canonical': '', 'og': {}, 'twitter': {}}):
+        resp = client.post('/jobs', json={'type': 'seo', 'url': 'example.com'})
+        assert resp.status_code == 202
+        job_id = resp.get_json()['id']
+        for _ in range(100):
+            job = client.get(f'/jobs/{job_id}?offset=0').get_json()
+            if job['status'] == 'done':
+                break
+            time.sleep(0.02)
+    assert job['done'] == job['total'] == 4
+    assert len(job['partial']) == 4
+    assert [r['id'] for r in job['result']] == [0, 1, 2, 3]
+    assert client.post('/jobs', json={'type': 'nope'}).status_code == 400
+
+
+def test_incremental_content_inventory_merges_delta():
+    from datetime import datetime
+    from wp_analyzer.content import content_inventory
+    base = 'https://example.com'
+    previous = [
+        {'category': 'Post', 'items': [
+            {'id': 1, 'title': 'Old', 'link': f'{base}/old/', 'status': 'publish'},
+            {'id': 2, 'title': 'Gone', 'link': f'{base}/gone/', 'status': 'publish'},
+        ]},
+        {'category': 'Archivi', 'items': [
+            {'id': '', 'title': 'Archivio Mensile: 2023-01', 'link': f'{base}/2023-01/', 'status': 'archive'},
+        ]},
+    ]
+    calls = []
+
+    def fake_fetch_all(endpoint, auth=None, params=None, fields=None, transform=None, limiter=None, on_page=None):
+        params = params or {}
+        calls.append((endpoint.rsplit('/', 1)[-1], params))
+        if not endpoint.endswith('/posts'):
+            return []
+        if fields == 'id':
+            raw = [{'id': 3}, {'id': 1}]
+        elif 'modified_after' in params:
+            assert 'date' in fields.split(',')
+            raw = [{'id': 3, 'title': {'rendered': 'New'}, 'link': f'{base}/new/',
+                    'status': 'publish', 'date': '2024-05-02T10:00:00'}]
+        else:
+            raise AssertionError(params)
+        return [transform(x) for x in raw] if transform else raw
+
+    types = Mock()
+    types.json.return_value = {}
+    with patch('wp_analyzer.content.fetch_all', side_effect=fake_fetch_all), \
+         patch('wp_analyzer.http_client.get', return_value=types):
+        result = content_inventory(base, previous=previous, since=datetime(2024, 5, 1))
+
+    posts = next(g for g in result['groups'] if g['category'] == 'Post')['items']
+    assert [p['id'] for p in posts] == [3, 1]
+    archives = [a['title'] for a in result['groups'][-1]['items']]
+    assert 'Archivio Mensile: 2023-01' in archives and 'Archivio Mensile: 2024-05' in archives
+    assert result['summary']['incremental']['changed'] == 1
+    assert result['summary']['incremental']['deleted'] == 1
+    assert ('posts', {'status': 'publish', 'modified_after': '2024-04-30T00:00:00',
+                      'orderby': 'modified', 'order': 'desc'}) in calls
+
+
+def test_content_inventory_runs_independent_stages_concurrently():
+    import threading
+    from requests import RequestException
+    from wp_analyzer.content import content_inventory
+    base = 'https://example.com'
+    # pagine, post e media devono essere in volo insieme per superare la barriera
+    barrier = threading.Barrier(3, timeout=5)
+
+    def fake_fetch_all(endpoint, auth=None, params=None, fields=None, transform=None, limiter=None, on_page=None):
+        name = endpoint.rsplit('/', 1)[-1]
+        if name in ('pages', 'posts', 'media'):
+            barrier.wait()
+        if name == 'tags':
+            raise RequestException('boom')
+        if name == 'posts':
+            return [transform({'id': 1, 'title': {'rendered': 'P'}, 'link': f'{base}/p/',
+                               'status': 'publish', 'date': '2024-05-02T10:00:00'})]
+        if name == 'categories':
+            return [{'name': 'News', 'slug': 'news'}]
+        return []
+
+    types = Mock()
+    types.json.return_value = {}
+    with patch('wp_analyzer.content.fetch_all', side_effect=fake_fetch_all), \
+         patch('wp_analyzer.http_client.get', return_value=types):
+        result = content_inventory(base)
+
+    assert [g['category'] for g in result['groups']] == ['Pagine', 'Post', 'Media Library', 'Archivi']
+    archives = [a['title'] for a in result['groups'][-1]['items']]
+    assert archives == ['Categoria: News', 'Archivio Mensile: 2024-05', 'Archivio Annuale: 2024']
+    assert result['summary']['errors'] == ['Archives error: boom']
+
+
+def test_content_inventory_shares_one_request_budget():
+    import time
+    import threading
+    from wp_analyzer.content import content_inventory
+    lock = threading.Lock()
+    state = {'now': 0, 'max': 0}
+
+    def fake_get(url, auth=None, params=None, timeout=None):
+        with lock:
+            state['now'] += 1
+            state['max'] = max(state['max'], state['now'])
+        time.sleep(0.01)
+        with lock:
+            state['now'] -= 1
+        resp = Mock()
+        resp.raise_for_status.return_value = None
+        resp.headers = {'X-WP-TotalPages': '4'}
+        resp.json.return_value = {} if url.endswith('/types') else [
+            {'id': params['page'], 'title': {'rendered': 'T'}, 'link': f"{url}/{params['page']}/",
+             'status': 'publish', 'source_url': 'x', 'name': 'n', 'slug': str(params['page'])}
+        ]
+        return resp
+
+    with patch('wp_analyzer.http_cache.get', side_effect=fake_get), \
+         patch('wp_analyzer.http_client.get', side_effect=fake_get):
+        result = content_inventory('https://example.com', limiter=threading.BoundedSemaphore(3))
+    assert result['summary']['pages'] == 4 and result['summary']['errors'] == []
+    assert 1 < state['max'] <= 3
+
+
+def test_incremental_since_is_when_the_snapshot_analysis_started():
+    from datetime import datetime
+    from wp_analyzer.content import snapshot_options
+    saved = datetime(2024, 5, 3, 18, 0)
+    report = {'groups': [], 'summary': {'started': '2024-05-03T09:30:00'}}
+    with patch('wp_analyzer.content.latest_snapshot', return_value=(saved, report)):
+        assert snapshot_options('https://example.com')['since'] == datetime(2024, 5, 3, 9, 30)
+    with patch('wp_analyzer.content.latest_snapshot', return_value=(saved, {'groups': []})):
+        assert snapshot_options('https://example.com')['since'] == saved
+
+
+def test_content_job_reports_page_progress_and_partial_groups():
+    import time
+    import threading
+    from wp_analyzer.jobs import JobManager, Job, run_content
+
+    def fake_get(url, auth=None, params=None, timeout=None):
+        resp = Mock()
+        resp.raise_for_status.return_value = None
+        resp.headers = {'X-WP-TotalPages': '3'}
+        resp.json.return_value = {} if url.endswith('/types') else [
+            {'id': params['page'], 'title': {'rendered': 'T'}, 'link': f"{url}/{params['page']}/",
+             'status': 'publish', 'source_url': 'x', 'name': 'n', 'slug': str(params['page'])}
+        ]
+        return resp
+
+    job = Job('content')
+    seen = []
+    progress = job.progress
+    job.progress = lambda done, total=None: (seen.append((done, total)), progress(done, total))
+    with patch('wp_analyzer.http_cache.get', side_effect=fake_get), \
+         patch('wp_analyzer.http_client.get', side_effect=fake_get):
+        result = run_content(job, 'https://example.com', None, {})
+    # 6 collection da 3 pagine più la richiesta dei tipi
+    assert (job.done, job.total) == (19, 19)
+    assert [d for d, _ in seen] == list(range(1, 20))
+    assert sorted(g['category'] for g in job.partial) == sorted(g['category'] for g in result['groups'])
+
+    # un job annullato mentre è in coda risulta subito 'cancelled'
+    manager = JobManager(workers=1)
+    gate = threading.Event()
+    manager.submit('content', lambda job: gate.wait(5))
+    queued = manager.submit('content', lambda job: 'never')
+    assert manager.cancel(queued.id).status == 'cancelled'
+    gate.set()
+
+    # un annullamento arrivato dopo l'ultimo punto di controllo vince sul risultato
+    late = manager.submit('content', lambda job: manager.cancel(job.id) and 'ignored')
+    for _ in range(100):
+        if late.finished:
+            break
+        time.sleep(0.02)
+    assert late.to_dict()['status'] == 'cancelled'
+    assert 'result' not in late.to_dict()
+
+
+def test_cancelled_content_job_stops_requesting_pages():
+    import time
+    import threading
+    client = app.test_client()
+    calls = []
+    reached, deleted = threading.Event(), threading.Event()
+
+    def fake_get(url, auth=None, params=None, timeout=None):
+        calls.append(url)
+        if len(calls) >= 3:
+            reached.set()
+            deleted.wait(5)
+        resp = Mock()
+        resp.raise_for_status.return_value = None
+        resp.headers = {'X-WP-TotalPages': '200'}
+        resp.json.return_value = {} if url.endswith('/types') else [
+            {'id': 1, 'title': {'rendered': 'T'}, 'link': 'https://example.com/x/', 'status': 'publish',
+             'source_url': 'x', 'name': 'n', 'slug': 's'}
+        ]
+        return resp
+
+    with patch('wp_analyzer.http_cache.get', side_effect=fake_get), \
+         patch('wp_analyzer.http_client.get', side_effect=fake_get):
+        job_id = client.post('/jobs', json={'type': 'content', 'url': 'example.com'}).get_json()['id']
+        assert reached.wait(5)
+        assert client.delete(f'/jobs/{job_id}').get_json()['cancelled'] is True
+        before = len(calls)
+        deleted.set()
+        for _ in range(250):
+            job = client.get(f'/jobs/{job_id}').get_json()
+            if job['finished']:
+                break
+            time.sleep(0.02)
+    assert job['status'] == 'cancelled'
+    # 6 collection da 200 pagine: dopo l'annullamento partono al più le
+    # pagine già nella finestra di ogni collection, non le altre ~1200
+    assert len(calls) - before < 150
+
+
+def test_response_cache_serves_304_from_disk(tmp_path):
+    import requests
+    from wp_analyzer.http_cache import ResponseCache
+    cache = ResponseCache(str(tmp_path), max_bytes=1024 * 1024)
+
+    def response(status, headers, body=b''):
+        r = requests.Response()
+        r.status_code = status
+        r.headers.update(headers)
+        r._content = body
+        r.url = 'https://example.com/'
+        return r
+
+    first = response(200, {'ETag': '"v1"', 'Content-Type': 'text/html; charset=utf-8'}, b'<p>ciao</p>')
+    with patch('wp_analyzer.http_client.get', return_value=first) as get:
+        assert cache.get('https://example.com/').text == '<p>ciao</p>'
+    assert 'headers' not in get.call_args.kwargs
+
+    with patch('wp_analyzer.http_client.get', return_value=response(304, {})) as get:
+        again = cache.get('https://example.com/')
+    assert get.call_args.kwargs['headers'] == {'If-None-Match': '"v1"'}
+    assert again.status_code == 200
+    assert again.text == '<p>ciao</p>'
+
+
+def test_report_store_lists_streams_and_queries_history(tmp_path):
+    import gzip
+    from wp_analyzer import reports
+    from wp_analyzer.report_store import ReportStore
+    store = ReportStore(str(tmp_path / 'reports.sqlite'))
+    client = app.test_client()
+    url = 'https://example.com/a/'
+    with patch.object(reports, '_store', store):
+        first = client.post('/reports/example.com', json={
+            'groups': [{'category': 'Pagine', 'items': [{'id': 1, 'link': url}]}],
+            'link_status': {url: 200}}).get_json()['filename']
+        second = client.post('/reports/example.com', json={
+            'groups': [{'category': 'Pagine', 'items': [{'id': 1, 'link': url}]}],
+            'broken': [url], 'link_status': {url: 404}}).get_json()['filename']
+
+        listing = client.get('/reports/example.com?limit=1')
+        assert listing.headers['X-Total-Count'] == '2'
+        assert [r['filename'] for r in listing.get_json()] == [second]
+
+        hit = client.get(f'/reports/example.com/urls?url={url}&status=404&first=1').get_json()
+        assert hit['filename'] == second and hit['broken'] is True
+
+        raw = client.get(f'/reports/example.com/{first}', headers={'Accept-Encoding': 'gzip'})
+        assert raw.headers['Content-Encoding'] == 'gzip'
+        assert json.loads(gzip.decompress(raw.data))['link_status'] == {url: 200}
+        plain = client.get(f'/reports/example.com/{first}')
+        assert json.loads(plain.data)['groups'][0]['items'][0]['link'] == url
+
+        assert client.delete(f'/reports/example.com/{first}').get_json() == {'deleted': True}
+        assert len(client.get('/reports/example.com').get_json()) == 1
+
+
+def test_download_csv_from_saved_report(tmp_path):
+    import gzip
+    from wp_analyzer import reports
+    from wp_analyzer.report_store import ReportStore
+    store = ReportStore(str(tmp_path / 'reports.sqlite'))
+    groups = [{'category': 'Pages', 'items': [
+        {'id': i, 'title': f'P{i}', 'link': f'http://example.com/{i}', 'status': 'publish'}
+        for i in range(1200)
+    ]}]
+    meta = store.save('example.com', {'groups': groups})
+    client = app.test_client()
+    with patch.object(reports, '_store', store):
+        url = f"/download_csv/example.com/{meta['filename']}"
+        resp = client.get(url + '?columns=id,link&gzip=1', headers={'Accept-Encoding': 'gzip'})
+        assert client.get(url + '?columns=nope').status_code == 400
+    assert resp.headers['Content-Encoding'] == 'gzip'
+    lines = gzip.decompress(resp.data).decode().splitlines()
+    assert lines[0] == 'id,link'
+    assert lines[1] == '0,http://example.com/0'
+    assert len(lines) == 1201
+
+
+def test_content_endpoint_streams_groups_then_summary():
+    from requests import RequestException
+
+    def fake_fetch_all(endpoint, auth=None, params=None, fields=None, transform=None, limiter=None, on_page=None):
+        if endpoint.endswith('/pages'):
+            raw = [{'id': 1, 'title': {'rendered': 'Home'}, 'link': 'https://example.com/',
+                    'status': 'publish'}]
+            return [transform(x) for x in raw]
+        if endpoint.endswith('/book'):
+            raise RequestException('boom')
+        return []
+
+    types = Mock()
+    types.json.return_value = {'book': {'viewable': True}, 'post': {'viewable': True}}
+    client = app.test_client()
+    with patch('wp_analyzer.content.fetch_all', side_effect=fake_fetch_all), \
+         patch('wp_analyzer.http_client.get', return_value=types):
+        resp = client.post('/analyze/content', json={'url': 'example.com', 'format': 'ndjson'})
+        lines = [json.loads(l) for l in resp.data.decode().splitlines()]
+
+    assert resp.mimetype == 'application/x-ndjson'
+    categories = [l['group']['category'] for l in lines[:-1]]
+    assert sorted(categories) == ['Archivi', 'CPT - book', 'Media Library', 'Pagine', 'Post']
+    pages = next(l['group'] for l in lines if l.get('group', {}).get('category') == 'Pagine')
+    assert pages['items'][0]['title'] == 'Home'
+    summary = lines[-1]['summary']
+    assert summary['pages'] == 1 and summary['cpts'] == {'book': 0}
+    assert summary['errors'] == ['CPT book error']
+
+
+def test_content_stream_does_not_wait_for_a_slow_early_stage():
+    import threading
+    from wp_analyzer.content import iter_inventory
+    release = threading.Event()
+
+    def fake_fetch_all(endpoint, auth=None, params=None, fields=None, transform=None, limiter=None, on_page=None):
+        if endpoint.endswith('/pages'):
+            # le pagine restano in sospeso finché il consumatore non ha ricevuto altri gruppi
+            assert release.wait(5)
+        return []
+
+    types = Mock()
+    types.json.return_value = {}
+    received = []
+    with patch('wp_analyzer.content.fetch_all', side_effect=fake_fetch_all), \
+         patch('wp_analyzer.http_client.get', return_value=types):
+        for kind, value in iter_inventory('https://example.com'):
+            if kind == 'group':
+                received.append(value['category'])
+                if len(received) == 3:
+                    release.set()
+    assert received.index('Pagine') == 3
+    assert set(received) == {'Pagine', 'Post', 'Media Library', 'Archivi'}
+
+
+def test_crawl_inventory_from_sitemap_index():
+    base = 'https://example.com'
+    files = {
+        f'{base}/robots.txt': f'User-agent: *\nSitemap: {base}/sitemap_index.xml\n',
+        f'{base}/sitemap_index.xml': f'''<?xml version="1.0"?>
+            <sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+              <sitemap><loc>{base}/post-sitemap.xml</loc></sitemap>
+              <sitemap><loc>{base}/page-sitemap.xml</loc></sitemap>
+              <sitemap><loc>{base}/product-sitemap.xml</loc></sitemap>
+            </sitemapindex>''',
+        f'{base}/post-sitemap.xml': f'''<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+              <url><loc>{base}/hello/</loc></url><url><loc>HTTPS://Example.com:443/hello/#x</loc></url>
+              <url><loc>https://other.com/x/</loc></url></urlset>''',
+        f'{base}/page-sitemap.xml': f'''<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+              <url><loc>{base}/</loc></url><url><loc>{base}/about/</loc></url></urlset>''',
+    }
+
+    def fake_get(url, **kwargs):
+        resp = Mock(headers={}, url=url)
+        if url in files:
+            resp.status_code = 200
+            resp.text = files[url]
+            resp.content = files[url].encode()
+            resp.raise_for_status.return_value = None
+        else:
+            from requests import HTTPError
+            resp.status_code = 404
+            resp.raise_for_status.side_effect = HTTPError('404', response=resp)
+        return resp
+
+    client = app.test_client()
+    with patch('wp_analyzer.http_client.get', side_effect=fake_get):
+        data = client.post('/analyze/crawl', json={'url': 'example.com'}).get_json()
+
+    groups = {g['category']: [i['link'] for i in g['items']] for g in data['groups']}
+    assert groups['Post'] == [f'{base}/hello/']
+    assert sorted(groups['Pagine']) == [f'{base}/', f'{base}/about/']
+    assert data['summary']['source'] == 'sitemap'
+    assert data['summary']['sitemaps'] == 3 and data['summary']['pages'] == 2
+    assert any('product-sitemap.xml' in e for e in data['summary']['errors'])
+
+
+def test_crawl_bounds_max_pages():
+    from wp_analyzer.crawler import CRAWL_MAX_PAGES
+    client = app.test_client()
+    with patch('wp_analyzer.crawler.crawl_inventory', return_value={'groups': [], 'summary': {}}) as crawl:
+        for value, expected in (('abc', CRAWL_MAX_PAGES), (10 ** 9, CRAWL_MAX_PAGES), (1, 1)):
+            assert client.post('/analyze/crawl', json={'url': 'example.com', 'max_pages': value}).status_code == 200
+            assert crawl.call_args.kwargs['max_pages'] == expected
+
+
+def test_performance_profile_reports_phase_percentiles():
+    import threading
+    import http.server
+    import socketserver
+
+    from urllib.parse import urlsplit
+    from wp_analyzer.latency import host_header
+    hosts = set()
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            hosts.add(self.headers['Host'])
+            body = b'x' * 100000
+            self.send_response(200)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = socketserver.ThreadingTCPServer(('127.0.0.1', 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        url = f'http://127.0.0.1:{server.server_address[1]}/'
+        resp = app.test_client().post('/analyze/performance', json={
+            'url': url, 'samples': 5, 'concurrency': 2, 'follow': False
+        })
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    data = resp.get_json()
+    assert data['errors'] == 0 and data['status_codes'] == {'200': 5}
+    assert data['cold']['bytes'] == 100000 and data['cold']['tls'] == 0
+    assert set(data['phases']) == {'dns', 'connect', 'tls', 'ttfb', 'transfer', 'total'}
+    ttfb = data['phases']['ttfb']
+    assert ttfb['min'] <= ttfb['p50'] <= ttfb['p90'] <= ttfb['p99'] <= ttfb['max']
+    assert len(data['runs']) == 5
+    assert hosts == {f'127.0.0.1:{server.server_address[1]}'}
+    assert host_header(urlsplit('https://example.com:443/x')) == 'example.com'
+    assert host_header(urlsplit('https://[::1]:8443/')) == '[::1]:8443'
+
+
+def test_security_batch_isolates_errors_and_reuses_cert_cache():
+    import threading
+    import http.server
+    import socketserver
+    from wp_analyzer import security
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def do_HEAD(self):
+            self.send_response(200)
+            self.send_header('Strict-Transport-Security', 'max-age=31536000; includeSubDomains')
+            self.send_header('Set-Cookie', 'a=1; Expires=Wed, 21 Oct 2037 07:28:00 GMT; HttpOnly')
+            self.send_header('Set-Cookie', 'b=2; Secure; HttpOnly')
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = socketserver.ThreadingTCPServer(('127.0.0.1', 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    local = f'http://127.0.0.1:{server.server_address[1]}'
+    client = app.test_client()
+    try:
+        results = client.post('/analyze/security/batch', json={
+            'domains': [local, 'http://127.0.0.1:1', local]
+        }).get_json()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert [r['domain'] for r in results] == [local, 'http://127.0.0.1:1']
+    assert results[0]['hsts_max_age'] == '31536000'
+    assert results[0]['http_only'] == 2 and results[0]['cookie_secure']
+    assert results[0]['tls_days'] is None
+    assert 'error' in results[1]
+
+    cert = {'not_after': '2099-01-01T00:00:00', 'issuer': 'CA', 'subject': 'example.com', 'version': 'TLSv1.3'}
+    security._certs.set('example.com', cert)
+    head = Mock(headers={'Server': 'nginx'}, raw=None)
+    with patch('wp_analyzer.http_client.head', return_value=head), \
+         patch('wp_analyzer.security.probe') as probe:
+        data = client.post('/analyze/security', json={'url': 'example.com'}).get_json()
+    probe.assert_not_called()
+    assert data['server_header'] == 'nginx' and data['tls_issuer'] == 'CA'
+    assert data['tls_days'] > 0
+    security._certs.clear()
+
+
+def test_security_batch_isolates_unexpected_errors():
+    def fake_scan(url, auth=None):
+        if 'bad' in url:
+            raise KeyError('notAfter')
+        return {'hsts': False}
+
+    with patch('wp_analyzer.security.scan_security', side_effect=fake_scan):
+        results = app.test_client().post('/analyze/security/batch', json={
+            'domains': ['bad.example', 'good.example']
+        }).get_json()
+    assert results[0] == {'domain': 'bad.example', 'error': "'notAfter'"}
+    assert results[1] == {'hsts': False, 'domain': 'good.example'}
+
+    # voci non stringa: 400 invece di un 500 sull'intero batch
+    for domains in (['good.example', {'x': 1}], ['a.example', None], 'good.example'):
+        resp = app.test_client().post('/analyze/security/batch', json={'domains': domains})
+        assert resp.status_code == 400
+
+
+def test_fleet_runs_sites_and_saves_reports(tmp_path):
+    import time
+    from wp_analyzer import reports
+    from wp_analyzer.report_store import ReportStore
+    store = ReportStore(str(tmp_path / 'reports.sqlite'))
+
+    def fake_scan(url):
+        if 'down' in url:
+            raise OSError('connection refused')
+        return {'hsts': True}
+
+    client = app.test_client()
+    with patch.object(reports, '_store', store), \
+         patch('wp_analyzer.fleet.scan_security', side_effect=fake_scan), \
+         patch('wp_analyzer.fleet.fetch_assets',
+               return_value={'themes': {'astra': {'4.0'}}, 'plugins': {}}):
+        resp = client.post('/fleet', json={
+            'sites': ['a.example.com', 'b.example.com', 'down.example.com'],
+            'analyses': ['security', 'theme_plugin'],
+            'workers': 2
+        })
+        assert resp.status_code == 202
+        job_id = resp.get_json()['id']
+        for _ in range(200):
+            data = client.get(f'/fleet/{job_id}?offset=0').get_json()
+            if data['status'] in ('done', 'error'):
+                break
+            time.sleep(0.01)
+
+    assert data['status'] == 'done'
+    stats = data['stats']
+    assert stats['sites_done'] == 3 and stats['sites_saved'] == 3
+    assert stats['analyses_done'] == 6 and stats['analyses_failed'] == 1
+    down = next(s for s in data['sites'] if s['domain'] == 'down.example.com')
+    assert 'connection refused' in down['errors']['security']
+    saved = store.load('a.example.com', store.list('a.example.com')[0][0]['filename'])
+    assert saved['security'] == {'hsts': True} and saved['themes'] == ['astra']
+    assert client.post('/fleet', json={'sites': ['x.com'], 'analyses': ['nope']}).status_code == 400
+
+
+def test_fleet_requeues_sites_on_busy_hosts():
+    import time
+    import threading
+    from wp_analyzer.fleet import run_fleet
+    from wp_analyzer.jobs import Job
+    started = []
+    active = {}
+    overlap = []
+    lock = threading.Lock()
+
+    def fake_scan(url):
+        host = url.split('/')[2]
+        with lock:
+            started.append(url)
+            active[host] = active.get(host, 0) + 1
+            overlap.append(active[host])
+        time.sleep(0.05)
+        with lock:
+            active[host] -= 1
+        return {'hsts': True}
+
+    job = Job('fleet', params={'sites': 3})
+    store = Mock()
+    store.save.return_value = {'filename': 'r.json', 'id': 1}
+    with patch('wp_analyzer.fleet.scan_security', side_effect=fake_scan), \
+         patch('wp_analyzer.fleet.get_store', return_value=store):
+        stats = run_fleet(job, ['https://a.example', 'https://a.example/blog', 'https://b.example'],
+                          ['security'], workers=2)
+    assert started == ['https://a.example', 'https://b.example', 'https://a.example/blog']
+    assert max(overlap) == 1
+    assert stats['sites_saved'] == 3
+
+
+def test_fetch_assets_times_network_and_scanning_separately():
+    from wp_analyzer import metrics
+    from wp_analyzer.theme_plugin import fetch_assets
+    resp = Mock(status_code=200, headers={})
+    resp.iter_content.return_value = iter([
+        b'<html><head><link rel="stylesheet" href="/wp-content/themes/astra/style.css?ver=4.1">',
+        b'</head><body>x</body></html>'
+    ])
+    timings = {}
+    token = metrics._request_timings.set(timings)
+    try:
+        with patch('wp_analyzer.http_client.get', return_value=resp), \
+             patch('wp_analyzer.http_cache.get_cache', return_value=None):
+            found = fetch_assets('https://example.com/')
+    finally:
+        metrics._request_timings.reset(token)
+    assert found['themes'] == {'astra': {'4.1'}}
+    assert set(timings) == {'fetch', 'extract'}
+    assert timings['fetch'][1] == 1 and timings['extract'][1] == 1
+
+
+def test_server_timing_and_prometheus_metrics():
+    from wp_analyzer import metrics
+    metrics.reset()
+    page = Mock(status_code=200, text='<html><head><title>Hi</title></head><h1>x</h1></html>', headers={})
+    client = app.test_client()
+    with patch('wp_analyzer.http_client.get_session') as session:
+        session.return_value.request.return_value = page
+        resp = client.post('/analyze/accessibility', json={'url': 'example.com'})
+
+    timing = resp.headers['Server-Timing']
+    for stage in ('fetch', 'http', 'parse', 'extract', 'serialize', 'total'):
+        assert f'{stage};dur=' in timing
+    assert 'Server-Timing' not in client.get('/metrics').headers
+
+    text = client.get('/metrics').get_data(as_text=True)
+    assert 'wp_http_request_seconds_count{host="example.com",method="GET"} 1' in text
+    assert 'wp_http_requests_total{host="example.com",status="200"} 1' in text
+    assert 'wp_stage_seconds_bucket{stage="parse",le="+Inf"} 1' in text
+    assert 'wp_endpoint_seconds_count{endpoint="/analyze/accessibility"} 1' in text
+
+    # risposte in streaming: niente Server-Timing, durata misurata a fine stream
+    import time
+    items = [{'id': 1, 'title': {'rendered': 'P'}, 'link': 'https://example.com/p/'}]
+
+    def slow_page(url, auth=None):
+        time.sleep(0.1)
+        return {'title_tag': 'T', 'meta_desc': '', 'headings': {}, 'score': 0,
+                'canonical': '', 'og': {}, 'twitter': {}}
+
+    with patch('wp_analyzer.seo.seo_items', return_value=items), \
+         patch('wp_analyzer.seo.seo_analyze_page', side_effect=slow_page):
+        resp = client.post('/analyze/seo', json={'url': 'example.com', 'format': 'ndjson'})
+        assert 'Server-Timing' not in resp.headers
+        assert json.loads(resp.get_data(as_text=True))['title_tag'] == 'T'
+        resp.close()
+    text = client.get('/metrics').get_data(as_text=True)
+    total = next(l for l in text.splitlines() if l.startswith('wp_endpoint_seconds_sum{endpoint="/analyze/seo"}'))
+    assert float(total.split()[-1]) >= 0.1
+
+
+def test_cli_runs_only_requested_analyses_and_writes_ndjson(tmp_path):
+    import sys
+    import subprocess
+    from wp_analyzer.__main__ import main
+    sites = tmp_path / 'sites.txt'
+    sites.write_text('a.example\n# commento\n\nhttps://b.example/\na.example\n')
+    out = tmp_path / 'out.ndjson'
+
+    def fake_scan(url, auth=None):
+        if 'b.example' in url:
+            raise OSError('refused')
+        return {'hsts': True}
+
+    with patch('wp_analyzer.security.scan_security', side_effect=fake_scan):
+        rc = main(['run', '-a', 'security', '-w', '2', str(sites), '-o', str(out)])
+
+    lines = sorted((json.loads(l) for l in out.read_text().splitlines()), key=lambda r: r['url'])
+    assert rc == 1
+    assert [r['url'] for r in lines] == ['https://a.example', 'https://b.example']
+    assert lines[0]['security'] == {'hsts': True} and lines[0]['errors'] == {}
+    assert lines[1]['errors'] == {'security': 'refused'}
+
+    # importare la CLI non carica nessun analyzer, eseguirla solo quelli richiesti
+    code = "import sys, wp_analyzer.__main__; print(sorted(m for m in sys.modules if m.startswith('wp_analyzer.')))"
+    loaded = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True).stdout
+    assert loaded.strip() == "['wp_analyzer.__main__']"
+    down = tmp_path / 'down.txt'
+    down.write_text('http://127.0.0.1:1\n')
+    code = ("import sys; from wp_analyzer.__main__ import main; "
+            f"main(['run', '-a', 'security,theme_plugin', {str(down)!r}, '-o', {str(out)!r}]); "
+            "print(sorted(m for m in sys.modules if m.startswith('wp_analyzer.')))")
+    loaded = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True).stdout
+    assert 'wp_analyzer.security' in loaded and 'wp_analyzer.theme_plugin' in loaded
+    for unused in ('content', 'seo', 'lighthouse', 'jobs', 'fleet', 'reports'):
+        assert f"'wp_analyzer.{unused}'" not in loaded
+    assert set(json.loads(out.read_text())['errors']) == {'security', 'theme_plugin'}
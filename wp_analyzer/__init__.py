@@ -1,10 +1,13 @@
 # wp_analyzer/__init__.py
 
 import os
-from flask import Flask, render_template
-from flask_cors import CORS
 
 def create_app():
+    # Flask si importa qui e nei moduli delle route: importare il package
+    # (ad es. per la CLI) non lo carica finché non serve
+    from flask import Flask, render_template
+    from flask_cors import CORS
+
     # Crea la Flask app, specificando dove cercare i template e gli static
     app = Flask(
         __name__,
@@ -23,8 +26,17 @@ def create_app():
     from .theme_plugin    import bp as tp_bp;             app.register_blueprint(tp_bp,             url_prefix='/analyze/theme-plugin')
     from .users           import bp as users_bp;          app.register_blueprint(users_bp,          url_prefix='/analyze/users')
     from .broken          import bp as broken_bp;         app.register_blueprint(broken_bp,         url_prefix='/analyze/broken')
+    from .crawler         import bp as crawler_bp;        app.register_blueprint(crawler_bp,        url_prefix='/analyze/crawl')
+    from .pipeline        import bp as pipeline_bp;       app.register_blueprint(pipeline_bp,       url_prefix='/analyze/page')
+    from .jobs            import bp as jobs_bp;           app.register_blueprint(jobs_bp,           url_prefix='/jobs')
+    from .fleet           import bp as fleet_bp;          app.register_blueprint(fleet_bp,          url_prefix='/fleet')
     from .reports         import bp as reports_bp;        app.register_blueprint(reports_bp,        url_prefix='/reports')
     from .export_csv      import bp as export_csv_bp;     app.register_blueprint(export_csv_bp)
+    from .metrics         import bp as metrics_bp;        app.register_blueprint(metrics_bp)
+
+    # metriche: tempi per fase, Server-Timing su /analyze/*, /metrics per Prometheus
+    from .metrics import instrument
+    instrument(app)
 
     @app.route('/')
     def index():
@@ -33,6 +45,4 @@ def create_app():
 
     return app
 
-# Se lanci con `python -m wp_analyzer`
-if __name__ == '__main__':
-    create_app().run(debug=True)
+# `python -m wp_analyzer serve` avvia l'app, `run` le analisi da riga di comando (vedi __main__.py)
@@ -0,0 +1,214 @@
+# wp_analyzer/__main__.py
+"""
+Esecuzione delle analisi da riga di comando, senza passare da Flask:
+
+    python -m wp_analyzer run [-a content,seo,...] [-o risultati.ndjson]
+        [--workers 8] [--processes] [-u utente -p password] [FILE|-]
+    python -m wp_analyzer serve [--host 127.0.0.1] [--port 5000]
+
+`run` legge un sito o URL per riga da FILE (o da stdin con '-' o senza
+argomento; righe vuote e commenti '#' ignorati), analizza i siti su un pool
+di thread (o di processi con --processes) e scrive una riga NDJSON per sito
+appena conclusa: { url, <analisi>: risultato, ..., errors, seconds }.
+Vengono importati solo i moduli delle analisi richieste, così l'avvio resta
+rapido. Il codice di uscita è 1 se almeno un'analisi è fallita.
+"""
+
+import sys
+import json
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+
+def run_content(url, auth, result):
+    from .content import content_inventory
+    return content_inventory(url, auth)
+
+
+def run_seo(url, auth, result):
+    from .seo import seo_items, iter_seo
+    items = seo_items(url, auth)
+    records = [None] * len(items)
+    for idx, rec in iter_seo(items, auth):
+        records[idx] = rec
+    return records
+
+
+def run_broken(url, auth, result):
+    from .linkcheck import check_groups, is_broken
+    groups = (result.get('content') or {}).get('groups')
+    if groups is None:
+        from .content import content_inventory
+        groups = content_inventory(url, auth)['groups']
+    links, statuses = check_groups(groups)
+    return {
+        'broken': sorted(link for link, norm in links.items() if is_broken(statuses[norm])),
+        'link_status': {link: statuses[norm] for link, norm in links.items()}
+    }
+
+
+def run_security(url, auth, result):
+    from .security import scan_security
+    return scan_security(url, auth)
+
+
+def run_theme_plugin(url, auth, result):
+    from .theme_plugin import fetch_assets, assets_result
+    return assets_result(fetch_assets(url, auth))
+
+
+def run_accessibility(url, auth, result):
+    from . import http_cache
+    from .utils import parse_html
+    from .accessibility import accessibility_extract
+    resp = http_cache.get(url, auth=auth, timeout=10)
+    resp.raise_for_status()
+    return accessibility_extract(parse_html(resp.text))
+
+
+def run_performance(url, auth, result, samples=5):
+    from .latency import profile
+    return profile(url, (auth.username, auth.password) if auth else None, samples=samples)
+
+
+# Analisi disponibili, nell'ordine in cui vengono eseguite per ogni sito
+# (broken riusa l'inventario di content, se richiesto)
+ANALYSES = {
+    'content': run_content,
+    'seo': run_seo,
+    'broken': run_broken,
+    'security': run_security,
+    'theme_plugin': run_theme_plugin,
+    'accessibility': run_accessibility,
+    'performance': run_performance
+}
+
+
+def site_url(line):
+    url = line.strip().rstrip('/')
+    if not url.startswith(('http://', 'https://')):
+        url = 'https://' + url
+    return url
+
+
+def read_sites(fh):
+    """
+    URL normalizzati e senza duplicati, nell'ordine del file.
+    """
+    lines = (line.split('#', 1)[0].strip() for line in fh)
+    return list(dict.fromkeys(site_url(line) for line in lines if line))
+
+
+def analyze_site(url, analyses, credentials=None):
+    """
+    Esegue le analisi di un sito in sequenza; l'errore di un'analisi non
+    interrompe le successive. Funzione di modulo, così può girare anche in
+    un processo separato.
+    """
+    auth = None
+    if credentials:
+        from requests.auth import HTTPBasicAuth
+        auth = HTTPBasicAuth(*credentials)
+    started = time.time()
+    result = {'url': url}
+    errors = {}
+    for name in analyses:
+        try:
+            result[name] = ANALYSES[name](url, auth, result)
+        except Exception as e:
+            errors[name] = str(e) or e.__class__.__name__
+    result['errors'] = errors
+    result['seconds'] = round(time.time() - started, 2)
+    return result
+
+
+def iter_results(executor, sites, analyses, credentials, workers):
+    """
+    Risultati dei siti in ordine di completamento, con al più 2 * workers
+    siti in volo.
+    """
+    it = iter(sites)
+    pending = set()
+    for url in it:
+        pending.add(executor.submit(analyze_site, url, analyses, credentials))
+        if len(pending) >= workers * 2:
+            break
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for fut in done:
+            yield fut.result()
+            url = next(it, None)
+            if url is not None:
+                pending.add(executor.submit(analyze_site, url, analyses, credentials))
+
+
+def run(args):
+    analyses = [a for a in args.analyses.split(',') if a]
+    unknown = [a for a in analyses if a not in ANALYSES]
+    if unknown or not analyses:
+        print(f"Analisi non supportate: {', '.join(unknown) or '-'} "
+              f"(disponibili: {', '.join(ANALYSES)})", file=sys.stderr)
+        return 2
+    analyses = [a for a in ANALYSES if a in analyses]
+
+    if args.input in (None, '-'):
+        sites = read_sites(sys.stdin)
+    else:
+        with open(args.input, encoding='utf-8') as fh:
+            sites = read_sites(fh)
+    credentials = (args.username, args.password or '') if args.username else None
+
+    out = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+    if args.processes:
+        from concurrent.futures import ProcessPoolExecutor as pool
+    else:
+        pool = ThreadPoolExecutor
+    workers = max(1, args.workers)
+    failed = 0
+    try:
+        with pool(max_workers=workers) as executor:
+            for result in iter_results(executor, sites, analyses, credentials, workers):
+                failed += bool(result['errors'])
+                out.write(json.dumps(result, ensure_ascii=False) + '\n')
+                out.flush()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    print(f"{len(sites)} siti analizzati, {failed} con errori", file=sys.stderr)
+    return 1 if failed else 0
+
+
+def serve(args):
+    from . import create_app
+    create_app().run(host=args.host, port=args.port, debug=args.debug)
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m wp_analyzer', description=__doc__.strip().splitlines()[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help='analizza una lista di siti e scrive NDJSON')
+    run_parser.add_argument('input', nargs='?', help="file con un sito per riga ('-' o assente = stdin)")
+    run_parser.add_argument('-a', '--analyses', default='content',
+                            help=f"analisi separate da virgola: {', '.join(ANALYSES)}")
+    run_parser.add_argument('-o', '--output', help='file NDJSON di output (default stdout)')
+    run_parser.add_argument('-w', '--workers', type=int, default=4, help='siti analizzati contemporaneamente')
+    run_parser.add_argument('--processes', action='store_true', help='usa un pool di processi invece che di thread')
+    run_parser.add_argument('-u', '--username')
+    run_parser.add_argument('-p', '--password')
+    run_parser.set_defaults(func=run)
+
+    serve_parser = commands.add_parser('serve', help="avvia l'interfaccia web")
+    serve_parser.add_argument('--host', default='127.0.0.1')
+    serve_parser.add_argument('--port', type=int, default=5000)
+    serve_parser.add_argument('--debug', action='store_true')
+    serve_parser.set_defaults(func=serve)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,12 +1,72 @@
 # wp_analyzer/accessibility.py
 
-import requests
-from flask import Blueprint, request, jsonify
 from requests.auth import HTTPBasicAuth
-from bs4 import BeautifulSoup
+from flask import Blueprint, request, jsonify
+from .utils import parse_html
+from . import http_cache, metrics
 
 bp = Blueprint('accessibility', __name__)
 
+LANDMARKS = frozenset(('header', 'nav', 'main', 'aside', 'footer'))
+FORM_FIELDS = frozenset(('input', 'textarea', 'select'))
+HEADINGS = tuple(f'h{i}' for i in range(1, 7))
+
+@metrics.timed('extract')
+def accessibility_extract(soup):
+    """
+    Calcola le metriche di accessibilità su un documento già parsato,
+    visitando l'albero una sola volta: le label vengono indicizzate per
+    attributo `for` e confrontate con i campi form alla fine.
+    """
+    total_images = 0
+    missing_alt_list = []
+    field_ids = []
+    label_for = set()
+    empty_links_list = []
+    skip_links = 0
+    landmarks = 0
+    headings = dict.fromkeys(HEADINGS, 0)
+
+    for tag in soup.find_all(True):
+        name = tag.name
+        if name == 'img':
+            # Immagini senza alt
+            total_images += 1
+            if not tag.get('alt'):
+                missing_alt_list.append(tag.get('src', ''))
+        elif name in FORM_FIELDS:
+            field_ids.append(tag.get('id'))
+        elif name == 'label':
+            fid = tag.get('for')
+            if fid:
+                label_for.add(fid)
+        elif name == 'a':
+            # Link vuoti e skip-link
+            href = tag.get('href', '') or ''
+            if href.startswith('#'):
+                skip_links += 1
+            if not tag.get_text(strip=True):
+                empty_links_list.append(href)
+        elif name in LANDMARKS:
+            landmarks += 1
+        elif name in headings:
+            headings[name] += 1
+
+    # Campi form senza label
+    missing_labels = sum(1 for fid in field_ids if not (fid and fid in label_for))
+
+    return {
+        'total_images': total_images,
+        'missing_alt': len(missing_alt_list),
+        'missing_labels': missing_labels,
+        'empty_links': len(empty_links_list),
+        'empty_links_list': empty_links_list,
+        'skip_links': skip_links,
+        'landmarks': landmarks,
+        'headings': headings,
+        'missing_alt_list': missing_alt_list
+    }
+
 @bp.route('', methods=['POST'])
 def analyze_accessibility():
     """
@@ -27,51 +87,9 @@ def analyze_accessibility():
         auth = HTTPBasicAuth(data['username'], data.get('password', ''))
 
     try:
-        resp = requests.get(url, auth=auth, timeout=10)
+        with metrics.timer('fetch'):
+            resp = http_cache.get(url, auth=auth, timeout=10)
         resp.raise_for_status()
-        soup = BeautifulSoup(resp.text, 'html.parser')
-
-        # Immagini senza alt
-        imgs = soup.find_all('img')
-        missing_alt_list = [img.get('src', '') for img in imgs if not img.get('alt')]
-        missing_alt = len(missing_alt_list)
-
-        # Campi form senza label
-        fields = soup.find_all(['input', 'textarea', 'select'])
-        missing_labels = 0
-        for f in fields:
-            fid = f.get('id')
-            if not (fid and soup.find('label', {'for': fid})):
-                missing_labels += 1
-
-        # Link vuoti e skip-link
-        links = soup.find_all('a')
-        empty_links = 0
-        empty_links_list = []
-        skip_links = 0
-        for a in links:
-            href = a.get('href', '') or ''
-            text = a.get_text(strip=True)
-            if href.startswith('#'):
-                skip_links += 1
-            if not text:
-                empty_links += 1
-                empty_links_list.append(href)
-
-        # Landmark e headings
-        landmarks = sum(len(soup.find_all(tag)) for tag in ['header', 'nav', 'main', 'aside', 'footer'])
-        headings = {f'h{i}': len(soup.find_all(f'h{i}')) for i in range(1, 7)}
-
-        return jsonify({
-            'total_images': len(imgs),
-            'missing_alt': missing_alt,
-            'missing_labels': missing_labels,
-            'empty_links': empty_links,
-            'empty_links_list': empty_links_list,
-            'skip_links': skip_links,
-            'landmarks': landmarks,
-            'headings': headings,
-            'missing_alt_list': missing_alt_list
-        })
+        return jsonify(accessibility_extract(parse_html(resp.text)))
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -1,7 +1,8 @@
 # wp_analyzer/broken.py
 
-import requests
 from flask import Blueprint, request, jsonify
+from .linkcheck import check_groups, is_broken, LINK_WORKERS, LINK_PER_HOST
+from .utils import bounded
 
 bp = Blueprint('broken', __name__)
 
@@ -9,22 +10,27 @@ bp = Blueprint('broken', __name__)
 def analyze_broken():
     """
     Verifica broken links:
-    Riceve JSON { groups: [ { category, items: [ { link } ] } ] }
-    Restituisce lista di URL con status >= 400 o errori di connessione.
+    Riceve JSON { groups: [ { category, items: [ { link } ] } ], workers?, per_host?, refresh?, details? }
+    Restituisce lista di URL con status >= 400 o errori di connessione
+    (con details=true: { broken, statuses: { link: status } }, status 0 = errore di rete,
+    'invalid' = link non http(s), non verificato).
+    I link duplicati vengono verificati una sola volta e gli status recenti
+    sono riusati dalla cache (refresh=true per ignorarla).
     """
     data = request.json or {}
     groups = data.get('groups', [])
-    broken = set()
 
-    for g in groups:
-        for it in g.get('items', []):
-            url = it.get('link')
-            try:
-                # usa HEAD per minimizzare payload
-                resp = requests.head(url, timeout=5)
-                if resp.status_code >= 400:
-                    broken.add(url)
-            except Exception:
-                broken.add(url)
+    links, statuses = check_groups(
+        groups,
+        workers=bounded(data.get('workers'), LINK_WORKERS),
+        per_host=bounded(data.get('per_host'), LINK_PER_HOST),
+        use_cache=not data.get('refresh')
+    )
+    broken = {link for link, norm in links.items() if is_broken(statuses[norm])}
 
+    if data.get('details'):
+        return jsonify({
+            'broken': sorted(broken),
+            'statuses': {link: statuses[norm] for link, norm in links.items()}
+        })
     return jsonify(sorted(broken))
@@ -1,139 +1,397 @@
 # wp_analyzer/content.py
 
 import os
-import requests
-from flask import Blueprint, request, jsonify
+import json
+import threading
+from collections import namedtuple
+from datetime import datetime, timedelta
+from urllib.parse import urlsplit
 from requests.auth import HTTPBasicAuth
 from requests.exceptions import RequestException
-from .utils import fetch_all
+from flask import Blueprint, request, jsonify, Response, stream_with_context
+from .utils import fetch_all, imap_unordered, run_stages, bounded
+from .reports import latest_snapshot
+from . import http_client
 
 
 bp = Blueprint('content', __name__)
 
-@bp.route('', methods=['POST'])
-def analyze_content():
-    d = request.json or {}
-    base = d.get('url', '').rstrip('/')
-    if not base.startswith(('http://', 'https://')):
-        base = 'https://' + base
-    auth = HTTPBasicAuth(d.get('username'), d.get('password')) if d.get('username') else None
+# Richieste HEAD parallele per le dimensioni dei media non presenti nel payload
+MEDIA_SIZE_WORKERS = int(os.environ.get('WP_MEDIA_SIZE_WORKERS', '16'))
+MEDIA_SIZE_PER_HOST = int(os.environ.get('WP_MEDIA_SIZE_PER_HOST', '8'))
 
-    pages = []
-    posts = []
-    cpts = {}
-    media_items = []
-    archives_list = []
-    errors = []
+def media_filesize(m):
+    """
+    Dimensione in byte di un media letta dal payload REST
+    (media_details.filesize o la dimensione 'full'), '' se assente.
+    """
+    details = m.get('media_details') or {}
+    size = details.get('filesize')
+    if not size:
+        size = ((details.get('sizes') or {}).get('full') or {}).get('filesize')
+    return str(size) if size else ''
 
-    # Pagine e Post
+def head_size(url):
+    """
+    Content-Length di un URL tramite HEAD, '' in caso di errore.
+    """
     try:
-        pages = fetch_all(f"{base}/wp-json/wp/v2/pages", auth)
-        posts = fetch_all(f"{base}/wp-json/wp/v2/posts", auth, params={'status':'publish'})
-    except RequestException as e:
-        errors.append(f"Pages/Posts error: {e}")
+        head = http_client.head(url, timeout=5, allow_redirects=True)
+        return head.headers.get('Content-Length', '')
+    except RequestException:
+        return ''
 
-    # Custom Post Types
-    try:
-        # types endpoint ritorna un dict, non una lista
-        types_resp = requests.get(f"{base}/wp-json/wp/v2/types", auth=auth, timeout=10)
-        types_resp.raise_for_status()
-        types_raw = types_resp.json()   # dict
-        public_cpts = [
+@bp.route('/media-sizes', methods=['POST'])
+def media_sizes():
+    """
+    Passaggio opzionale dopo l'inventario: riceve JSON { urls: [...] }
+    e restituisce { sizes: { url: Content-Length } } con HEAD in parallelo.
+    """
+    data = request.json or {}
+    urls = sorted({u for u in data.get('urls', []) if u})
+    limiter = http_client.HostLimiter(bounded(data.get('per_host'), MEDIA_SIZE_PER_HOST))
+
+    def work(url):
+        with limiter.hold(url):
+            return url, head_size(url)
+
+    workers = bounded(data.get('workers'), MEDIA_SIZE_WORKERS)
+    return jsonify({'sizes': dict(imap_unordered(work, urls, workers))})
+
+# Fasi di content_inventory (e ordine dei loro errori nel summary)
+CONTENT_STAGES = ('pages', 'posts', 'types', 'cpts', 'media', 'categories', 'tags', 'users', 'archives')
+# Richieste REST contemporanee di un inventario (budget unico per fasi e pagine)
+CONTENT_WORKERS = int(os.environ.get('WP_CONTENT_WORKERS', '8'))
+# Fasi che producono gruppi dell'inventario
+GROUP_STAGES = ('pages', 'posts', 'cpts', 'media', 'archives')
+
+# Margine sottratto alla data dello snapshot precedente: copre il fuso
+# orario del sito (modified_after usa l'ora locale di WordPress)
+DELTA_MARGIN = timedelta(days=1)
+
+# Campi richiesti alla REST API (_fields) per ogni collection
+POST_FIELDS = 'id,title,link,status,date,slug'
+MEDIA_FIELDS = 'id,title,source_url,media_details.filesize,media_details.sizes.full.filesize'
+TERM_FIELDS = 'name,slug'
+
+class InventoryItem(namedtuple('InventoryItem', 'id title link status size date', defaults=(None, None))):
+    """
+    Record compatto di un elemento dell'inventario (una tupla, senza dict per
+    istanza). `size` c'è solo per i media; `date` serve solo agli archivi e
+    non viene esportata. Diventa un dict con to_dict() quando il gruppo
+    viene restituito.
+    """
+    __slots__ = ()
+
+    def to_dict(self):
+        item = {'id': self.id, 'title': self.title, 'link': self.link, 'status': self.status}
+        if self.size is not None:
+            item['size'] = self.size
+        return item
+
+    @classmethod
+    def from_dict(cls, item):
+        return cls(item.get('id', ''), item.get('title', ''), item.get('link', ''),
+                   item.get('status'), item.get('size'))
+
+def post_item(p):
+    return InventoryItem(p['id'], p['title']['rendered'], p['link'], p['status'], date=p.get('date'))
+
+def cpt_item(i):
+    return InventoryItem(i['id'],
+                         i.get('title', {}).get('rendered', i.get('slug')),
+                         i.get('link', ''),
+                         i.get('status'))
+
+def media_item(m):
+    # dimensione dal payload REST; le mancanti si chiedono a /media-sizes
+    return InventoryItem(m['id'], m['title']['rendered'], m['source_url'], 'media', media_filesize(m))
+
+def archive_item(title, link):
+    return InventoryItem('', title, link, 'archive')
+
+def fetch_delta(endpoint, auth, params, to_item, fields, previous_items, since, **options):
+    """
+    Aggiorna i record compatti di uno snapshot precedente scaricando solo:
+    - la lista degli ID attuali (_fields=id), per rilevare le cancellazioni;
+    - gli elementi modificati dopo `since` (modified_after);
+    - gli eventuali ID presenti sul sito ma assenti dallo snapshot.
+    Restituisce (items nell'ordine REST, record modificati, n. cancellati).
+    `options` (limiter, on_page) vengono passate a ogni fetch_all.
+    """
+    ids = fetch_all(endpoint, auth, params=params, fields='id', transform=lambda x: x['id'], **options)
+    changed = fetch_all(endpoint, auth, params=dict(
+        params, modified_after=since, orderby='modified', order='desc'
+    ), fields=fields, transform=to_item, **options)
+    by_id = {it['id']: InventoryItem.from_dict(it) for it in previous_items if it.get('id') != ''}
+    deleted = len(set(by_id) - set(ids))
+    for item in changed:
+        by_id[item.id] = item
+
+    missing = [i for i in ids if i not in by_id]
+    for start in range(0, len(missing), 100):
+        batch = ','.join(str(i) for i in missing[start:start + 100])
+        for item in fetch_all(endpoint, auth, params=dict(params, include=batch),
+                              fields=fields, transform=to_item, **options):
+            by_id[item.id] = item
+            changed.append(item)
+
+    return [by_id[i] for i in ids if i in by_id], changed, deleted
+
+def date_archives(base, dates):
+    """
+    Archivi mensili e annuali a partire da date 'YYYY-MM-DD'.
+    """
+    arch = {}
+    for mth in sorted({d[:7] for d in dates}):
+        link = f"{base}/{mth}/"
+        arch[link] = archive_item(f"Archivio Mensile: {mth}", link)
+    for y in sorted({d.split('-')[0] for d in dates}):
+        link = f"{base}/{y}/"
+        arch[link] = archive_item(f"Archivio Annuale: {y}", link)
+    return arch
+
+def group_rank(category):
+    """
+    Posizione di una categoria nell'ordine Pagine, Post, CPT, Media Library, Archivi.
+    """
+    if category.startswith('CPT - '):
+        return 2
+    return {'Pagine': 0, 'Post': 1, 'Media Library': 3, 'Archivi': 4}.get(category, 5)
+
+def group(category, items):
+    return {'category': category, 'items': [it.to_dict() for it in items]}
+
+def iter_inventory(base, auth=None, progress=None, previous=None, since=None, limiter=None):
+    """
+    Costruisce l'inventario dei contenuti del sito come grafo di fasi
+    (CONTENT_STAGES): le collection indipendenti vengono scaricate in
+    parallelo e ogni fase aspetta solo quelle da cui dipende (i CPT i tipi,
+    gli archivi i post e i termini). Tutte le richieste REST, di qualsiasi
+    fase e pagina, condividono un unico budget: `limiter` (un semaforo) o,
+    se assente, CONTENT_WORKERS richieste contemporanee.
+    Produce ('group', { category, items }) appena ogni gruppo è pronto, in
+    ordine di completamento (una fase lenta non trattiene le altre), e per
+    ultimo ('summary', summary). Dei gruppi già restituiti si tengono solo i
+    conteggi, così la memoria non cresce con l'intero sito.
+    Alla REST API vengono chiesti solo i campi usati (_fields) e ogni pagina
+    scaricata diventa subito una lista di InventoryItem.
+
+    `progress(done, total)` conta le pagine REST scaricate su quelle note
+    finora (il totale cresce man mano che ogni collection ne legge il numero);
+    viene chiamato dopo ogni pagina e può sollevare un'eccezione per
+    interrompere l'analisi.
+
+    Con `previous` (i groups di uno snapshot salvato) e `since` (datetime UTC
+    dello snapshot) l'inventario è incrementale: vengono scaricati solo gli
+    elementi modificati dopo `since` e la lista degli ID per le cancellazioni.
+    """
+    incremental = previous is not None and since is not None
+    prev_groups = {g.get('category'): g.get('items', []) for g in (previous or [])}
+    since_iso = (since - DELTA_MARGIN).strftime('%Y-%m-%dT%H:%M:%S') if incremental else None
+    delta = {'changed': 0, 'deleted': 0}
+    delta_lock = threading.Lock()
+    limiter = limiter or threading.BoundedSemaphore(CONTENT_WORKERS)
+    pages = {'done': 0, 'total': 0}
+    pages_lock = threading.Lock()
+
+    def count_page(done, total):
+        # sotto lock, così l'avanzamento riportato non torna mai indietro
+        with pages_lock:
+            pages['done'] += done
+            pages['total'] += total
+            if progress:
+                progress(pages['done'], pages['total'])
+
+    # opzioni comuni a tutte le chiamate fetch_all dell'inventario
+    options = {'limiter': limiter, 'on_page': count_page}
+
+    def load(path, params, to_item, fields, category):
+        """
+        Restituisce (record compatti, record scaricati in questa analisi).
+        """
+        endpoint = f"{base}/wp-json/wp/v2/{path}"
+        if not incremental:
+            items = fetch_all(endpoint, auth, params=params, fields=fields, transform=to_item, **options)
+            return items, items
+        items, changed, deleted = fetch_delta(
+            endpoint, auth, params or {}, to_item, fields, prev_groups.get(category, []), since_iso, **options
+        )
+        with delta_lock:
+            delta['changed'] += len(changed)
+            delta['deleted'] += deleted
+        return items, changed
+
+    # inizio dell'analisi (UTC): è il `since` del prossimo inventario incrementale
+    started = datetime.utcnow().replace(microsecond=0)
+    summary = {'pages': 0, 'posts': 0, 'media': 0, 'cpts': {}, 'archives': 0, 'errors': [],
+               'started': started.isoformat()}
+    # errori per fase, riportati nel summary nell'ordine delle fasi
+    errors = {name: [] for name in CONTENT_STAGES}
+
+    # Ogni fase che produce gruppi restituisce una lista di (categoria, record)
+
+    def pages_stage():
+        try:
+            pages, _ = load('pages', None, post_item, POST_FIELDS, 'Pagine')
+        except RequestException as e:
+            pages = []
+            errors['pages'].append(f"Pages error: {e}")
+        summary['pages'] = len(pages)
+        return [('Pagine', pages)]
+
+    def posts_stage():
+        # le date dei post servono agli archivi mensili e annuali
+        try:
+            posts, fetched = load('posts', {'status':'publish'}, post_item, POST_FIELDS, 'Post')
+            dates = {p.date.split('T')[0] for p in fetched if p.date}
+        except RequestException as e:
+            posts, dates = [], set()
+            errors['posts'].append(f"Posts error: {e}")
+        summary['posts'] = len(posts)
+        return [('Post', posts)], dates
+
+    def types_stage():
+        try:
+            # types endpoint ritorna un dict, non una lista
+            with limiter:
+                types_resp = http_client.get(f"{base}/wp-json/wp/v2/types", auth=auth, timeout=10)
+            count_page(1, 1)
+            types_resp.raise_for_status()
+            types_raw = types_resp.json()   # dict
+        except RequestException as e:
+            errors['types'].append(f"Types error: {e}")
+            return []
+        return [
             k for k,v in types_raw.items()
             if isinstance(v, dict) and v.get('viewable') and k not in ('post','page')
         ]
+
+    def cpts_stage(public_cpts):
+        cpt_groups = []
         for pt in public_cpts:
             try:
-                cpts[pt] = fetch_all(f"{base}/wp-json/wp/v2/{pt}", auth, params={'status':'publish'})
+                items, _ = load(pt, {'status':'publish'}, cpt_item, POST_FIELDS, f"CPT - {pt}")
             except RequestException:
-                cpts[pt] = []
-                errors.append(f"CPT {pt} error")
-    except RequestException as e:
-        errors.append(f"Types error: {e}")
+                items = []
+                errors['cpts'].append(f"CPT {pt} error")
+            summary['cpts'][pt] = len(items)
+            cpt_groups.append((f"CPT - {pt}", items))
+        return cpt_groups
 
+    def media_stage():
+        try:
+            media_items, _ = load('media', None, media_item, MEDIA_FIELDS, 'Media Library')
+        except RequestException as e:
+            media_items = []
+            errors['media'].append(f"Media error: {e}")
+        summary['media'] = len(media_items)
+        return [('Media Library', media_items)]
 
-    # Media
-    try:
-        media = fetch_all(f"{base}/wp-json/wp/v2/media", auth)
-        for m in media:
-            size = ''
+    def terms_stage(name, path, label):
+        def stage():
             try:
-                head = requests.head(m['source_url'], timeout=5, allow_redirects=True)
-                size = head.headers.get('Content-Length', '')
-            except:
-                pass
-            media_items.append({
-                'id': m['id'],
-                'title': m['title']['rendered'],
-                'link': m['source_url'],
-                'status': 'media',
-                'size': size
-            })
-    except RequestException as e:
-        errors.append(f"Media error: {e}")
-
-    # Archivi: categorie, tag, autori, date
-    try:
-        arch = {}
-        cats = fetch_all(f"{base}/wp-json/wp/v2/categories", auth)
-        for c in cats:
-            link = f"{base}/category/{c['slug']}/"
-            arch[link] = {'id':'', 'title':f"Categoria: {c['name']}", 'link':link, 'status':'archive'}
-
-        tags = fetch_all(f"{base}/wp-json/wp/v2/tags", auth)
-        for t in tags:
-            link = f"{base}/tag/{t['slug']}/"
-            arch[link] = {'id':'', 'title':f"Tag: {t['name']}", 'link':link, 'status':'archive'}
-
-        users = fetch_all(f"{base}/wp-json/wp/v2/users", auth)
-        for a in users:
-            link = f"{base}/author/{a['slug']}/"
-            arch[link] = {'id':'', 'title':f"Autore: {a['name']}", 'link':link, 'status':'archive'}
-
-        dates = {p['date'].split('T')[0] for p in posts if 'date' in p}
-        for mth in sorted({d[:7] for d in dates}):
-            link = f"{base}/{mth}/"
-            arch[link] = {'id':'', 'title':f"Archivio Mensile: {mth}", 'link':link, 'status':'archive'}
-        for y in sorted({d.split('-')[0] for d in dates}):
-            link = f"{base}/{y}/"
-            arch[link] = {'id':'', 'title':f"Archivio Annuale: {y}", 'link':link, 'status':'archive'}
-
-        archives_list = list(arch.values())
-    except RequestException as e:
-        errors.append(f"Archives error: {e}")
-
-    # Raggruppa in categorie
-    groups = [
-        {'category':'Pagine', 'items': [
-            {'id': p['id'], 'title': p['title']['rendered'], 'link': p['link'], 'status': p['status']}
-            for p in pages
-        ]},
-        {'category':'Post', 'items': [
-            {'id': p['id'], 'title': p['title']['rendered'], 'link': p['link'], 'status': p['status']}
-            for p in posts
-        ]}
-    ]
-    for pt, lst in cpts.items():
-        groups.append({
-            'category': f"CPT - {pt}",
-            'items': [
-                {'id': i['id'],
-                 'title': i.get('title', {}).get('rendered', i.get('slug')),
-                 'link': i.get('link', ''),
-                 'status': i.get('status')}
-                for i in lst
-            ]
-        })
-    groups.append({'category':'Media Library', 'items': media_items})
-    groups.append({'category':'Archivi', 'items': archives_list})
-
-    summary = {
-        'pages': len(pages),
-        'posts': len(posts),
-        'media': len(media_items),
-        'cpts': {pt: len(lst) for pt, lst in cpts.items()},
-        'archives': len(archives_list),
-        'errors': errors
+                terms = fetch_all(f"{base}/wp-json/wp/v2/{name}", auth, fields=TERM_FIELDS, **options)
+            except RequestException as e:
+                errors[name].append(f"Archives error: {e}")
+                return []
+            return [archive_item(f"{label}: {t['name']}", f"{base}/{path}/{t['slug']}/") for t in terms]
+        return stage
+
+    def archives_stage(posts, categories, tags, users):
+        dates = set(posts[1])
+        if incremental:
+            # le date dei post non modificati arrivano dagli archivi dello snapshot
+            for it in prev_groups.get('Archivi', []):
+                title = it.get('title', '')
+                if title.startswith('Archivio Mensile: '):
+                    dates.add(title.split(': ', 1)[1] + '-01')
+        arch = {it.link: it for it in categories + tags + users}
+        arch.update(date_archives(base, dates))
+        summary['archives'] = len(arch)
+        return [('Archivi', list(arch.values()))]
+
+    stages = {
+        'pages': ((), pages_stage),
+        'posts': ((), posts_stage),
+        'types': ((), types_stage),
+        'cpts': (('types',), cpts_stage),
+        'media': ((), media_stage),
+        'categories': ((), terms_stage('categories', 'category', 'Categoria')),
+        'tags': ((), terms_stage('tags', 'tag', 'Tag')),
+        'users': ((), terms_stage('users', 'author', 'Autore')),
+        'archives': (('posts', 'categories', 'tags', 'users'), archives_stage),
     }
 
-    return jsonify({'groups': groups, 'summary': summary})
+    # un thread per fase: il limite alle richieste è `limiter`, non il pool
+    for name, value in run_stages(stages, len(stages)):
+        if name in GROUP_STAGES:
+            for category, items in (value[0] if name == 'posts' else value):
+                yield 'group', group(category, items)
+
+    summary['errors'] = [e for name in CONTENT_STAGES for e in errors[name]]
+    if incremental:
+        summary['incremental'] = dict(delta, since=since.isoformat())
+    yield 'summary', summary
+
+def content_inventory(base, auth=None, progress=None, previous=None, since=None, limiter=None,
+                      on_group=None):
+    """
+    Inventario completo dei contenuti del sito: { groups, summary }.
+    Vedi iter_inventory per i parametri; `on_group(group)` riceve ogni
+    gruppo appena pronto (ad es. come risultato parziale di un job).
+    """
+    result = {'groups': []}
+    for kind, value in iter_inventory(base, auth, progress, previous, since, limiter):
+        if kind == 'group':
+            if on_group:
+                on_group(value)
+            result['groups'].append(value)
+        else:
+            result['summary'] = value
+    # la risposta completa (e i report) mantengono l'ordine abituale delle categorie
+    result['groups'].sort(key=lambda g: group_rank(g['category']))
+    return result
+
+def snapshot_options(base):
+    """
+    Argomenti per un inventario incrementale a partire dall'ultimo report
+    salvato per il dominio; {} se non ce n'è uno (inventario completo).
+    `since` è l'inizio dell'analisi che ha prodotto lo snapshot (summary.started),
+    non il momento del salvataggio: le modifiche fatte nel frattempo non
+    vanno perse. Per i report senza started si usa la data di salvataggio.
+    """
+    snapshot = latest_snapshot(urlsplit(base).hostname or '')
+    if not snapshot:
+        return {}
+    since, report = snapshot
+    started = (report.get('summary') or {}).get('started')
+    if started:
+        since = datetime.fromisoformat(started)
+    return {'previous': report['groups'], 'since': since}
+
+@bp.route('', methods=['POST'])
+def analyze_content():
+    """
+    POST JSON { url, username?, password?, incremental?, format? }
+    Restituisce { groups, summary }. Con format=ndjson (o Accept:
+    application/x-ndjson) invia una riga { group } per ogni categoria appena
+    pronta e per ultima la riga { summary }.
+    """
+    d = request.json or {}
+    base = d.get('url', '').rstrip('/')
+    if not base.startswith(('http://', 'https://')):
+        base = 'https://' + base
+    auth = HTTPBasicAuth(d.get('username'), d.get('password')) if d.get('username') else None
+
+    options = snapshot_options(base) if d.get('incremental') else {}
+    stream = d.get('format') == 'ndjson' or \
+        request.accept_mimetypes.best == 'application/x-ndjson'
+
+    if stream:
+        def generate():
+            for kind, value in iter_inventory(base, auth, **options):
+                yield json.dumps({kind: value}, ensure_ascii=False) + '\n'
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+    return jsonify(content_inventory(base, auth, **options))
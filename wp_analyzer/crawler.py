@@ -0,0 +1,304 @@
+# wp_analyzer/crawler.py
+
+import os
+import re
+import gzip
+import posixpath
+from collections import OrderedDict
+from urllib.parse import urljoin, urlsplit
+from xml.etree import ElementTree
+from requests.auth import HTTPBasicAuth
+from requests.exceptions import RequestException
+from flask import Blueprint, request, jsonify
+from .utils import imap_unordered, normalize_url, parse_html, bounded
+from . import http_client, http_cache
+
+bp = Blueprint('crawler', __name__)
+
+# Richieste parallele del crawler e limite di connessioni per host
+CRAWL_WORKERS = int(os.environ.get('WP_CRAWL_WORKERS', '8'))
+CRAWL_PER_HOST = int(os.environ.get('WP_CRAWL_PER_HOST', '4'))
+# Pagine HTML visitate al massimo dal fallback a link interni
+CRAWL_MAX_PAGES = int(os.environ.get('WP_CRAWL_MAX_PAGES', '500'))
+# URL raccolti al massimo dalle sitemap
+CRAWL_MAX_URLS = int(os.environ.get('WP_CRAWL_MAX_URLS', '50000'))
+
+# Sitemap provate quando robots.txt non ne indica: Yoast/RankMath, WordPress core, generica
+SITEMAP_CANDIDATES = ('sitemap_index.xml', 'wp-sitemap.xml', 'sitemap.xml')
+
+# Link che non portano a contenuti da inventariare
+SKIP_PATHS = re.compile(r'/(wp-admin|wp-login\.php|wp-json|xmlrpc\.php|feed)(/|$)|/wp-content/')
+SKIP_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.webp', '.svg', '.pdf', '.zip',
+                   '.css', '.js', '.xml', '.mp3', '.mp4', '.ico', '.woff', '.woff2')
+ARCHIVE_PATHS = re.compile(r'^/(category|tag|author)/|^/\d{4}/(\d{2}/)?$')
+
+# Tipi delle sitemap che corrispondono ad archivi (tassonomie e autori)
+ARCHIVE_TYPES = ('category', 'post_tag', 'tag', 'author', 'post_format', 'taxonomies', 'users')
+
+
+def site_host(url):
+    """
+    Host del sito senza 'www.', per riconoscere i link interni.
+    """
+    host = (urlsplit(url).hostname or '').lower()
+    return host[4:] if host.startswith('www.') else host
+
+
+def sitemap_category(sitemap_url):
+    """
+    Categoria (come in /analyze/content) degli URL di una sitemap, dedotta
+    dal nome del file: post-sitemap.xml, page-sitemap2.xml (Yoast/RankMath),
+    wp-sitemap-posts-page-1.xml, wp-sitemap-taxonomies-category-1.xml (core).
+    """
+    name = posixpath.basename(urlsplit(sitemap_url).path).lower()
+    name = re.sub(r'\.xml(\.gz)?$', '', name)
+    core = re.match(r'wp-sitemap-(posts|taxonomies|users)(?:-(.+?))?-\d+$', name)
+    if core:
+        kind = core.group(2) if core.group(1) == 'posts' else core.group(1)
+    else:
+        plugin = re.match(r'(.+?)[-_]sitemap\d*$', name)
+        if not plugin:
+            return 'Sitemap'
+        kind = plugin.group(1)
+    if kind == 'page':
+        return 'Pagine'
+    if kind == 'post':
+        return 'Post'
+    if kind in ARCHIVE_TYPES or kind.endswith(('_cat', '_tag')):
+        return 'Archivi'
+    return f"CPT - {kind}"
+
+
+def parse_sitemap(content):
+    """
+    Legge una sitemap (anche .gz). Restituisce (sitemap figlie, URL),
+    cioè le <loc> di un <sitemapindex> oppure quelle di un <urlset>.
+    """
+    if content[:2] == b'\x1f\x8b':
+        content = gzip.decompress(content)
+    root = ElementTree.fromstring(content)
+    locs = [
+        el.text.strip() for el in root.iter()
+        if el.tag.rsplit('}', 1)[-1] == 'loc' and el.text
+        # le <image:loc> dei sitemap di Yoast non sono pagine
+        and not el.tag.startswith('{http://www.google.com/schemas/sitemap-image')
+    ]
+    if root.tag.rsplit('}', 1)[-1] == 'sitemapindex':
+        return locs, []
+    return [], locs
+
+
+def robots_sitemaps(base, auth=None):
+    """
+    Sitemap dichiarate in robots.txt (righe 'Sitemap:').
+    """
+    try:
+        resp = http_cache.get(f"{base}/robots.txt", auth=auth, timeout=10)
+        resp.raise_for_status()
+    except RequestException:
+        return []
+    return [
+        line.split(':', 1)[1].strip()
+        for line in resp.text.splitlines()
+        if line.lower().startswith('sitemap:') and line.split(':', 1)[1].strip()
+    ]
+
+
+def fetch_sitemap(url, auth=None):
+    resp = http_cache.get(url, auth=auth, timeout=10)
+    resp.raise_for_status()
+    return parse_sitemap(resp.content)
+
+
+def sitemap_urls(base, auth=None, workers=CRAWL_WORKERS, per_host=CRAWL_PER_HOST,
+                 max_urls=CRAWL_MAX_URLS):
+    """
+    Raccoglie gli URL del sito dalle sitemap, seguendo gli indici livello per
+    livello con richieste in parallelo. Restituisce
+    ({ URL normalizzato: categoria }, sitemap lette, errori).
+    """
+    host = site_host(base)
+    limiter = http_client.HostLimiter(per_host)
+    urls = OrderedDict()
+    errors = []
+    read = []
+
+    def work(sitemap):
+        with limiter.hold(sitemap):
+            try:
+                return sitemap, fetch_sitemap(sitemap, auth), None
+            except (RequestException, ElementTree.ParseError, OSError, EOFError) as e:
+                return sitemap, ([], []), e
+
+    def collect(level):
+        children = []
+        for sitemap, (child, locs), error in imap_unordered(work, level, workers):
+            if error is not None:
+                errors.append(f"Sitemap {sitemap}: {error}")
+                continue
+            read.append(sitemap)
+            children.extend(child)
+            category = sitemap_category(sitemap)
+            for loc in locs:
+                norm = normalize_url(urljoin(sitemap, loc))
+                if site_host(norm) == host and norm not in urls and len(urls) < max_urls:
+                    urls[norm] = category
+        return children
+
+    seen = set()
+    level = robots_sitemaps(base, auth)
+    if not level:
+        # senza robots.txt: il primo candidato leggibile
+        for name in SITEMAP_CANDIDATES:
+            candidate = f"{base}/{name}"
+            seen.add(candidate)
+            level = collect([candidate])
+            if read:
+                break
+        errors.clear()
+    while level and len(urls) < max_urls:
+        level = [s for s in dict.fromkeys(level) if s not in seen]
+        seen.update(level)
+        level = collect(level)
+    return urls, read, errors
+
+
+def page_links(html, page_url, host):
+    """
+    Titolo della pagina e link interni (normalizzati, senza duplicati).
+    """
+    soup = parse_html(html)
+    title = soup.title.string.strip() if soup.title and soup.title.string else ''
+    links = []
+    for a in soup.find_all('a', href=True):
+        href = a['href'].strip()
+        if href.startswith(('mailto:', 'tel:', 'javascript:', '#')):
+            continue
+        norm = normalize_url(urljoin(page_url, href))
+        path = urlsplit(norm).path.lower()
+        if not norm.startswith(('http://', 'https://')) or site_host(norm) != host:
+            continue
+        if SKIP_PATHS.search(path) or path.endswith(SKIP_EXTENSIONS):
+            continue
+        links.append(norm)
+    return title, list(dict.fromkeys(links))
+
+
+def crawl_links(base, auth=None, max_pages=CRAWL_MAX_PAGES, workers=CRAWL_WORKERS,
+                per_host=CRAWL_PER_HOST):
+    """
+    Visita il sito in ampiezza a partire dalla home seguendo i link interni.
+    Restituisce ({ URL normalizzato: titolo }, errori).
+    """
+    host = site_host(base)
+    limiter = http_client.HostLimiter(per_host)
+    start = normalize_url(base)
+    seen = {start}
+    pages = OrderedDict()
+    errors = []
+
+    def work(url):
+        with limiter.hold(url):
+            try:
+                resp = http_cache.get(url, auth=auth, timeout=10)
+                resp.raise_for_status()
+            except RequestException as e:
+                return url, None, [], e
+        if 'html' not in resp.headers.get('Content-Type', 'text/html'):
+            return url, None, [], None
+        title, links = page_links(resp.text, resp.url or url, host)
+        return url, title, links, None
+
+    level = [start]
+    while level and len(pages) < max_pages:
+        level = level[:max_pages - len(pages)]
+        following = []
+        for url, title, links, error in imap_unordered(work, level, workers):
+            if error is not None:
+                errors.append(f"Crawl {url}: {error}")
+                continue
+            if title is None:
+                continue
+            pages[url] = title
+            for link in links:
+                if link not in seen:
+                    seen.add(link)
+                    following.append(link)
+        level = following
+    return pages, errors
+
+
+def crawl_item(url, title=''):
+    return {'id': '', 'title': title or urlsplit(url).path, 'link': url, 'status': 'crawl'}
+
+
+def crawl_inventory(base, auth=None, mode='auto', max_pages=CRAWL_MAX_PAGES,
+                    workers=CRAWL_WORKERS, per_host=CRAWL_PER_HOST):
+    """
+    Inventario senza REST API, con la stessa struttura { groups, summary } di
+    content_inventory. mode: 'sitemap', 'links' oppure 'auto' (le sitemap e,
+    se non ne esistono, i link interni).
+    """
+    groups = OrderedDict()
+    errors = []
+    summary = {'source': None, 'sitemaps': 0, 'urls': 0, 'errors': errors}
+
+    if mode in ('auto', 'sitemap'):
+        urls, read, sitemap_errors = sitemap_urls(base, auth, workers, per_host)
+        errors.extend(sitemap_errors)
+        summary['sitemaps'] = len(read)
+        if urls:
+            summary['source'] = 'sitemap'
+            for url, category in urls.items():
+                groups.setdefault(category, []).append(crawl_item(url))
+
+    if mode == 'links' or (mode == 'auto' and not groups):
+        pages, crawl_errors = crawl_links(base, auth, max_pages, workers, per_host)
+        errors.extend(crawl_errors)
+        summary['source'] = 'links'
+        for url, title in pages.items():
+            category = 'Archivi' if ARCHIVE_PATHS.match(urlsplit(url).path) else 'Crawl'
+            groups.setdefault(category, []).append(crawl_item(url, title))
+
+    # stessi conteggi del summary di content_inventory
+    summary.update({
+        'urls': sum(len(items) for items in groups.values()),
+        'pages': len(groups.get('Pagine', [])),
+        'posts': len(groups.get('Post', [])),
+        'media': 0,
+        'cpts': {c[len('CPT - '):]: len(items) for c, items in groups.items() if c.startswith('CPT - ')},
+        'archives': len(groups.get('Archivi', []))
+    })
+    return {
+        'groups': [{'category': c, 'items': items} for c, items in groups.items()],
+        'summary': summary
+    }
+
+
+@bp.route('', methods=['POST'])
+def analyze_crawl():
+    """
+    POST JSON { url, username?, password?, mode?, max_pages?, workers?, per_host? }
+    Inventario degli URL da sitemap/robots.txt o dai link interni, per i siti
+    con la REST API disattivata. Restituisce { groups, summary } come
+    /analyze/content, utilizzabile da SEO, broken link ed export.
+    """
+    data = request.json or {}
+    base = data.get('url', '').rstrip('/')
+    if not base.startswith(('http://', 'https://')):
+        base = 'https://' + base
+
+    auth = None
+    if data.get('username'):
+        auth = HTTPBasicAuth(data['username'], data.get('password', ''))
+
+    mode = data.get('mode') or 'auto'
+    if mode not in ('auto', 'sitemap', 'links'):
+        return jsonify({'error': f"Modalità non supportata: {mode}"}), 400
+
+    return jsonify(crawl_inventory(
+        base, auth, mode,
+        max_pages=bounded(data.get('max_pages'), CRAWL_MAX_PAGES),
+        workers=bounded(data.get('workers'), CRAWL_WORKERS),
+        per_host=bounded(data.get('per_host'), CRAWL_PER_HOST)
+    ))
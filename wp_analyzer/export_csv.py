@@ -1,29 +1,103 @@
 import csv
+import zlib
 from io import StringIO
-from flask import Blueprint, request, make_response
+from flask import Blueprint, request, jsonify, Response, stream_with_context
+from .reports import get_store
 
 bp = Blueprint('export_csv', __name__)
 
-@bp.route('/download_csv', methods=['POST'])
-def download_csv():
-    data = request.json or {}
-    groups = data.get('groups', [])
+COLUMNS = ('category', 'id', 'title', 'link', 'status', 'size')
+DEFAULT_COLUMNS = ('category', 'id', 'title', 'link', 'status')
 
+def iter_csv(groups, columns=DEFAULT_COLUMNS, batch=500):
+    """
+    Genera il CSV dei gruppi a blocchi di `batch` righe, senza costruirlo
+    tutto in memoria.
+    """
     output = StringIO()
     writer = csv.writer(output)
-    writer.writerow(['category', 'id', 'title', 'link', 'status'])
+    writer.writerow(columns)
+    rows = 0
     for group in groups:
         category = group.get('category', '')
         for item in group.get('items', []):
             writer.writerow([
-                category,
-                item.get('id', ''),
-                item.get('title', ''),
-                item.get('link', ''),
-                item.get('status', '')
+                category if c == 'category' else item.get(c, '')
+                for c in columns
             ])
+            rows += 1
+            if rows % batch == 0:
+                yield output.getvalue()
+                output.seek(0)
+                output.truncate()
+    yield output.getvalue()
 
-    resp = make_response(output.getvalue())
-    resp.headers['Content-Disposition'] = 'attachment; filename=content.csv'
-    resp.mimetype = 'text/csv'
+def gzip_chunks(chunks):
+    """
+    Comprime in streaming (formato gzip) i blocchi di testo prodotti da `chunks`.
+    """
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+def parse_columns(value):
+    """
+    Colonne richieste (?columns=id,link); solleva ValueError se sconosciute.
+    """
+    if not value:
+        return DEFAULT_COLUMNS
+    columns = tuple(c.strip() for c in value.split(',') if c.strip())
+    unknown = [c for c in columns if c not in COLUMNS]
+    if unknown or not columns:
+        raise ValueError(f"Colonne non valide: {', '.join(unknown) or value}")
+    return columns
+
+def csv_response(groups, columns, filename='content.csv', compress=False):
+    chunks = iter_csv(groups, columns)
+    if compress:
+        resp = Response(stream_with_context(gzip_chunks(chunks)), mimetype='text/csv')
+        resp.headers['Content-Encoding'] = 'gzip'
+    else:
+        resp = Response(stream_with_context(chunks), mimetype='text/csv')
+    resp.headers['Content-Disposition'] = f'attachment; filename={filename}'
     return resp
+
+@bp.route('/download_csv', methods=['POST'])
+def download_csv():
+    data = request.json or {}
+    groups = data.get('groups', [])
+    # columns come lista (['id', 'link']) o stringa come in GET ('id,link')
+    cols = data.get('columns') or ''
+    try:
+        if not isinstance(cols, str):
+            cols = ','.join(map(str, cols))
+        columns = parse_columns(cols)
+    except TypeError:
+        return jsonify({'error': f"Colonne non valide: {cols}"}), 400
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return csv_response(groups, columns)
+
+@bp.route('/download_csv/<domain>/<filename>', methods=['GET'])
+def download_report_csv(domain, filename):
+    """
+    Esporta in CSV l'inventario di un report salvato, senza doverlo
+    ricaricare dal client. Parametri opzionali:
+    ?columns=category,id,title,link,status,size  e  ?gzip=1
+    """
+    try:
+        columns = parse_columns(request.args.get('columns'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    report = get_store().load(domain, filename)
+    if report is None:
+        return jsonify({'error': 'Not found'}), 404
+
+    compress = request.args.get('gzip', '').lower() in ('1', 'true') \
+        and bool(request.accept_encodings['gzip'])
+    csv_name = filename.replace('.json', '') + '.csv'
+    return csv_response(report.get('groups', []), columns, csv_name, compress)
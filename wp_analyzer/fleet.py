@@ -0,0 +1,215 @@
+# wp_analyzer/fleet.py
+
+import os
+import time
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from urllib.parse import urlsplit
+from flask import Blueprint, request, jsonify
+from .content import content_inventory
+from .seo import seo_items, iter_seo
+from .security import scan_security, normalize_domain
+from .theme_plugin import fetch_assets, assets_result
+from .linkcheck import check_groups, is_broken
+from .jobs import manager, JobCancelled
+from .reports import get_store
+from .utils import bounded
+
+bp = Blueprint('fleet', __name__)
+
+# Siti analizzati contemporaneamente (budget globale della flotta)
+FLEET_WORKERS = int(os.environ.get('WP_FLEET_WORKERS', '8'))
+# Richieste contemporanee verso lo stesso host durante le analisi di un sito
+FLEET_PER_HOST = int(os.environ.get('WP_FLEET_PER_HOST', '2'))
+
+
+# Ogni analisi riceve `per_host`, il numero massimo di richieste
+# contemporanee verso il sito, e lo rispetta anche nei propri pool interni
+
+def fleet_content(base, report, per_host):
+    return content_inventory(base, limiter=threading.BoundedSemaphore(per_host))
+
+
+def fleet_seo(base, report, per_host):
+    items = seo_items(base, limiter=threading.BoundedSemaphore(per_host))
+    result = [None] * len(items)
+    for idx, rec in iter_seo(items, None, workers=per_host, per_host=per_host):
+        result[idx] = rec
+    return {'seo': result}
+
+
+def fleet_broken(base, report, per_host):
+    links, statuses = check_groups(report.get('groups') or [], workers=per_host, per_host=per_host)
+    return {
+        'broken': sorted(link for link, norm in links.items() if is_broken(statuses[norm])),
+        'link_status': {link: statuses[norm] for link, norm in links.items()}
+    }
+
+
+def fleet_security(base, report, per_host):
+    return {'security': scan_security(base)}
+
+
+def fleet_theme_plugin(base, report, per_host):
+    found = assets_result(fetch_assets(base))
+    return {'themes': found['themes'], 'plugins': found['plugins'], 'versions': found['versions']}
+
+
+# Analisi disponibili, nell'ordine in cui vengono eseguite per ogni sito
+# (broken usa l'inventario prodotto da content)
+FLEET_ANALYSES = {
+    'content': fleet_content,
+    'seo': fleet_seo,
+    'broken': fleet_broken,
+    'security': fleet_security,
+    'theme_plugin': fleet_theme_plugin
+}
+
+
+def run_fleet(job, sites, analyses, workers=FLEET_WORKERS, per_host=FLEET_PER_HOST):
+    """
+    Analizza `sites` con al più `workers` siti alla volta. Le analisi di un
+    sito sono eseguite in sequenza, ognuna con al più `per_host` richieste
+    contemporanee, e il report viene salvato appena concluso.
+    Due siti sullo stesso host non vengono mai analizzati insieme: un sito il
+    cui host è occupato resta in coda e al suo posto parte il successivo,
+    così nessun worker resta fermo ad aspettare un host lento.
+    L'avanzamento conta le singole analisi, i risultati parziali i siti.
+    """
+    analyses = [a for a in FLEET_ANALYSES if a in analyses]
+    workers = max(1, int(workers))
+    total = len(sites) * len(analyses)
+    counter = {'done': 0}
+    lock = threading.Lock()
+    job.progress(0, total)
+
+    def step():
+        with lock:
+            counter['done'] += 1
+            job.progress(counter['done'])
+
+    def work(base):
+        started = time.time()
+        report = {'type': 'fleet'}
+        errors = {}
+        for name in analyses:
+            job.check_cancelled()
+            try:
+                report.update(FLEET_ANALYSES[name](base, report, per_host))
+            except JobCancelled:
+                raise
+            except Exception as e:
+                errors[name] = str(e) or e.__class__.__name__
+            step()
+        entry = {'url': base, 'domain': urlsplit(base).hostname or base, 'errors': errors}
+        if len(errors) < len(analyses):
+            report['fleet_errors'] = errors
+            meta = get_store().save(entry['domain'], report)
+            entry.update(filename=meta['filename'], report_id=meta['id'])
+        entry['seconds'] = round(time.time() - started, 2)
+        return entry
+
+    queue = deque(sites)
+    busy = set()
+    running = {}
+    pool = ThreadPoolExecutor(max_workers=workers)
+    try:
+        while queue or running:
+            # avvia i siti con l'host libero; gli altri tornano in fondo alla coda
+            for _ in range(len(queue)):
+                if len(running) >= workers:
+                    break
+                base = queue.popleft()
+                host = urlsplit(base).netloc.lower()
+                if host in busy:
+                    queue.append(base)
+                    continue
+                busy.add(host)
+                running[pool.submit(work, base)] = host
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for fut in finished:
+                busy.discard(running.pop(fut))
+                job.add_partial(fut.result(), advance=False)
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+    return fleet_stats(dict(job.to_dict(offset=0), params=job.params))
+
+
+def fleet_stats(data):
+    """
+    Statistiche aggregate di una flotta a partire dallo stato del job:
+    siti conclusi, salvati e falliti, analisi fallite e throughput.
+    """
+    sites = data.get('partial') or []
+    started = data.get('started')
+    end = data.get('finished') or time.time()
+    elapsed = (end - started) if started else 0
+    per_minute = (lambda n: round(n * 60 / elapsed, 2)) if elapsed > 0 else (lambda n: 0)
+    return {
+        'sites_total': data.get('params', {}).get('sites'),
+        'sites_done': len(sites),
+        'sites_saved': sum(1 for s in sites if 'filename' in s),
+        'sites_failed': sum(1 for s in sites if 'filename' not in s),
+        'analyses_done': data['done'],
+        'analyses_total': data['total'],
+        'analyses_failed': sum(len(s['errors']) for s in sites),
+        'elapsed': round(elapsed, 2),
+        'sites_per_minute': per_minute(len(sites)),
+        'analyses_per_minute': per_minute(data['done'])
+    }
+
+
+@bp.route('', methods=['POST'])
+def create_fleet():
+    """
+    POST JSON { sites: [...], analyses?: [...], workers?, per_host? }
+    Avvia in background l'analisi di tutti i siti e salva un report per
+    ciascuno in /reports/<dominio>. Restituisce subito { id, status }.
+    """
+    data = request.json or {}
+    sites = list(dict.fromkeys(normalize_domain(s) for s in data.get('sites') or [] if s and s.strip()))
+    analyses = data.get('analyses') or list(FLEET_ANALYSES)
+    unknown = [a for a in analyses if a not in FLEET_ANALYSES]
+    if unknown or not sites:
+        error = f"Analisi non supportate: {', '.join(unknown)}" if unknown else 'Nessun sito indicato'
+        return jsonify({'error': error}), 400
+
+    workers = bounded(data.get('workers'), FLEET_WORKERS)
+    per_host = bounded(data.get('per_host'), FLEET_PER_HOST)
+    job = manager.submit(
+        'fleet', run_fleet, sites, analyses, workers, per_host,
+        params={'sites': len(sites), 'analyses': analyses}
+    )
+    return jsonify({'id': job.id, 'status': job.status}), 202
+
+
+@bp.route('/<job_id>', methods=['GET'])
+def get_fleet(job_id):
+    """
+    Stato della flotta: avanzamento, statistiche aggregate e, con ?offset=N,
+    l'esito dei siti conclusi dal N-esimo in poi.
+    """
+    job = manager.get(job_id)
+    if job is None or job.kind != 'fleet':
+        return jsonify({'error': 'Not found'}), 404
+    data = dict(job.to_dict(offset=0), params=job.params)
+    stats = fleet_stats(data)
+    offset = request.args.get('offset', type=int)
+    result = {k: v for k, v in data.items() if k not in ('partial', 'result', 'params')}
+    result['stats'] = stats
+    if offset is not None:
+        result['sites'] = data['partial'][offset:]
+    return jsonify(result)
+
+
+@bp.route('/<job_id>', methods=['DELETE'])
+def cancel_fleet(job_id):
+    """
+    Annulla la flotta: i siti in corso si fermano all'analisi successiva.
+    """
+    job = manager.get(job_id)
+    if job is None or job.kind != 'fleet':
+        return jsonify({'cancelled': False}), 404
+    manager.cancel(job_id)
+    return jsonify({'cancelled': True, 'status': job.status})
@@ -0,0 +1,203 @@
+# wp_analyzer/http_cache.py
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+import requests
+from requests.auth import HTTPBasicAuth
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+from . import http_client
+
+CACHE_DIR = os.environ.get('WP_HTTP_CACHE_DIR') or os.path.join(
+    os.path.dirname(__file__), '..', 'cache', 'http'
+)
+# Cache attiva (0 per disattivarla) e dimensione massima su disco in MB
+CACHE_ENABLED = os.environ.get('WP_HTTP_CACHE', '1') != '0'
+CACHE_MAX_MB = int(os.environ.get('WP_HTTP_CACHE_MAX_MB', '512'))
+
+# Header da non salvare insieme al corpo della risposta
+SKIP_HEADERS = ('set-cookie', 'content-encoding', 'transfer-encoding', 'content-length', 'connection')
+
+
+class ResponseCache:
+    """
+    Cache su disco delle risposte GET (SQLite: metadati e corpo per riga).
+    Le voci sono indicizzate per URL + identità di autenticazione e vengono
+    rivalidate con If-None-Match / If-Modified-Since: un 304 viene servito
+    dal disco. Oltre `max_bytes` si eliminano le voci usate meno di recente.
+    """
+
+    def __init__(self, directory=CACHE_DIR, max_bytes=CACHE_MAX_MB * 1024 * 1024):
+        self.directory = directory
+        self.path = os.path.join(directory, 'responses.sqlite')
+        self.max_bytes = max_bytes
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _db(self, create=False):
+        if self._conn is None:
+            if not create and not os.path.exists(self.path):
+                return None
+            os.makedirs(self.directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS responses ('
+                ' key TEXT PRIMARY KEY, url TEXT, etag TEXT, last_modified TEXT,'
+                ' headers TEXT, body BLOB, size INTEGER, accessed REAL)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS responses_accessed ON responses(accessed)')
+            self._conn = conn
+        return self._conn
+
+    @staticmethod
+    def key(url, auth=None, params=None):
+        """
+        Chiave della voce, oppure None se l'autenticazione non è supportata.
+        Le credenziali entrano solo nell'hash, mai in chiaro su disco.
+        """
+        if auth is None:
+            identity = ''
+        elif isinstance(auth, HTTPBasicAuth):
+            identity = f"basic:{auth.username}:{auth.password}"
+        else:
+            return None
+        full_url = requests.Request('GET', url, params=params).prepare().url
+        return hashlib.sha256(json.dumps([full_url, identity]).encode()).hexdigest()
+
+    def load(self, key):
+        """
+        Restituisce { etag, last_modified, headers, body } oppure None.
+        """
+        with self._lock:
+            db = self._db()
+            if db is None:
+                return None
+            row = db.execute(
+                'SELECT etag, last_modified, headers, body FROM responses WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            db.execute('UPDATE responses SET accessed = ? WHERE key = ?', (time.time(), key))
+            db.commit()
+        etag, last_modified, headers, body = row
+        return {'etag': etag, 'last_modified': last_modified,
+                'headers': json.loads(headers), 'body': body}
+
+    @staticmethod
+    def validators(entry):
+        """
+        Header condizionali per rivalidare una voce.
+        """
+        headers = {}
+        if entry and entry['etag']:
+            headers['If-None-Match'] = entry['etag']
+        if entry and entry['last_modified']:
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    @staticmethod
+    def storable(resp):
+        if resp.status_code != 200:
+            return False
+        if 'no-store' in resp.headers.get('Cache-Control', '').lower():
+            return False
+        return bool(resp.headers.get('ETag') or resp.headers.get('Last-Modified'))
+
+    def store(self, key, url, headers, body):
+        saved = {k: v for k, v in headers.items() if k.lower() not in SKIP_HEADERS}
+        with self._lock:
+            db = self._db(create=True)
+            db.execute(
+                'INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (key, url, headers.get('ETag'), headers.get('Last-Modified'),
+                 json.dumps(saved), body, len(body), time.time())
+            )
+            self._evict(db)
+            db.commit()
+
+    def _evict(self, db):
+        total = db.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # libera fino al 90% del limite, partendo dalle voci meno usate
+        target = total - int(self.max_bytes * 0.9)
+        freed = 0
+        keys = []
+        for key, size in db.execute('SELECT key, size FROM responses ORDER BY accessed'):
+            keys.append((key,))
+            freed += size
+            if freed >= target:
+                break
+        db.executemany('DELETE FROM responses WHERE key = ?', keys)
+
+    def refresh(self, key, entry, resp):
+        """
+        Aggiorna i validatori di una voce dopo un 304.
+        """
+        etag = resp.headers.get('ETag') or entry['etag']
+        last_modified = resp.headers.get('Last-Modified') or entry['last_modified']
+        with self._lock:
+            db = self._db()
+            if db is not None:
+                db.execute(
+                    'UPDATE responses SET etag = ?, last_modified = ? WHERE key = ?',
+                    (etag, last_modified, key)
+                )
+                db.commit()
+
+    @staticmethod
+    def to_response(entry, resp):
+        """
+        Ricostruisce una Response 200 dalla voce in cache, a partire dal 304.
+        """
+        cached = requests.Response()
+        cached.status_code = 200
+        cached.reason = 'OK'
+        cached.headers = CaseInsensitiveDict(entry['headers'])
+        cached._content = entry['body']
+        cached.encoding = get_encoding_from_headers(cached.headers)
+        cached.url = resp.url
+        cached.request = resp.request
+        cached.elapsed = resp.elapsed
+        cached.from_cache = True
+        return cached
+
+    def get(self, url, auth=None, params=None, **kwargs):
+        """
+        GET con cache: stessa interfaccia di http_client.get.
+        """
+        key = self.key(url, auth, params)
+        entry = self.load(key) if key else None
+        if entry:
+            kwargs['headers'] = dict(kwargs.get('headers') or {}, **self.validators(entry))
+        resp = http_client.get(url, auth=auth, params=params, **kwargs)
+        if entry and resp.status_code == 304:
+            self.refresh(key, entry, resp)
+            return self.to_response(entry, resp)
+        if key and self.storable(resp):
+            self.store(key, url, resp.headers, resp.content)
+        return resp
+
+
+_cache = ResponseCache()
+
+
+def get(url, auth=None, params=None, **kwargs):
+    """
+    GET attraverso la cache condivisa su disco (se abilitata).
+    """
+    if not CACHE_ENABLED:
+        return http_client.get(url, auth=auth, params=params, **kwargs)
+    return _cache.get(url, auth=auth, params=params, **kwargs)
+
+
+def get_cache():
+    """
+    La cache condivisa, oppure None se disattivata (WP_HTTP_CACHE=0).
+    """
+    return _cache if CACHE_ENABLED else None
@@ -0,0 +1,142 @@
+# wp_analyzer/http_client.py
+
+import os
+import time
+import threading
+from contextlib import contextmanager
+from http.cookiejar import DefaultCookiePolicy
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from . import metrics
+
+# Numero di host per cui tenere un pool di connessioni keep-alive
+POOL_CONNECTIONS = int(os.environ.get('WP_HTTP_POOL_CONNECTIONS', '20'))
+# Connessioni riutilizzabili per ogni host
+POOL_MAXSIZE = int(os.environ.get('WP_HTTP_POOL_MAXSIZE', '32'))
+# Retry con backoff esponenziale su errori di connessione, 429 e 5xx
+RETRIES = int(os.environ.get('WP_HTTP_RETRIES', '3'))
+BACKOFF = float(os.environ.get('WP_HTTP_BACKOFF', '0.5'))
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+DEFAULT_TIMEOUT = 10
+
+_session = None
+# stessa configurazione ma senza retry, per chi gestisce da sé gli esiti (link check)
+_plain_session = None
+_lock = threading.Lock()
+
+
+def _build_session(pool_connections, pool_maxsize, retries, backoff):
+    retry = Retry(
+        total=retries,
+        backoff_factor=backoff,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=frozenset({'GET', 'HEAD'}),
+        respect_retry_after_header=True,
+        raise_on_status=False
+    )
+    adapter = HTTPAdapter(
+        pool_connections=pool_connections,
+        pool_maxsize=pool_maxsize,
+        max_retries=retry
+    )
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    # Nessun cookie condiviso tra analisi e siti diversi: come requests.get
+    session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+    return session
+
+
+def configure(pool_connections=None, pool_maxsize=None, retries=None, backoff=None):
+    """
+    (Ri)crea la sessione condivisa con i parametri indicati;
+    quelli omessi usano i default letti dalle variabili d'ambiente.
+    """
+    global _session, _plain_session
+    pool_connections = POOL_CONNECTIONS if pool_connections is None else pool_connections
+    pool_maxsize = POOL_MAXSIZE if pool_maxsize is None else pool_maxsize
+    backoff = BACKOFF if backoff is None else backoff
+    session = _build_session(
+        pool_connections, pool_maxsize, RETRIES if retries is None else retries, backoff
+    )
+    plain = _build_session(pool_connections, pool_maxsize, 0, backoff)
+    with _lock:
+        old = (_session, _plain_session)
+        _session, _plain_session = session, plain
+    for previous in old:
+        if previous is not None:
+            previous.close()
+    return session
+
+
+def get_session(retry=True):
+    """
+    Restituisce la sessione HTTP condivisa da tutti gli analyzer.
+    I pool di connessioni vivono per tutta la durata del processo.
+    Con retry=False la sessione non ritenta nulla: ogni chiamata è una
+    sola richiesta.
+    """
+    global _session, _plain_session
+    if retry:
+        if _session is None:
+            with _lock:
+                if _session is None:
+                    _session = _build_session(POOL_CONNECTIONS, POOL_MAXSIZE, RETRIES, BACKOFF)
+        return _session
+    if _plain_session is None:
+        with _lock:
+            if _plain_session is None:
+                _plain_session = _build_session(POOL_CONNECTIONS, POOL_MAXSIZE, 0, BACKOFF)
+    return _plain_session
+
+
+def _timed(method, url, kwargs):
+    kwargs.setdefault('timeout', DEFAULT_TIMEOUT)
+    retry = kwargs.pop('retry', True)
+    start = time.perf_counter()
+    status = 0
+    try:
+        resp = get_session(retry).request(method, url, **kwargs)
+        status = resp.status_code
+        return resp
+    finally:
+        # con stream=True misura fino agli header, non il download del corpo
+        metrics.observe_request(method, url, time.perf_counter() - start, status)
+
+
+def get(url, **kwargs):
+    kwargs.setdefault('allow_redirects', True)
+    return _timed('GET', url, kwargs)
+
+
+def head(url, **kwargs):
+    kwargs.setdefault('allow_redirects', False)
+    return _timed('HEAD', url, kwargs)
+
+
+class HostLimiter:
+    """
+    Limita il numero di richieste contemporanee verso lo stesso host,
+    indipendentemente da quanti worker sono attivi in totale.
+    """
+
+    def __init__(self, per_host):
+        self.per_host = max(1, int(per_host))
+        self._semaphores = {}
+        self._lock = threading.Lock()
+
+    def _semaphore(self, url):
+        host = urlsplit(url).netloc.lower()
+        with self._lock:
+            sem = self._semaphores.get(host)
+            if sem is None:
+                sem = self._semaphores[host] = threading.BoundedSemaphore(self.per_host)
+            return sem
+
+    @contextmanager
+    def hold(self, url):
+        sem = self._semaphore(url)
+        with sem:
+            yield
@@ -0,0 +1,259 @@
+# wp_analyzer/jobs.py
+
+import os
+import uuid
+import time
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from requests.auth import HTTPBasicAuth
+from flask import Blueprint, request, jsonify
+from .content import content_inventory, snapshot_options
+from .seo import seo_items, iter_seo, SEO_WORKERS, SEO_PER_HOST
+from .utils import bounded
+
+bp = Blueprint('jobs', __name__)
+
+# Analisi in background eseguite contemporaneamente
+JOB_WORKERS = int(os.environ.get('WP_JOB_WORKERS', '2'))
+# Job conclusi conservati in memoria (i più vecchi vengono dimenticati)
+JOB_HISTORY = int(os.environ.get('WP_JOB_HISTORY', '100'))
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class Job:
+    """
+    Stato di un'analisi in background: avanzamento (done/total),
+    risultati parziali, risultato finale o errore.
+    """
+
+    def __init__(self, kind, params=None):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.params = params or {}
+        self.status = 'queued'
+        self.done = 0
+        self.total = None
+        self.partial = []
+        self.result = None
+        self.error = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self._cancel = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def check_cancelled(self):
+        if self._cancel.is_set():
+            raise JobCancelled()
+
+    def progress(self, done, total=None):
+        """
+        Aggiorna l'avanzamento; solleva JobCancelled se il job è stato annullato,
+        così le analisi si fermano al primo punto di controllo utile.
+        """
+        with self._lock:
+            self.done = done
+            if total is not None:
+                self.total = total
+        self.check_cancelled()
+
+    def add_partial(self, item, advance=True):
+        """
+        Aggiunge un risultato parziale; con advance=False non conta come
+        passo di avanzamento (quando l'avanzamento è gestito con progress).
+        """
+        with self._lock:
+            self.partial.append(item)
+            if advance:
+                self.done += 1
+        self.check_cancelled()
+
+    def to_dict(self, offset=None):
+        with self._lock:
+            data = {
+                'id': self.id,
+                'type': self.kind,
+                'status': self.status,
+                'done': self.done,
+                'total': self.total,
+                'error': self.error,
+                'created': self.created,
+                'started': self.started,
+                'finished': self.finished
+            }
+            if offset is not None:
+                data['partial'] = self.partial[offset:]
+            if self.status == 'done':
+                data['result'] = self.result
+            return data
+
+
+class JobManager:
+    """
+    Esegue i job su un pool di thread limitato e ne conserva lo stato.
+    """
+
+    def __init__(self, workers=JOB_WORKERS, history=JOB_HISTORY):
+        self.history = history
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='job')
+
+    def submit(self, kind, func, *args, params=None):
+        """
+        Accoda `func(job, *args)`; il valore restituito diventa job.result.
+        """
+        job = Job(kind, params)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._prune()
+        self._executor.submit(self._run, job, func, args)
+        return job
+
+    def _run(self, job, func, args):
+        with job._lock:
+            if job.cancelled:
+                # già segnato come annullato da cancel()
+                return
+            job.status = 'running'
+            job.started = time.time()
+        result = error = None
+        try:
+            result = func(job, *args)
+        except JobCancelled:
+            pass
+        except Exception as e:
+            error = str(e)
+        # stato finale sotto lo stesso lock di to_dict() e cancel(): un
+        # annullamento arrivato prima di questo punto vince sul risultato
+        with job._lock:
+            if error is not None:
+                job.error = error
+                job.status = 'error'
+            elif job.cancelled:
+                job.status = 'cancelled'
+            else:
+                job.result = result
+                job.status = 'done'
+            job.finished = time.time()
+
+    def _prune(self):
+        finished = [j for j in self._jobs.values() if j.finished is not None]
+        for job in finished[:max(0, len(finished) - self.history)]:
+            del self._jobs[job.id]
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list(self):
+        with self._lock:
+            return list(self._jobs.values())
+
+    def cancel(self, job_id):
+        """
+        Annulla un job: se è ancora in coda diventa subito 'cancelled',
+        se è in esecuzione si ferma al primo punto di controllo.
+        """
+        job = self.get(job_id)
+        if job is not None:
+            with job._lock:
+                job._cancel.set()
+                if job.status == 'queued':
+                    job.status = 'cancelled'
+                    job.finished = time.time()
+        return job
+
+
+manager = JobManager()
+
+
+def run_content(job, base, auth, options):
+    # avanzamento in pagine REST scaricate, un risultato parziale per gruppo
+    return content_inventory(
+        base, auth, progress=job.progress,
+        on_group=lambda group: job.add_partial(group, advance=False), **options
+    )
+
+
+def run_seo(job, base, auth, workers, per_host):
+    items = seo_items(base, auth)
+    job.progress(0, len(items))
+    result = [None] * len(items)
+    for idx, rec in iter_seo(items, auth, workers, per_host):
+        result[idx] = rec
+        job.add_partial(rec)
+    return result
+
+
+@bp.route('', methods=['POST'])
+def create_job():
+    """
+    POST JSON { type: 'content' | 'seo', url, username?, password?, incremental?, workers?, per_host? }
+    Avvia l'analisi in background e restituisce subito { id, status }.
+    """
+    data = request.json or {}
+    base = data.get('url', '').rstrip('/')
+    if not base.startswith(('http://', 'https://')):
+        base = 'https://' + base
+
+    auth = None
+    if data.get('username'):
+        auth = HTTPBasicAuth(data['username'], data.get('password', ''))
+
+    kind = data.get('type')
+    params = {'url': base}
+    if kind == 'content':
+        options = snapshot_options(base) if data.get('incremental') else {}
+        job = manager.submit(kind, run_content, base, auth, options, params=params)
+    elif kind == 'seo':
+        workers = bounded(data.get('workers'), SEO_WORKERS)
+        per_host = bounded(data.get('per_host'), SEO_PER_HOST)
+        job = manager.submit(kind, run_seo, base, auth, workers, per_host, params=params)
+    else:
+        return jsonify({'error': f"Tipo di analisi non supportato: {kind}"}), 400
+
+    return jsonify({'id': job.id, 'status': job.status}), 202
+
+
+@bp.route('', methods=['GET'])
+def list_jobs():
+    """
+    Lista dei job noti con stato e avanzamento (senza risultati).
+    """
+    return jsonify([
+        {k: v for k, v in job.to_dict().items() if k != 'result'}
+        for job in manager.list()
+    ])
+
+
+@bp.route('/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """
+    Stato di un job. Con ?offset=N include i risultati parziali dal N-esimo
+    in poi, utile per leggerli man mano; a job concluso include `result`.
+    """
+    job = manager.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Not found'}), 404
+    offset = request.args.get('offset', type=int)
+    return jsonify(job.to_dict(offset))
+
+
+@bp.route('/<job_id>', methods=['DELETE'])
+def cancel_job(job_id):
+    """
+    Annulla un job in coda o in esecuzione.
+    """
+    job = manager.cancel(job_id)
+    if job is None:
+        return jsonify({'cancelled': False}), 404
+    return jsonify({'cancelled': True, 'status': job.status})
@@ -0,0 +1,177 @@
+# wp_analyzer/latency.py
+
+import os
+import ssl
+import time
+import base64
+import socket
+import http.client
+from urllib.parse import urlsplit
+from .utils import imap_unordered
+
+# Campioni massimi per una profilazione e dimensione dei blocchi letti
+PERF_MAX_SAMPLES = int(os.environ.get('WP_PERF_MAX_SAMPLES', '100'))
+PERF_CHUNK_SIZE = 64 * 1024
+
+# Fasi misurate per ogni richiesta
+PHASES = ('dns', 'connect', 'tls', 'ttfb', 'transfer', 'total')
+PERCENTILES = (50, 90, 99)
+
+
+def _ms(start, end):
+    return round((end - start) * 1000, 2)
+
+
+def host_header(parts):
+    """
+    Valore dell'header Host per un URL già diviso: la porta compare solo se
+    non è quella di default dello schema, come per un browser.
+    """
+    host = parts.hostname or ''
+    if ':' in host:
+        host = f"[{host}]"
+    default = 443 if parts.scheme == 'https' else 80
+    if parts.port and parts.port != default:
+        host = f"{host}:{parts.port}"
+    return host
+
+
+def measure(url, auth=None, timeout=30):
+    """
+    Esegue un GET su una connessione nuova misurando separatamente
+    risoluzione DNS, connessione TCP, handshake TLS, tempo al primo byte
+    (richiesta inviata -> header ricevuti) e download del corpo.
+    Il corpo viene letto a blocchi e scartato, senza tenerlo in memoria.
+    I redirect non vengono seguiti. `auth` è una coppia (username, password).
+    """
+    parts = urlsplit(url)
+    https = parts.scheme == 'https'
+    host = parts.hostname
+    port = parts.port or (443 if https else 80)
+    path = parts.path or '/'
+    if parts.query:
+        path += '?' + parts.query
+
+    t0 = time.perf_counter()
+    family, socktype, proto, _, address = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)[0]
+    t_dns = time.perf_counter()
+
+    sock = socket.socket(family, socktype, proto)
+    sock.settimeout(timeout)
+    try:
+        sock.connect(address)
+        t_connect = time.perf_counter()
+        if https:
+            sock = ssl.create_default_context().wrap_socket(sock, server_hostname=host)
+        t_tls = time.perf_counter()
+
+        # il socket è già connesso (e cifrato): con conn.sock impostato a mano
+        # HTTPConnection metterebbe :443 nell'Host, quindi lo si passa esplicito
+        conn = http.client.HTTPConnection(host, port, timeout=timeout)
+        conn.sock = sock
+        headers = {
+            'Host': host_header(parts), 'User-Agent': 'wp-analyzer',
+            'Accept': '*/*', 'Accept-Encoding': 'gzip, deflate'
+        }
+        if auth:
+            token = base64.b64encode(f"{auth[0]}:{auth[1]}".encode()).decode()
+            headers['Authorization'] = f"Basic {token}"
+        conn.request('GET', path, headers=headers)
+        t_sent = time.perf_counter()
+        resp = conn.getresponse()
+        t_first = time.perf_counter()
+
+        size = 0
+        while True:
+            chunk = resp.read(PERF_CHUNK_SIZE)
+            if not chunk:
+                break
+            size += len(chunk)
+        t_end = time.perf_counter()
+        status = resp.status
+        location = resp.getheader('Location')
+    finally:
+        sock.close()
+
+    result = {
+        'status': status,
+        'bytes': size,
+        'dns': _ms(t0, t_dns),
+        'connect': _ms(t_dns, t_connect),
+        'tls': _ms(t_connect, t_tls),
+        'ttfb': _ms(t_sent, t_first),
+        'transfer': _ms(t_first, t_end),
+        'total': _ms(t0, t_end)
+    }
+    if location:
+        result['location'] = location
+    return result
+
+
+def percentile(values, p):
+    """
+    Percentile `p` (0-100) con interpolazione lineare tra i valori ordinati.
+    """
+    values = sorted(values)
+    if not values:
+        return None
+    k = (len(values) - 1) * p / 100
+    lo = int(k)
+    hi = min(lo + 1, len(values) - 1)
+    return round(values[lo] + (values[hi] - values[lo]) * (k - lo), 2)
+
+
+def phase_stats(runs):
+    """
+    Minimo, media, massimo e percentili di ogni fase sui campioni riusciti.
+    """
+    ok = [r for r in runs if 'error' not in r]
+    stats = {}
+    for phase in PHASES:
+        values = [r[phase] for r in ok]
+        if not values:
+            stats[phase] = None
+            continue
+        stats[phase] = {
+            'min': min(values),
+            'mean': round(sum(values) / len(values), 2),
+            'max': max(values),
+            **{f"p{p}": percentile(values, p) for p in PERCENTILES}
+        }
+    return stats
+
+
+def profile(url, auth=None, samples=10, concurrency=1, timeout=30):
+    """
+    Profila `url` con `samples` richieste, al più `concurrency` in parallelo.
+    Il primo campione viene eseguito da solo e riportato anche a parte
+    (`cold`): confrontato con le statistiche dei successivi (`warm`)
+    mostra l'effetto delle cache lato server.
+    """
+    samples = max(1, min(int(samples), PERF_MAX_SAMPLES))
+    concurrency = max(1, min(int(concurrency), samples))
+
+    def work(_):
+        try:
+            return measure(url, auth, timeout)
+        except (OSError, http.client.HTTPException) as e:
+            return {'error': str(e) or e.__class__.__name__}
+
+    runs = [work(0)]
+    runs.extend(imap_unordered(work, range(samples - 1), concurrency))
+
+    statuses = {}
+    for r in runs:
+        if 'status' in r:
+            statuses[str(r['status'])] = statuses.get(str(r['status']), 0) + 1
+    return {
+        'url': url,
+        'samples': samples,
+        'concurrency': concurrency,
+        'errors': sum(1 for r in runs if 'error' in r),
+        'status_codes': statuses,
+        'cold': runs[0],
+        'warm': phase_stats(runs[1:]),
+        'phases': phase_stats(runs),
+        'runs': runs
+    }
@@ -2,36 +2,142 @@
 
 import os
 import json
+import threading
 import subprocess
+from concurrent.futures import Future
 from flask import Blueprint, request, jsonify
+from .cache import TTLCache
 from .utils import run_lighthouse
+from .lighthouse_pool import get_pool, LH_WORKERS
 
 bp = Blueprint('lighthouse', __name__)
 
+# path allo script performance.mjs all’interno della cartella static/js
+SCRIPT_PATH = os.path.join(
+    os.path.dirname(__file__),
+    '..', 'static', 'js', 'performance.mjs'
+)
+
+FORM_FACTORS = ('mobile', 'desktop')
+THROTTLING = ('simulate', 'devtools', 'provided')
+
+# Risultati riutilizzati per LH_CACHE_TTL secondi, al massimo LH_CACHE_SIZE audit
+LH_CACHE_TTL = int(os.environ.get('WP_LH_CACHE_TTL', '3600'))
+LH_CACHE_SIZE = int(os.environ.get('WP_LH_CACHE_SIZE', '500'))
+
+_results = TTLCache(LH_CACHE_TTL, LH_CACHE_SIZE)
+_inflight = {}
+_inflight_lock = threading.Lock()
+
+def normalize_target(url):
+    url = (url or '').rstrip('/')
+    if not url.startswith(('http://', 'https://')):
+        url = 'https://' + url
+    return url
+
+def audit_async(url, form_factor='mobile', throttling='simulate', refresh=False):
+    """
+    Restituisce un Future con le metriche Lighthouse di `url`.
+    I risultati sono in cache per (url, form factor, throttling); richieste
+    identiche già in corso condividono lo stesso audit.
+    """
+    key = (url, form_factor, throttling)
+    if not refresh:
+        cached = _results.get(key)
+        if cached is not None:
+            fut = Future()
+            fut.set_result(cached)
+            return fut
+
+    with _inflight_lock:
+        fut = _inflight.get(key)
+        if fut is not None:
+            return fut
+        if LH_WORKERS > 0:
+            fut = get_pool().submit(url, form_factor=form_factor, throttling=throttling)
+        else:
+            fut = Future()
+        _inflight[key] = fut
+
+    def done(f):
+        with _inflight_lock:
+            _inflight.pop(key, None)
+        if f.exception() is None:
+            _results.set(key, f.result())
+
+    fut.add_done_callback(done)
+    if LH_WORKERS <= 0:
+        # pool disattivato: un processo node + Chrome per richiesta
+        try:
+            fut.set_result(run_lighthouse(url, SCRIPT_PATH, form_factor, throttling))
+        except Exception as e:
+            fut.set_exception(e)
+    return fut
+
+def audit_options(data):
+    """
+    Legge e valida form_factor e throttling dal body della richiesta.
+    """
+    form_factor = data.get('form_factor') or 'mobile'
+    throttling = data.get('throttling') or 'simulate'
+    if form_factor not in FORM_FACTORS:
+        raise ValueError(f"form_factor non valido: {form_factor}")
+    if throttling not in THROTTLING:
+        raise ValueError(f"throttling non valido: {throttling}")
+    return form_factor, throttling
+
+def error_message(e):
+    if isinstance(e, subprocess.CalledProcessError):
+        return (e.stderr or '').strip()
+    return str(e)
+
 @bp.route('', methods=['POST'])
 def analyze_lighthouse():
     """
     Endpoint POST /analyze/lighthouse
-    Riceve JSON { url, username?, password? } (le credenziali
-    non vengono usate da Lighthouse, ma tenute per coerenza).
+    Riceve JSON { url, username?, password?, form_factor?, throttling?, refresh? }
+    (le credenziali non vengono usate da Lighthouse, ma tenute per coerenza).
     Restituisce le metriche Lighthouse principali.
     """
     data = request.json or {}
-    url = data.get('url', '').rstrip('/')
-    if not url.startswith(('http://', 'https://')):
-        url = 'https://' + url
-
-    # path allo script performance.js all’interno della cartella static/js
-    script_path = os.path.join(
-        os.path.dirname(__file__),
-        '..', 'static', 'js', 'performance.mjs'
-    )
+    url = normalize_target(data.get('url', ''))
 
+    try:
+        form_factor, throttling = audit_options(data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
 
     try:
-        metrics = run_lighthouse(url, script_path)
+        metrics = audit_async(url, form_factor, throttling, bool(data.get('refresh'))).result()
         return jsonify(metrics)
-    except subprocess.CalledProcessError as e:
-        return jsonify({'error': e.stderr.strip()}), 500
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return jsonify({'error': error_message(e)}), 500
+
+@bp.route('/batch', methods=['POST'])
+def analyze_lighthouse_batch():
+    """
+    Endpoint POST /analyze/lighthouse/batch
+    Riceve JSON { urls: [...], form_factor?, throttling?, refresh? }
+    Distribuisce gli audit sui worker disponibili e restituisce
+    [ { url, cached, metrics } | { url, error } ] nell'ordine delle URL.
+    """
+    data = request.json or {}
+    try:
+        form_factor, throttling = audit_options(data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    urls = list(dict.fromkeys(normalize_target(u) for u in data.get('urls', []) if u))
+    refresh = bool(data.get('refresh'))
+    jobs = []
+    for url in urls:
+        cached = not refresh and _results.get((url, form_factor, throttling)) is not None
+        jobs.append((url, cached, audit_async(url, form_factor, throttling, refresh)))
+
+    result = []
+    for url, cached, fut in jobs:
+        try:
+            result.append({'url': url, 'cached': cached, 'metrics': fut.result()})
+        except Exception as e:
+            result.append({'url': url, 'error': error_message(e)})
+    return jsonify(result)
@@ -0,0 +1,165 @@
+# wp_analyzer/lighthouse_pool.py
+
+import os
+import json
+import queue
+import atexit
+import itertools
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from . import metrics
+
+WORKER_SCRIPT = os.path.join(
+    os.path.dirname(__file__), '..', 'static', 'js', 'lighthouse_worker.mjs'
+)
+
+# Audit Lighthouse contemporanei (= processi node con un Chrome caldo ciascuno)
+LH_WORKERS = int(os.environ.get('WP_LH_WORKERS', '2'))
+# Run dopo i quali ogni worker riavvia il proprio Chrome
+LH_RECYCLE_AFTER = int(os.environ.get('WP_LH_RECYCLE_AFTER', '20'))
+LH_TIMEOUT = int(os.environ.get('WP_LH_TIMEOUT', '120'))
+
+
+class LighthouseError(Exception):
+    pass
+
+
+class LighthouseWorker:
+    """
+    Un processo `node lighthouse_worker.mjs` che esegue un job alla volta.
+    Le risposte su stdout vengono lette da un thread dedicato, così ogni
+    job può avere un timeout: allo scadere il processo viene terminato e
+    riavviato al job successivo.
+    """
+
+    def __init__(self, script_path=WORKER_SCRIPT, recycle_after=LH_RECYCLE_AFTER):
+        self.script_path = script_path
+        self.recycle_after = recycle_after
+        self.proc = None
+        self._lines = None
+        self._ids = itertools.count(1)
+
+    def _start(self):
+        env = dict(os.environ, LH_RECYCLE_AFTER=str(self.recycle_after))
+        self.proc = subprocess.Popen(
+            ['node', self.script_path],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True,
+            bufsize=1,
+            env=env
+        )
+        self._lines = queue.Queue()
+        threading.Thread(
+            target=self._read, args=(self.proc.stdout, self._lines), daemon=True
+        ).start()
+
+    @staticmethod
+    def _read(stream, lines):
+        for line in stream:
+            lines.put(line)
+        lines.put(None)
+
+    def alive(self):
+        return self.proc is not None and self.proc.poll() is None
+
+    def run(self, url, timeout=LH_TIMEOUT, **options):
+        if not self.alive():
+            self._start()
+        job_id = next(self._ids)
+        try:
+            self.proc.stdin.write(json.dumps(dict(options, id=job_id, url=url)) + '\n')
+            self.proc.stdin.flush()
+        except OSError as e:
+            self.stop()
+            raise LighthouseError(f"Worker Lighthouse non disponibile: {e}")
+
+        while True:
+            try:
+                line = self._lines.get(timeout=timeout)
+            except queue.Empty:
+                self.stop()
+                raise LighthouseError(f"Timeout Lighthouse dopo {timeout}s")
+            if line is None:
+                self.stop()
+                raise LighthouseError('Worker Lighthouse terminato inaspettatamente')
+            try:
+                msg = json.loads(line)
+            except ValueError:
+                continue
+            if msg.get('id') != job_id:
+                continue
+            if not msg.get('ok'):
+                raise LighthouseError(msg.get('error') or 'Errore Lighthouse')
+            return msg['result']
+
+    def stop(self):
+        if self.proc is None:
+            return
+        try:
+            self.proc.stdin.close()
+        except OSError:
+            pass
+        try:
+            self.proc.terminate()
+            self.proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.proc.kill()
+        self.proc = None
+
+
+class LighthousePool:
+    """
+    Pool di al più `workers` worker Lighthouse persistenti.
+    I job in eccesso restano in coda finché un worker non si libera.
+    """
+
+    def __init__(self, workers=LH_WORKERS, script_path=WORKER_SCRIPT,
+                 recycle_after=LH_RECYCLE_AFTER, timeout=LH_TIMEOUT):
+        self.timeout = timeout
+        self._workers = [LighthouseWorker(script_path, recycle_after) for _ in range(workers)]
+        self._idle = queue.Queue()
+        for worker in self._workers:
+            self._idle.put(worker)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='lighthouse')
+
+    def _run(self, url, options):
+        worker = self._idle.get()
+        try:
+            with metrics.timer('lighthouse'):
+                return worker.run(url, timeout=self.timeout, **options)
+        finally:
+            self._idle.put(worker)
+
+    def submit(self, url, **options):
+        """
+        Accoda un audit e restituisce un Future con le metriche.
+        """
+        return self._executor.submit(self._run, url, options)
+
+    def run(self, url, **options):
+        return self.submit(url, **options).result()
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        for worker in self._workers:
+            worker.stop()
+
+
+_pool = None
+_lock = threading.Lock()
+
+
+def get_pool():
+    """
+    Restituisce il pool condiviso, avviato al primo utilizzo e fermato
+    all'uscita del processo.
+    """
+    global _pool
+    if _pool is None:
+        with _lock:
+            if _pool is None:
+                _pool = LighthousePool()
+                atexit.register(_pool.shutdown)
+    return _pool
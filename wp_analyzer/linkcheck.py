@@ -0,0 +1,111 @@
+# wp_analyzer/linkcheck.py
+
+import os
+from requests.exceptions import RequestException
+from . import http_client
+from .cache import TTLCache
+from .utils import imap_unordered, normalize_url
+
+# Link verificati in parallelo e limite di connessioni per host
+LINK_WORKERS = int(os.environ.get('WP_LINK_WORKERS', '32'))
+LINK_PER_HOST = int(os.environ.get('WP_LINK_PER_HOST', '16'))
+LINK_TIMEOUT = float(os.environ.get('WP_LINK_TIMEOUT', '5'))
+# Gli status restano validi per LINK_CACHE_TTL secondi tra un'analisi e l'altra
+LINK_CACHE_TTL = int(os.environ.get('WP_LINK_CACHE_TTL', '3600'))
+LINK_CACHE_SIZE = int(os.environ.get('WP_LINK_CACHE_SIZE', '100000'))
+
+# Status con cui alcuni server rifiutano HEAD pur servendo la risorsa con GET
+HEAD_REJECTED = (403, 405, 501)
+
+# Status dei link non verificabili (relativi, mailto:, tel:, ...)
+INVALID = 'invalid'
+
+_status_cache = TTLCache(LINK_CACHE_TTL, LINK_CACHE_SIZE)
+
+
+def check_link(url, timeout=LINK_TIMEOUT):
+    """
+    Restituisce lo status HTTP finale di un URL (seguendo i redirect),
+    oppure 0 in caso di errore di rete.
+    Prova con HEAD; se il server lo rifiuta ripiega su un GET di 1 byte (Range).
+    Nessun retry: un link morto costa una sola richiesta, e gli esiti
+    transitori (429, 5xx) non vengono messi in cache da check_links.
+    """
+    try:
+        resp = http_client.head(url, timeout=timeout, allow_redirects=True, retry=False)
+        resp.close()
+        status = resp.status_code
+        if status in HEAD_REJECTED:
+            resp = http_client.get(
+                url, timeout=timeout, allow_redirects=True, stream=True,
+                headers={'Range': 'bytes=0-0'}, retry=False
+            )
+            resp.close()
+            status = resp.status_code
+            # 416: range non soddisfacibile (file vuoto), ma la risorsa esiste
+            if status == 416:
+                status = 200
+        return status
+    except RequestException:
+        return 0
+
+
+def is_broken(status):
+    return status == INVALID or status == 0 or status >= 400
+
+
+def is_transient(status):
+    return status == 429 or status >= 500
+
+
+def check_links(urls, workers=LINK_WORKERS, per_host=LINK_PER_HOST, use_cache=True):
+    """
+    Verifica una lista di URL già normalizzati e deduplicati.
+    Restituisce un dict { url: status }. Gli status HTTP vengono salvati nella
+    cache condivisa; gli errori di rete, 429 e 5xx no, così un problema
+    temporaneo del server viene ricontrollato al giro dopo.
+    """
+    statuses = {}
+    todo = []
+    for url in urls:
+        cached = _status_cache.get(url) if use_cache else None
+        if cached is None:
+            todo.append(url)
+        else:
+            statuses[url] = cached
+
+    limiter = http_client.HostLimiter(per_host)
+
+    def work(url):
+        with limiter.hold(url):
+            return url, check_link(url)
+
+    for url, status in imap_unordered(work, todo, workers):
+        statuses[url] = status
+        if status and not is_transient(status):
+            _status_cache.set(url, status)
+    return statuses
+
+
+def check_groups(groups, **kwargs):
+    """
+    Estrae i link da una struttura `groups` (come quella di /analyze/content),
+    li normalizza e deduplica prima di verificarli.
+    Restituisce (link originali -> URL normalizzato, { URL normalizzato: status }).
+    I link non http(s) non vengono richiesti e risultano con status INVALID
+    (quindi broken).
+    """
+    links = {}
+    invalid = set()
+    for g in groups:
+        for it in g.get('items', []):
+            link = it.get('link')
+            if not link:
+                continue
+            norm = normalize_url(link)
+            if not norm.startswith(('http://', 'https://')):
+                invalid.add(norm)
+            links[link] = norm
+    statuses = check_links(sorted(set(links.values()) - invalid), **kwargs)
+    statuses.update(dict.fromkeys(invalid, INVALID))
+    return links, statuses
@@ -0,0 +1,270 @@
+# wp_analyzer/metrics.py
+
+import os
+import time
+import threading
+import functools
+import contextvars
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+from flask import Blueprint, Response, request, g
+from flask.json.provider import DefaultJSONProvider
+
+bp = Blueprint('metrics', __name__)
+
+# Raccolta delle metriche attiva (0 per disattivarla)
+METRICS_ENABLED = os.environ.get('WP_METRICS', '1') != '0'
+# Host distinti tracciati nelle metriche delle richieste in uscita (gli altri finiscono in "other")
+METRICS_MAX_HOSTS = int(os.environ.get('WP_METRICS_MAX_HOSTS', '1000'))
+
+# Limiti superiori (secondi) dei bucket degli istogrammi
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+class Histogram:
+    """
+    Istogramma cumulativo in formato Prometheus, con una serie per
+    ogni combinazione di etichette.
+    """
+
+    def __init__(self, name, help_text, labels, buckets=BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((k, (list(v[0]), v[1], v[2])) for k, v in self._series.items())
+        for label_values, (counts, total, count) in items:
+            labels = _labels(self.labels, label_values)
+            sep = ',' if labels else ''
+            for bound, n in zip(self.buckets, counts):
+                lines.append(f'{self.name}_bucket{{{labels}{sep}le="{bound}"}} {n}')
+            lines.append(f'{self.name}_bucket{{{labels}{sep}le="+Inf"}} {count}')
+            lines.append(f'{self.name}_sum{{{labels}}} {round(total, 6)}')
+            lines.append(f'{self.name}_count{{{labels}}} {count}')
+        return lines
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+
+class Counter:
+    def __init__(self, name, help_text, labels):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for label_values, value in items:
+            lines.append(f'{self.name}{{{_labels(self.labels, label_values)}}} {value}')
+        return lines
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values):
+    return ','.join(f'{n}="{_escape(v)}"' for n, v in zip(names, values))
+
+
+stage_seconds = Histogram(
+    'wp_stage_seconds', 'Durata delle fasi di analisi (fetch, parse, extract, serialize, ...)', ('stage',)
+)
+request_seconds = Histogram(
+    'wp_http_request_seconds', 'Latenza delle richieste HTTP verso i siti analizzati', ('host', 'method')
+)
+requests_total = Counter(
+    'wp_http_requests_total', 'Richieste HTTP verso i siti analizzati per status (0 = errore di rete)',
+    ('host', 'status')
+)
+endpoint_seconds = Histogram(
+    'wp_endpoint_seconds', 'Durata delle risposte degli endpoint /analyze/*', ('endpoint',)
+)
+METRICS = (stage_seconds, request_seconds, requests_total, endpoint_seconds)
+
+# Tempi per fase della richiesta Flask corrente, per l'header Server-Timing.
+# Il dict è condiviso con i thread dei pool (vedi utils.imap_unordered).
+_request_timings = contextvars.ContextVar('request_timings', default=None)
+_timings_lock = threading.Lock()
+_hosts = set()
+_hosts_lock = threading.Lock()
+
+
+def _record_timing(stage, elapsed):
+    timings = _request_timings.get()
+    if timings is not None:
+        with _timings_lock:
+            entry = timings.setdefault(stage, [0.0, 0])
+            entry[0] += elapsed
+            entry[1] += 1
+
+
+def observe(stage, elapsed):
+    """
+    Registra come fase `stage` una durata già misurata (ad es. la somma di
+    più tratti di un ciclo che alterna rete ed elaborazione).
+    """
+    if not METRICS_ENABLED:
+        return
+    stage_seconds.observe(elapsed, stage)
+    _record_timing(stage, elapsed)
+
+
+@contextmanager
+def timer(stage):
+    """
+    Misura un blocco di codice come fase `stage`.
+    """
+    if not METRICS_ENABLED:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(stage, time.perf_counter() - start)
+
+
+def timed(stage):
+    """
+    Decoratore: misura ogni chiamata della funzione come fase `stage`.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with timer(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _host_label(url):
+    host = urlsplit(url).netloc.lower() or 'unknown'
+    with _hosts_lock:
+        if host not in _hosts:
+            if len(_hosts) >= METRICS_MAX_HOSTS:
+                return 'other'
+            _hosts.add(host)
+    return host
+
+
+def observe_request(method, url, elapsed, status):
+    """
+    Registra una richiesta in uscita: latenza per host e conteggio per status.
+    """
+    if not METRICS_ENABLED:
+        return
+    host = _host_label(url)
+    request_seconds.observe(elapsed, host, method)
+    requests_total.inc(host, str(status))
+    _record_timing('http', elapsed)
+
+
+def server_timing(timings):
+    """
+    Valore dell'header Server-Timing: durata totale e cumulata di ogni fase.
+    """
+    return ', '.join(
+        f'{stage};dur={total * 1000:.1f};desc="{count}x"'
+        for stage, (total, count) in sorted(timings.items())
+    )
+
+
+def render():
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+
+def reset():
+    for metric in METRICS:
+        metric.clear()
+    with _hosts_lock:
+        _hosts.clear()
+
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """
+    Provider JSON di Flask che misura la serializzazione delle risposte.
+    """
+
+    def dumps(self, obj, **kwargs):
+        with timer('serialize'):
+            return super().dumps(obj, **kwargs)
+
+
+def instrument(app):
+    """
+    Attiva le metriche sull'app: serializzazione misurata e header
+    Server-Timing sulle risposte di /analyze/* (non su quelle in streaming,
+    di cui si registra solo la durata complessiva).
+    """
+    app.json = TimedJSONProvider(app)
+
+    @app.before_request
+    def start_timings():
+        if METRICS_ENABLED and request.path.startswith('/analyze/'):
+            g.metrics_start = time.perf_counter()
+            _request_timings.set({})
+
+    @app.after_request
+    def add_server_timing(response):
+        start = g.pop('metrics_start', None)
+        if start is None:
+            return response
+        endpoint = request.url_rule.rule if request.url_rule else request.path
+        if response.is_streamed:
+            # il corpo (NDJSON) viene generato dopo questo hook: niente
+            # Server-Timing, la durata si misura alla chiusura dello stream
+            response.call_on_close(lambda: endpoint_seconds.observe(time.perf_counter() - start, endpoint))
+            return response
+        elapsed = time.perf_counter() - start
+        timings = _request_timings.get() or {}
+        timings['total'] = [elapsed, 1]
+        response.headers['Server-Timing'] = server_timing(timings)
+        endpoint_seconds.observe(elapsed, endpoint)
+        return response
+
+    @app.teardown_request
+    def clear_timings(exc=None):
+        _request_timings.set(None)
+
+
+@bp.route('/metrics', methods=['GET'])
+def metrics():
+    """
+    Metriche in formato testo Prometheus.
+    """
+    return Response(render(), mimetype='text/plain; version=0.0.4')
@@ -1,8 +1,9 @@
 # wp_analyzer/performance.py
 
-import requests
-from flask import Blueprint, request, jsonify
 from requests.auth import HTTPBasicAuth
+from flask import Blueprint, request, jsonify
+from . import http_client
+from .latency import profile
 
 bp = Blueprint('performance', __name__)
 
@@ -11,6 +12,12 @@ def analyze_performance():
     """
     Analisi base di performance:
     restituisce status code, tempo di risposta e content length.
+
+    Con { samples, concurrency?, follow? } esegue invece una profilazione della
+    latenza: `samples` richieste su connessioni nuove (al più `concurrency`
+    in parallelo) con tempi di DNS, connessione, TLS, TTFB e download e i
+    percentili p50/p90/p99 di ogni fase. Con follow (default) i redirect
+    vengono risolti prima di iniziare.
     """
     data = request.json or {}
     base = data.get('url', '').rstrip('/')
@@ -21,12 +28,34 @@ def analyze_performance():
     if data.get('username'):
         auth = HTTPBasicAuth(data['username'], data.get('password', ''))
 
+    if data.get('samples'):
+        try:
+            target = base
+            if data.get('follow', True):
+                head = http_client.head(base, auth=auth, timeout=30, allow_redirects=True)
+                target = head.url or base
+            return jsonify(profile(
+                target,
+                (auth.username, auth.password) if auth else None,
+                samples=int(data['samples']),
+                concurrency=int(data.get('concurrency') or 1)
+            ))
+        except Exception as e:
+            return jsonify({'error': str(e)}), 500
+
     try:
-        resp = requests.get(base, auth=auth, timeout=30)
+        resp = http_client.get(base, auth=auth, timeout=30, stream=True)
+        try:
+            length = resp.headers.get('Content-Length')
+            if not length:
+                # corpo letto a blocchi senza tenerlo in memoria
+                length = sum(len(chunk) for chunk in resp.iter_content(64 * 1024))
+        finally:
+            resp.close()
         return jsonify({
             'status_code': resp.status_code,
             'response_time_ms': int(resp.elapsed.total_seconds() * 1000),
-            'content_length': int(resp.headers.get('Content-Length', len(resp.content)))
+            'content_length': int(length)
         })
     except Exception as e:
         return jsonify({'error': str(e)}), 500
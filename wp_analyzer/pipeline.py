@@ -0,0 +1,100 @@
+# wp_analyzer/pipeline.py
+
+import os
+from requests.auth import HTTPBasicAuth
+from flask import Blueprint, request, jsonify
+from .utils import imap_unordered, parse_html, bounded
+from .seo import seo_extract, empty_seo
+from .accessibility import accessibility_extract
+from .theme_plugin import detect_assets, merge_assets, assets_result
+from . import http_client, http_cache, metrics
+
+bp = Blueprint('pipeline', __name__)
+
+ANALYZERS = ('seo', 'accessibility', 'theme_plugin')
+
+# Pagine scaricate in parallelo e limite di connessioni per host
+PIPELINE_WORKERS = int(os.environ.get('WP_PIPELINE_WORKERS', '8'))
+PIPELINE_PER_HOST = int(os.environ.get('WP_PIPELINE_PER_HOST', '4'))
+
+def analyze_page(url, auth=None, analyzers=ANALYZERS):
+    """
+    Scarica e parsa una sola volta la pagina, poi applica gli estrattori
+    richiesti allo stesso documento. Ogni risultato ha la stessa forma
+    dell'endpoint dedicato (seo_analyze_page, /accessibility, /theme-plugin).
+    """
+    result = {'url': url}
+    try:
+        with metrics.timer('fetch'):
+            resp = http_cache.get(url, auth=auth, timeout=10)
+        resp.raise_for_status()
+    except Exception as e:
+        if 'seo' in analyzers:
+            result['seo'] = empty_seo()
+        if 'accessibility' in analyzers:
+            result['accessibility'] = {'error': str(e)}
+        if 'theme_plugin' in analyzers:
+            result['theme_plugin'] = assets_result({'themes': {}, 'plugins': {}})
+        return result
+
+    if 'seo' in analyzers or 'accessibility' in analyzers:
+        soup = parse_html(resp.text)
+        if 'seo' in analyzers:
+            result['seo'] = seo_extract(soup)
+        if 'accessibility' in analyzers:
+            result['accessibility'] = accessibility_extract(soup)
+    if 'theme_plugin' in analyzers:
+        # il detector lavora sui byte, senza bisogno dell'albero
+        result['theme_plugin'] = assets_result(detect_assets([resp.content], head_budget=-1))
+    return result
+
+def analyze_pages(urls, auth=None, analyzers=ANALYZERS, workers=PIPELINE_WORKERS, per_host=PIPELINE_PER_HOST):
+    """
+    Esegue analyze_page in parallelo sulle URL, restituendo i risultati
+    nell'ordine di input.
+    """
+    limiter = http_client.HostLimiter(per_host)
+
+    def work(entry):
+        idx, url = entry
+        with limiter.hold(url):
+            return idx, analyze_page(url, auth, analyzers)
+
+    results = [None] * len(urls)
+    for idx, res in imap_unordered(work, enumerate(urls), workers):
+        results[idx] = res
+    return results
+
+@bp.route('', methods=['POST'])
+def analyze_pipeline():
+    """
+    POST JSON { url, urls?, username?, password?, analyzers?, workers?, per_host? }
+    Analizza ogni URL con SEO, accessibilità e temi/plugin scaricandola una
+    sola volta. Restituisce { pages: [ { url, seo, accessibility, theme_plugin } ],
+    theme_plugin: { themes, plugins } } con temi e plugin aggregati.
+    """
+    data = request.json or {}
+    base = data.get('url', '').rstrip('/')
+    if not base.startswith(('http://', 'https://')):
+        base = 'https://' + base
+
+    auth = None
+    if data.get('username'):
+        auth = HTTPBasicAuth(data['username'], data.get('password', ''))
+
+    urls = data.get('urls') or [base]
+    analyzers = [a for a in data.get('analyzers', ANALYZERS) if a in ANALYZERS]
+
+    pages = analyze_pages(
+        urls, auth, analyzers,
+        workers=bounded(data.get('workers'), PIPELINE_WORKERS),
+        per_host=bounded(data.get('per_host'), PIPELINE_PER_HOST)
+    )
+
+    result = {'pages': pages}
+    if 'theme_plugin' in analyzers:
+        found = {'themes': {}, 'plugins': {}}
+        for p in pages:
+            merge_assets(found, p['theme_plugin']['versions'])
+        result['theme_plugin'] = assets_result(found)
+    return jsonify(result)
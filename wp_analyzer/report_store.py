@@ -0,0 +1,237 @@
+# wp_analyzer/report_store.py
+
+import os
+import gzip
+import json
+import sqlite3
+import threading
+from datetime import datetime
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS reports (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    domain TEXT NOT NULL,
+    filename TEXT NOT NULL,
+    created TEXT NOT NULL,
+    type TEXT NOT NULL,
+    items INTEGER NOT NULL DEFAULT 0,
+    seo INTEGER NOT NULL DEFAULT 0,
+    broken INTEGER NOT NULL DEFAULT 0,
+    size INTEGER NOT NULL DEFAULT 0,
+    payload BLOB NOT NULL,
+    UNIQUE (domain, filename)
+);
+CREATE INDEX IF NOT EXISTS reports_domain_created ON reports(domain, created);
+CREATE TABLE IF NOT EXISTS report_urls (
+    report_id INTEGER NOT NULL REFERENCES reports(id) ON DELETE CASCADE,
+    url TEXT NOT NULL,
+    category TEXT,
+    status INTEGER,
+    broken INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS report_urls_url ON report_urls(url, report_id);
+CREATE INDEX IF NOT EXISTS report_urls_report ON report_urls(report_id);
+'''
+
+# Sezioni di un report che ne determinano il tipo
+SECTIONS = ('groups', 'seo', 'broken', 'performance', 'lighthouse',
+            'accessibility', 'security', 'themes', 'plugins', 'users')
+
+
+def report_datetime(filename):
+    """
+    Converte il nome file di un report (timestamp UTC con ':' sostituiti da '-')
+    in un datetime.
+    """
+    stamp = filename.replace('.json', '')
+    day, _, time_part = stamp.partition('T')
+    return datetime.fromisoformat(f"{day}T{time_part.replace('-', ':')}")
+
+
+def report_type(data):
+    present = [k for k in SECTIONS if data.get(k)]
+    return data.get('type') or ','.join(present) or 'empty'
+
+
+def report_urls(data):
+    """
+    Righe (url, categoria, status, broken) da indicizzare per un report:
+    i link dell'inventario, gli status noti (link_status) e i broken link.
+    """
+    statuses = data.get('link_status') or {}
+    broken = set(data.get('broken') or [])
+    seen = set()
+    for g in data.get('groups') or []:
+        for it in g.get('items', []):
+            url = it.get('link')
+            if url and url not in seen:
+                seen.add(url)
+                yield url, g.get('category'), statuses.get(url), int(url in broken)
+    for url in broken | set(statuses):
+        if url and url not in seen:
+            seen.add(url)
+            yield url, None, statuses.get(url), int(url in broken)
+
+
+class ReportStore:
+    """
+    Archivio dei report su SQLite: metadati indicizzati per dominio e data,
+    payload JSON compresso con gzip e indice degli URL per le ricerche
+    trasversali tra snapshot.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _db(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA foreign_keys=ON')
+            conn.executescript(SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def save(self, domain, data, filename=None):
+        """
+        Salva un report e restituisce i suoi metadati.
+        """
+        if filename is None:
+            filename = datetime.utcnow().isoformat().replace(':', '-') + '.json'
+        created = report_datetime(filename).isoformat()
+        raw = json.dumps(data, ensure_ascii=False).encode('utf-8')
+        payload = gzip.compress(raw, compresslevel=6)
+        items = sum(len(g.get('items', [])) for g in data.get('groups') or [])
+        meta = {
+            'domain': domain,
+            'filename': filename,
+            'created': created,
+            'type': report_type(data),
+            'items': items,
+            'seo': len(data.get('seo') or []),
+            'broken': len(data.get('broken') or []),
+            'size': len(raw)
+        }
+        with self._lock:
+            db = self._db()
+            cur = db.execute(
+                'INSERT INTO reports (domain, filename, created, type, items, seo, broken, size, payload)'
+                ' VALUES (:domain, :filename, :created, :type, :items, :seo, :broken, :size, :payload)',
+                dict(meta, payload=payload)
+            )
+            report_id = cur.lastrowid
+            db.executemany(
+                'INSERT INTO report_urls (report_id, url, category, status, broken) VALUES (?, ?, ?, ?, ?)',
+                ((report_id, *row) for row in report_urls(data))
+            )
+            db.commit()
+        return dict(meta, id=report_id)
+
+    def list(self, domain, limit=None, offset=0):
+        """
+        Metadati dei report di un dominio, dal più recente. Restituisce (righe, totale).
+        """
+        with self._lock:
+            db = self._db()
+            total = db.execute('SELECT COUNT(*) FROM reports WHERE domain = ?', (domain,)).fetchone()[0]
+            rows = db.execute(
+                'SELECT id, filename, created, type, items, seo, broken, size FROM reports'
+                ' WHERE domain = ? ORDER BY created DESC LIMIT ? OFFSET ?',
+                (domain, -1 if limit is None else limit, offset)
+            ).fetchall()
+        keys = ('id', 'filename', 'created', 'type', 'items', 'seo', 'broken', 'size')
+        return [dict(zip(keys, r)) for r in rows], total
+
+    def raw(self, domain, filename):
+        """
+        Payload gzip così come è salvato, oppure None.
+        """
+        with self._lock:
+            row = self._db().execute(
+                'SELECT payload FROM reports WHERE domain = ? AND filename = ?', (domain, filename)
+            ).fetchone()
+        return row[0] if row else None
+
+    def load(self, domain, filename):
+        payload = self.raw(domain, filename)
+        return None if payload is None else json.loads(gzip.decompress(payload))
+
+    def delete(self, domain, filename):
+        with self._lock:
+            db = self._db()
+            cur = db.execute('DELETE FROM reports WHERE domain = ? AND filename = ?', (domain, filename))
+            db.commit()
+        return cur.rowcount > 0
+
+    def latest(self, domain, with_groups=False):
+        """
+        (datetime, report) del report più recente del dominio; con
+        with_groups solo tra quelli che contengono un inventario.
+        """
+        query = 'SELECT filename, payload FROM reports WHERE domain = ?'
+        if with_groups:
+            query += ' AND items > 0'
+        with self._lock:
+            row = self._db().execute(query + ' ORDER BY created DESC LIMIT 1', (domain,)).fetchone()
+        if row is None:
+            return None
+        return report_datetime(row[0]), json.loads(gzip.decompress(row[1]))
+
+    def url_history(self, domain, url, status=None, broken=None, limit=None):
+        """
+        Report (dal più vecchio) in cui compare `url`, filtrabili per status
+        HTTP o per broken: ad es. il primo con status=404.
+        """
+        query = (
+            'SELECT r.filename, r.created, u.category, u.status, u.broken'
+            ' FROM report_urls u JOIN reports r ON r.id = u.report_id'
+            ' WHERE r.domain = ? AND u.url = ?'
+        )
+        args = [domain, url]
+        if status is not None:
+            query += ' AND u.status = ?'
+            args.append(status)
+        if broken is not None:
+            query += ' AND u.broken = ?'
+            args.append(int(broken))
+        query += ' ORDER BY r.created LIMIT ?'
+        args.append(-1 if limit is None else limit)
+        with self._lock:
+            rows = self._db().execute(query, args).fetchall()
+        keys = ('filename', 'created', 'category', 'status', 'broken')
+        return [dict(zip(keys, r), broken=bool(r[4])) for r in rows]
+
+    def import_directory(self, reports_dir):
+        """
+        Importa i vecchi report JSON (reports/<dominio>/<timestamp>.json).
+        I file importati vengono rinominati in .json.migrated.
+        """
+        if not os.path.isdir(reports_dir):
+            return 0
+        imported = 0
+        for domain in os.listdir(reports_dir):
+            dom_dir = os.path.join(reports_dir, domain)
+            if not os.path.isdir(dom_dir):
+                continue
+            for f in os.listdir(dom_dir):
+                if not f.endswith('.json'):
+                    continue
+                path = os.path.join(dom_dir, f)
+                try:
+                    with open(path, 'r', encoding='utf-8') as fh:
+                        data = json.load(fh)
+                    report_datetime(f)
+                except (OSError, ValueError):
+                    continue
+                if not isinstance(data, dict):
+                    continue
+                try:
+                    self.save(domain, data, filename=f)
+                except sqlite3.IntegrityError:
+                    pass
+                os.replace(path, path + '.migrated')
+                imported += 1
+        return imported
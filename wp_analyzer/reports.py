@@ -1,28 +1,58 @@
 # wp_analyzer/reports.py
 
 import os
-import json
-from datetime import datetime
-from flask import Blueprint, request, jsonify, make_response
+import zlib
+import threading
+from flask import Blueprint, request, jsonify, Response
+from .report_store import ReportStore
 
 bp = Blueprint('reports', __name__)
 
 REPORTS_DIR = os.path.join(os.path.dirname(__file__), '..', 'reports')
 os.makedirs(REPORTS_DIR, exist_ok=True)
+REPORTS_DB = os.environ.get('WP_REPORTS_DB') or os.path.join(REPORTS_DIR, 'reports.sqlite')
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_store():
+    """
+    Archivio dei report condiviso. Al primo utilizzo importa i vecchi
+    report JSON presenti in reports/<dominio>/.
+    """
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                store = ReportStore(REPORTS_DB)
+                store.import_directory(REPORTS_DIR)
+                _store = store
+    return _store
+
+def latest_snapshot(domain):
+    """
+    Restituisce (datetime, report) dell'ultimo report del dominio che contiene
+    un inventario dei contenuti (`groups`), oppure None.
+    """
+    if not domain:
+        return None
+    return get_store().latest(domain, with_groups=True)
 
 @bp.route('/<domain>', methods=['GET'])
 def list_reports(domain):
     """
-    Lista i report salvati per un dominio.
+    Lista i report salvati per un dominio, dal più recente.
+    Paginazione opzionale con ?limit=N&offset=M (totale in X-Total-Count).
     """
-    dom_dir = os.path.join(REPORTS_DIR, domain)
-    if not os.path.isdir(dom_dir):
-        return jsonify([])
-    files = sorted(os.listdir(dom_dir), reverse=True)
-    return jsonify([{
-        'filename': f,
-        'timestamp': f.replace('.json', '')
-    } for f in files])
+    limit = request.args.get('limit', type=int)
+    offset = request.args.get('offset', 0, type=int)
+    rows, total = get_store().list(domain, limit, offset)
+    resp = jsonify([
+        dict(r, timestamp=r['filename'].replace('.json', ''))
+        for r in rows
+    ])
+    resp.headers['X-Total-Count'] = str(total)
+    return resp
 
 @bp.route('/<domain>', methods=['POST'])
 def save_report(domain):
@@ -30,23 +60,34 @@ def save_report(domain):
     Salva un report JSON per un dominio.
     """
     data = request.json or {}
-    dom_dir = os.path.join(REPORTS_DIR, domain)
-    os.makedirs(dom_dir, exist_ok=True)
-    ts = datetime.utcnow().isoformat().replace(':', '-')
-    filename = f"{ts}.json"
-    path = os.path.join(dom_dir, filename)
-    with open(path, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
-    return jsonify({'saved': True, 'filename': filename})
+    meta = get_store().save(domain, data)
+    return jsonify({'saved': True, 'filename': meta['filename'], 'id': meta['id']})
+
+@bp.route('/<domain>/urls', methods=['GET'])
+def url_history(domain):
+    """
+    Storico di un URL tra gli snapshot: ?url=...&status=404 oppure &broken=1.
+    Con ?first=1 restituisce solo il primo report che soddisfa i filtri
+    (es. "quando l'URL ha restituito 404 la prima volta").
+    """
+    url = request.args.get('url', '')
+    if not url:
+        return jsonify({'error': 'url mancante'}), 400
+    status = request.args.get('status', type=int)
+    broken = request.args.get('broken')
+    broken = None if broken is None else broken.lower() in ('1', 'true')
+    first = request.args.get('first', '').lower() in ('1', 'true')
+    rows = get_store().url_history(domain, url, status, broken, limit=1 if first else None)
+    if first:
+        return jsonify(rows[0] if rows else None)
+    return jsonify(rows)
 
 @bp.route('/<domain>/<filename>', methods=['DELETE'])
 def delete_report(domain, filename):
     """
     Elimina un report specifico.
     """
-    path = os.path.join(REPORTS_DIR, domain, filename)
-    if os.path.isfile(path):
-        os.remove(path)
+    if get_store().delete(domain, filename):
         return jsonify({'deleted': True})
     else:
         return jsonify({'deleted': False}), 404
@@ -55,13 +96,23 @@ def delete_report(domain, filename):
 def download_report(domain, filename):
     """
     Scarica un report specifico come JSON.
+    Il payload compresso viene inviato così com'è ai client che accettano
+    gzip, altrimenti viene decompresso in streaming.
     """
-    path = os.path.join(REPORTS_DIR, domain, filename)
-    if not os.path.isfile(path):
+    payload = get_store().raw(domain, filename)
+    if payload is None:
         return jsonify({'error': 'Not found'}), 404
-    with open(path, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-    resp = make_response(json.dumps(data, ensure_ascii=False, indent=2))
+
+    if request.accept_encodings['gzip']:
+        resp = Response(payload, mimetype='application/json')
+        resp.headers['Content-Encoding'] = 'gzip'
+    else:
+        def generate(chunk=65536):
+            d = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            for i in range(0, len(payload), chunk):
+                yield d.decompress(payload[i:i + chunk])
+            yield d.flush()
+        resp = Response(generate(), mimetype='application/json')
+    resp.headers['Vary'] = 'Accept-Encoding'
     resp.headers['Content-Disposition'] = f'attachment; filename={filename}'
-    resp.mimetype = 'application/json'
     return resp
@@ -1,13 +1,158 @@
 # wp_analyzer/security.py
 
-import requests
-import json
-from flask import Blueprint, request, jsonify
+import os
+import ssl
+import base64
+import socket
+import http.client
+from datetime import datetime
+from urllib.parse import urlsplit
 from requests.auth import HTTPBasicAuth
-from .utils import get_tls_days
+from flask import Blueprint, request, jsonify
+from .cache import TTLCache
+from .utils import imap_unordered, bounded
+from . import http_client, metrics
 
 bp = Blueprint('security', __name__)
 
+# Domini analizzati in parallelo da /analyze/security/batch
+SECURITY_WORKERS = int(os.environ.get('WP_SECURITY_WORKERS', '16'))
+# I dati del certificato restano validi per CERT_CACHE_TTL secondi per hostname
+CERT_CACHE_TTL = int(os.environ.get('WP_CERT_CACHE_TTL', '86400'))
+CERT_CACHE_SIZE = int(os.environ.get('WP_CERT_CACHE_SIZE', '10000'))
+SECURITY_TIMEOUT = 10
+
+_certs = TTLCache(CERT_CACHE_TTL, CERT_CACHE_SIZE)
+
+
+def cert_info(cert, version=None):
+    """
+    Scadenza, emittente e soggetto di un certificato (formato getpeercert()).
+    """
+    def name(field):
+        return dict(pair for rdn in cert.get(field, ()) for pair in rdn)
+
+    return {
+        'not_after': datetime.strptime(cert['notAfter'], '%b %d %H:%M:%S %Y %Z').isoformat(),
+        'issuer': name('issuer').get('organizationName') or name('issuer').get('commonName', ''),
+        'subject': name('subject').get('commonName', ''),
+        'version': version
+    }
+
+
+def probe(url, auth=None, timeout=SECURITY_TIMEOUT):
+    """
+    HEAD su una sola connessione: con HTTPS il certificato viene letto dallo
+    stesso socket TLS usato per la richiesta. I redirect non vengono seguiti.
+    Restituisce (header, lista dei Set-Cookie, dati del certificato o None).
+    """
+    parts = urlsplit(url)
+    https = parts.scheme == 'https'
+    if https:
+        # HTTPSConnection manda Host senza la porta di default, come un browser
+        conn = http.client.HTTPSConnection(
+            parts.hostname, parts.port, timeout=timeout, context=ssl.create_default_context()
+        )
+    else:
+        conn = http.client.HTTPConnection(parts.hostname, parts.port, timeout=timeout)
+    try:
+        cert = None
+        if https:
+            with metrics.timer('tls'):
+                conn.connect()
+            cert = cert_info(conn.sock.getpeercert(), conn.sock.version())
+        headers = {'User-Agent': 'wp-analyzer'}
+        if auth is not None:
+            token = base64.b64encode(f"{auth.username}:{auth.password}".encode()).decode()
+            headers['Authorization'] = f"Basic {token}"
+        path = (parts.path or '/') + (f"?{parts.query}" if parts.query else '')
+        conn.request('HEAD', path, headers=headers)
+        resp = conn.getresponse()
+        resp.read()
+        return resp.headers, resp.headers.get_all('Set-Cookie') or [], cert
+    finally:
+        conn.close()
+
+
+def remote_cert(hostname, timeout=SECURITY_TIMEOUT):
+    """
+    Certificato servito da hostname sulla porta 443, per i siti analizzati
+    in http://; None se l'host non risponde in TLS.
+    """
+    try:
+        with metrics.timer('tls'), socket.create_connection((hostname, 443), timeout=timeout) as sock:
+            with ssl.create_default_context().wrap_socket(sock, server_hostname=hostname) as ssock:
+                return cert_info(ssock.getpeercert(), ssock.version())
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def security_headers(headers, cookies):
+    """
+    Valuta gli header di sicurezza di una risposta.
+    """
+    # HSTS
+    hsts_val = headers.get('Strict-Transport-Security', '')
+    max_age = None
+    for part in hsts_val.split(';'):
+        if 'max-age' in part:
+            max_age = part.split('=', 1)[1].strip()
+
+    return {
+        'hsts': 'Strict-Transport-Security' in headers,
+        'hsts_max_age': max_age,
+        'csp': 'Content-Security-Policy' in headers,
+        # Cookie flags
+        'http_only': sum('httponly' in c.lower() for c in cookies),
+        'cookie_secure': any('secure' in c.lower() for c in cookies),
+        'xfo': headers.get('X-Frame-Options', ''),
+        'xss': headers.get('X-XSS-Protection', ''),
+        'referrer_policy': headers.get('Referrer-Policy', ''),
+        'server_header': headers.get('Server', '')
+    }
+
+
+def scan_security(url, auth=None):
+    """
+    Header di sicurezza e certificato TLS di un URL.
+    Se il certificato dell'host è già in cache basta un HEAD sulla sessione
+    condivisa (connessione keep-alive riusata), altrimenti header e
+    certificato arrivano da un'unica connessione.
+    """
+    hostname = urlsplit(url).hostname or ''
+    cert = _certs.get(hostname)
+    if cert is not None:
+        resp = http_client.head(url, auth=auth, timeout=SECURITY_TIMEOUT)
+        headers = resp.headers
+        cookies = resp.raw.headers.getlist('Set-Cookie') if resp.raw is not None else []
+    else:
+        headers, cookies, cert = probe(url, auth)
+        if cert is None and hostname:
+            # sito in http://: la scadenza TLS si legge comunque dalla porta 443
+            cert = remote_cert(hostname)
+        if cert is not None:
+            _certs.set(hostname, cert)
+
+    result = security_headers(headers, cookies)
+    tls_days = None
+    if cert is not None:
+        tls_days = (datetime.fromisoformat(cert['not_after']) - datetime.utcnow()).days
+    result.update({
+        'tls_days': tls_days,
+        'tls_expires': cert and cert['not_after'],
+        'tls_issuer': cert and cert['issuer'],
+        'tls_version': cert and cert['version']
+    })
+    return result
+
+
+def normalize_domain(domain):
+    url = (domain or '').strip().rstrip('/')
+    if not url.startswith(('http://', 'https://')):
+        url = 'https://' + url
+    return url
+
+
 @bp.route('', methods=['POST'])
 def analyze_security():
     """
@@ -19,57 +164,42 @@ def analyze_security():
     - Server header
     """
     data = request.json or {}
-    url = data.get('url', '').rstrip('/')
-    if not url.startswith(('http://', 'https://')):
-        url = 'https://' + url
+    url = normalize_domain(data.get('url', ''))
 
     auth = None
     if data.get('username'):
         auth = HTTPBasicAuth(data['username'], data.get('password', ''))
 
     try:
-        resp = requests.head(url, auth=auth, timeout=10)
-        headers = resp.headers
+        return jsonify(scan_security(url, auth))
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 
-        # HSTS
-        hsts = 'Strict-Transport-Security' in headers
-        hsts_val = headers.get('Strict-Transport-Security', '')
-        max_age = None
-        for part in hsts_val.split(';'):
-            if 'max-age' in part:
-                max_age = part.split('=', 1)[1].strip()
+@bp.route('/batch', methods=['POST'])
+def analyze_security_batch():
+    """
+    POST JSON { domains: [...], workers? }
+    Analizza più domini in parallelo. Restituisce una lista nell'ordine
+    ricevuto con { domain, ...risultato } oppure { domain, error }:
+    l'errore di un dominio non interrompe gli altri.
+    """
+    data = request.json or {}
+    domains = data.get('domains') or []
+    if not isinstance(domains, list) or not all(isinstance(d, str) for d in domains):
+        return jsonify({'error': 'domains deve essere una lista di stringhe'}), 400
+    domains = [d for d in dict.fromkeys(domains) if d.strip()]
+    workers = bounded(data.get('workers'), SECURITY_WORKERS)
 
-        # CSP
-        csp = 'Content-Security-Policy' in headers
+    def work(entry):
+        idx, domain = entry
+        try:
+            return idx, dict(scan_security(normalize_domain(domain)), domain=domain)
+        except Exception as e:
+            # l'errore resta sul singolo dominio
+            return idx, {'domain': domain, 'error': str(e) or e.__class__.__name__}
 
-        # Cookie flags
-        raw_cookies = headers.get('Set-Cookie', '')
-        cookies = [c.strip() for c in raw_cookies.split(',') if c]
-        http_only = sum('httponly' in c.lower() for c in cookies)
-        cookie_secure = any('secure' in c.lower() for c in cookies)
-
-        # Other headers
-        xfo = headers.get('X-Frame-Options', '')
-        xss = headers.get('X-XSS-Protection', '')
-        referrer_policy = headers.get('Referrer-Policy', '')
-
-        # TLS days
-        hostname = url.split('//', 1)[-1].split('/', 1)[0]
-        tls_days = get_tls_days(hostname)
-
-        server_header = headers.get('Server', '')
-
-        return jsonify({
-            'hsts': hsts,
-            'hsts_max_age': max_age,
-            'csp': csp,
-            'http_only': http_only,
-            'cookie_secure': cookie_secure,
-            'xfo': xfo,
-            'xss': xss,
-            'referrer_policy': referrer_policy,
-            'tls_days': tls_days,
-            'server_header': server_header
-        })
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+    results = [None] * len(domains)
+    for idx, res in imap_unordered(work, enumerate(domains), workers):
+        results[idx] = res
+    return jsonify(results)
@@ -1,32 +1,40 @@
 # wp_analyzer/seo.py
 
-import requests
-from flask import Blueprint, request, jsonify
+import os
+import json
 from requests.auth import HTTPBasicAuth
-from bs4 import BeautifulSoup
-from .utils import fetch_all, compute_seo_score
+from flask import Blueprint, request, jsonify, Response, stream_with_context
+from .utils import fetch_all, compute_seo_score, imap_unordered, parse_html, bounded
+from . import http_client, http_cache, metrics
 
 bp = Blueprint('seo', __name__)
 
-def seo_analyze_page(url, auth=None):
+# Pagine analizzate in parallelo e limite di connessioni per host
+SEO_WORKERS = int(os.environ.get('WP_SEO_WORKERS', '8'))
+SEO_PER_HOST = int(os.environ.get('WP_SEO_PER_HOST', '4'))
+# Campi REST usati da seo_record
+SEO_FIELDS = 'id,title,link'
+
+def empty_seo():
     """
-    Estrae title, meta description, headings e calcola un punteggio SEO di base.
+    Risultato SEO vuoto, usato quando la pagina non è raggiungibile.
+    """
+    return {
+        'title_tag': '',
+        'meta_desc': '',
+        'headings': {},
+        'score': 0,
+        'canonical': '',
+        'og': {},
+        'twitter': {}
+    }
+
+@metrics.timed('extract')
+def seo_extract(soup):
+    """
+    Estrae title, meta description, headings, canonical, Open Graph e
+    Twitter card da un documento già parsato e calcola il punteggio SEO.
     """
-    try:
-        resp = requests.get(url, auth=auth, timeout=10)
-        resp.raise_for_status()
-    except Exception:
-        return {
-            'title_tag': '',
-            'meta_desc': '',
-            'headings': {},
-            'score': 0,
-            'canonical': '',
-            'og': {},
-            'twitter': {}
-        }
-
-    soup = BeautifulSoup(resp.text, 'html.parser')
     title_tag = soup.title.string.strip() if soup.title and soup.title.string else ''
     meta_desc = (soup.find('meta', {'name': 'description'}) or {}).get('content', '').strip()
     headings = {f'h{i}': len(soup.find_all(f'h{i}')) for i in range(1, 7)}
@@ -48,11 +56,81 @@ def seo_analyze_page(url, auth=None):
     }
     return seo
 
+def seo_analyze_page(url, auth=None):
+    """
+    Estrae title, meta description, headings e calcola un punteggio SEO di base.
+    """
+    try:
+        with metrics.timer('fetch'):
+            resp = http_cache.get(url, auth=auth, timeout=10)
+        resp.raise_for_status()
+    except Exception:
+        return empty_seo()
+
+    return seo_extract(parse_html(resp.text))
+
+def seo_record(item, seo):
+    """
+    Combina i dati REST di un contenuto con il risultato di seo_analyze_page.
+    """
+    return {
+        'id': item.get('id'),
+        'title': item.get('title', {}).get('rendered', ''),
+        'link': item.get('link', ''),
+        'title_tag': seo['title_tag'],
+        'meta_desc': seo['meta_desc'],
+        'headings': seo['headings'],
+        'score': seo['score'],
+        'canonical': seo['canonical'],
+        'og': seo['og'],
+        'twitter': seo['twitter']
+    }
+
+def seo_items(base, auth=None, limiter=None):
+    """
+    Recupera tutte le pagine e i post pubblici da analizzare.
+    `limiter` è il semaforo che limita le richieste REST (vedi fetch_all).
+    """
+    pages = fetch_all(f"{base}/wp-json/wp/v2/pages", auth, fields=SEO_FIELDS, limiter=limiter)
+    posts = fetch_all(f"{base}/wp-json/wp/v2/posts", auth, params={'status': 'publish'},
+                      fields=SEO_FIELDS, limiter=limiter)
+    return pages + posts
+
+def group_items(groups):
+    """
+    Elementi da analizzare a partire da una struttura `groups` (ad es. quella
+    di /analyze/crawl), nella forma attesa da seo_record.
+    """
+    return [
+        {'id': it.get('id'), 'title': {'rendered': it.get('title', '')}, 'link': it['link']}
+        for g in groups if g.get('category') not in ('Media Library', 'Archivi')
+        for it in g.get('items', []) if it.get('link')
+    ]
+
+def iter_seo(items, auth=None, workers=SEO_WORKERS, per_host=SEO_PER_HOST):
+    """
+    Analizza gli elementi in parallelo su `workers` thread, con al massimo
+    `per_host` richieste contemporanee verso lo stesso host.
+    Restituisce coppie (indice, record) in ordine di completamento.
+    """
+    limiter = http_client.HostLimiter(per_host)
+
+    def work(entry):
+        idx, item = entry
+        with limiter.hold(item.get('link', '')):
+            seo = seo_analyze_page(item['link'], auth)
+        return idx, seo_record(item, seo)
+
+    return imap_unordered(work, enumerate(items), workers)
+
 @bp.route('', methods=['POST'])
 def analyze_seo():
     """
-    POST JSON { url, username?, password? }
-    Restituisce una lista di oggetti SEO per ogni pagina e post pubblicato.
+    POST JSON { url, username?, password?, workers?, per_host?, format?, groups? }
+    Restituisce una lista di oggetti SEO per ogni pagina e post pubblicato
+    (oppure per gli elementi di `groups`, se indicati).
+    Con format=ndjson (o Accept: application/x-ndjson) ogni record viene
+    inviato appena pronto, una riga JSON per pagina.
     """
     data = request.json or {}
     base = data.get('url', '').rstrip('/')
@@ -63,24 +141,23 @@ def analyze_seo():
     if data.get('username'):
         auth = HTTPBasicAuth(data['username'], data.get('password', ''))
 
-    # Recupera tutte le pagine e i post pubblici
-    pages = fetch_all(f"{base}/wp-json/wp/v2/pages", auth)
-    posts = fetch_all(f"{base}/wp-json/wp/v2/posts", auth, params={'status': 'publish'})
-
-    result = []
-    for item in pages + posts:
-        seo = seo_analyze_page(item['link'], auth)
-        result.append({
-            'id': item.get('id'),
-            'title': item.get('title', {}).get('rendered', ''),
-            'link': item.get('link', ''),
-            'title_tag': seo['title_tag'],
-            'meta_desc': seo['meta_desc'],
-            'headings': seo['headings'],
-            'score': seo['score'],
-            'canonical': seo['canonical'],
-            'og': seo['og'],
-            'twitter': seo['twitter']
-        })
+    workers = bounded(data.get('workers'), SEO_WORKERS)
+    per_host = bounded(data.get('per_host'), SEO_PER_HOST)
+    stream = data.get('format') == 'ndjson' or \
+        request.accept_mimetypes.best == 'application/x-ndjson'
+
+    if data.get('groups'):
+        items = group_items(data['groups'])
+    else:
+        items = seo_items(base, auth)
+
+    if stream:
+        def generate():
+            for _, rec in iter_seo(items, auth, workers, per_host):
+                yield json.dumps(rec, ensure_ascii=False) + '\n'
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
 
+    result = [None] * len(items)
+    for idx, rec in iter_seo(items, auth, workers, per_host):
+        result[idx] = rec
     return jsonify(result)
@@ -1,17 +1,186 @@
 # wp_analyzer/theme_plugin.py
 
-import requests
-from flask import Blueprint, request, jsonify
+import os
+import re
+import time
 from requests.auth import HTTPBasicAuth
-from bs4 import BeautifulSoup
+from flask import Blueprint, request, jsonify
+from .utils import imap_unordered, bounded
+from . import http_client, http_cache, metrics
 
 bp = Blueprint('theme_plugin', __name__)
 
+# Pagine scaricate in parallelo e limite di connessioni per host
+TP_WORKERS = int(os.environ.get('WP_TP_WORKERS', '16'))
+TP_PER_HOST = int(os.environ.get('WP_TP_PER_HOST', '8'))
+# Byte letti dopo </head> prima di interrompere il download (-1 = pagina intera)
+TP_HEAD_BUDGET = int(os.environ.get('WP_TP_HEAD_BUDGET', '16384'))
+# head_budget massimo accettato nel corpo delle richieste
+TP_MAX_HEAD_BUDGET = int(os.environ.get('WP_TP_MAX_HEAD_BUDGET', '1048576'))
+CHUNK_SIZE = 16384
+
+# Valori di attributi href/src che puntano a
+# /wp-content/themes/<nome>/... o /wp-content/plugins/<nome>/...?ver=x.y,
+# anche dentro HTML escapato in JSON inline (src=\"...\/wp-content\/...);
+# i percorsi in testo, commenti o JSON fuori da href/src non contano
+ASSET_RE = re.compile(
+    rb'\b(?:href|src)\s*=\s*\\?["\']?[^"\'\s<>]*?'
+    rb'\\?/wp-content\\?/(themes|plugins)\\?/([^/\\"\'\s<>?#&]+)'
+    rb'[^"\'\s<>?]*(?:\?[^"\'\s<>]*?\bver=([\w.+-]+))?',
+    re.I
+)
+HEAD_END_RE = re.compile(rb'</head\s*>', re.I)
+# Coda del buffer tenuta tra un chunk e l'altro per non spezzare un URL
+TAIL = 512
+
+
+class AssetScanner:
+    """
+    Cerca temi e plugin nei byte di una risposta man mano che arrivano.
+    Raccoglie { nome: set(versioni) } per temi e plugin e segnala quando
+    è stato letto </head> più `head_budget` byte, così il download può
+    fermarsi.
+    """
+
+    def __init__(self, head_budget=TP_HEAD_BUDGET):
+        self.head_budget = head_budget
+        self.found = {'themes': {}, 'plugins': {}}
+        self._buf = b''
+        self._offset = 0
+        self._stop_at = None
+
+    @property
+    def done(self):
+        return self._stop_at is not None and self._offset + len(self._buf) >= self._stop_at
+
+    def feed(self, chunk, final=False):
+        start = max(0, len(self._buf) - 8)
+        buf = self._buf + chunk
+        if self._stop_at is None and self.head_budget >= 0:
+            m = HEAD_END_RE.search(buf, start)
+            if m:
+                self._stop_at = self._offset + m.end() + self.head_budget
+
+        keep = len(buf) if final else max(0, len(buf) - TAIL)
+        for m in ASSET_RE.finditer(buf):
+            if not final and m.end() == len(buf):
+                # URL forse troncato: lo rianalizza con il chunk successivo
+                keep = min(keep, m.start())
+                break
+            if m.start() >= keep:
+                break
+            kind, name, ver = m.group(1).decode(), m.group(2).decode('utf-8', 'replace'), m.group(3)
+            versions = self.found[kind].setdefault(name, set())
+            if ver:
+                versions.add(ver.decode())
+        self._offset += keep
+        self._buf = buf[keep:]
+
+    def close(self):
+        self.feed(b'', final=True)
+        return self.found
+
+
+@metrics.timed('extract')
+def detect_assets(chunks, head_budget=TP_HEAD_BUDGET):
+    """
+    Applica AssetScanner a un iterabile di chunk di byte fermandosi appena
+    possibile. Restituisce { 'themes': {nome: set}, 'plugins': {nome: set} }.
+    """
+    scanner = AssetScanner(head_budget)
+    for chunk in chunks:
+        scanner.feed(chunk)
+        if scanner.done:
+            break
+    return scanner.close()
+
+
+def fetch_assets(url, auth=None, head_budget=TP_HEAD_BUDGET):
+    """
+    Scarica una pagina in streaming e ne estrae temi e plugin,
+    chiudendo la connessione appena superato il budget dopo </head>.
+    Se la pagina è nella cache HTTP viene rivalidata: con un 304 si analizza
+    la copia su disco; le pagine lette per intero vengono salvate in cache.
+    Nelle metriche l'attesa della rete conta come `fetch` e la scansione dei
+    chunk come `extract`.
+    """
+    cache = http_cache.get_cache()
+    key = cache.key(url, auth) if cache else None
+    entry = cache.load(key) if key else None
+    headers = cache.validators(entry) if entry else {}
+
+    timings = {'fetch': 0.0, 'extract': 0.0}
+    start = time.perf_counter()
+    resp = http_client.get(url, auth=auth, timeout=10, stream=True, headers=headers)
+    timings['fetch'] += time.perf_counter() - start
+    try:
+        if entry and resp.status_code == 304:
+            cache.refresh(key, entry, resp)
+            return detect_assets([entry['body']], head_budget)
+        resp.raise_for_status()
+
+        scanner = AssetScanner(head_budget)
+        body = [] if key and cache.storable(resp) else None
+        chunks = resp.iter_content(CHUNK_SIZE)
+        complete = False
+        while True:
+            start = time.perf_counter()
+            chunk = next(chunks, None)
+            received = time.perf_counter()
+            timings['fetch'] += received - start
+            if chunk is None:
+                complete = True
+                break
+            scanner.feed(chunk)
+            timings['extract'] += time.perf_counter() - received
+            if body is not None:
+                body.append(chunk)
+            if scanner.done:
+                break
+        if complete and body is not None:
+            # pagina letta fino in fondo: può andare in cache
+            cache.store(key, url, resp.headers, b''.join(body))
+        start = time.perf_counter()
+        found = scanner.close()
+        timings['extract'] += time.perf_counter() - start
+        return found
+    finally:
+        resp.close()
+        for stage, elapsed in timings.items():
+            if elapsed:
+                metrics.observe(stage, elapsed)
+
+
+def merge_assets(target, found):
+    for kind in ('themes', 'plugins'):
+        for name, versions in found[kind].items():
+            target[kind].setdefault(name, set()).update(versions)
+    return target
+
+
+def assets_result(found):
+    """
+    Formato di risposta: liste ordinate di temi e plugin più le versioni
+    (?ver=) viste per ciascuno.
+    """
+    return {
+        'themes': sorted(found['themes']),
+        'plugins': sorted(found['plugins']),
+        'versions': {
+            kind: {name: sorted(vers) for name, vers in sorted(found[kind].items())}
+            for kind in ('themes', 'plugins')
+        }
+    }
+
+
 @bp.route('', methods=['POST'])
 def analyze_theme_plugin():
     """
     Estrae i temi e i plugin caricati nelle pagine analizzate:
-    - Scansiona link <link> e <script> per pattern /wp-content/themes/ e /wp-content/plugins/
+    - Scansiona l'HTML in streaming per pattern /wp-content/themes/ e /wp-content/plugins/
+    - Si ferma dopo </head> + head_budget byte (-1 per leggere la pagina intera,
+      al massimo TP_MAX_HEAD_BUDGET)
+    - Riporta le versioni degli asset (?ver=)
     """
     data = request.json or {}
     base = data.get('url', '').rstrip('/')
@@ -23,32 +192,24 @@ def analyze_theme_plugin():
         auth = HTTPBasicAuth(data['username'], data.get('password', ''))
 
     urls = data.get('urls', [base])
-    themes = set()
-    plugins = set()
+    try:
+        head_budget = int(data.get('head_budget', TP_HEAD_BUDGET))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'head_budget non valido'}), 400
+    head_budget = min(max(-1, head_budget), TP_MAX_HEAD_BUDGET)
+    limiter = http_client.HostLimiter(bounded(data.get('per_host'), TP_PER_HOST))
 
-    for u in urls:
+    def work(u):
         try:
-            resp = requests.get(u, auth=auth, timeout=10)
-            resp.raise_for_status()
-            soup = BeautifulSoup(resp.text, 'html.parser')
-            # Cerca nei tag link e script
-            for tag in soup.find_all(['link', 'script']):
-                src = tag.get('href') or tag.get('src') or ''
-                if '/wp-content/themes/' in src:
-                    # estrae il nome del tema
-                    part = src.split('/wp-content/themes/')[1]
-                    theme = part.split('/')[0]
-                    themes.add(theme)
-                if '/wp-content/plugins/' in src:
-                    # estrae il nome del plugin
-                    part = src.split('/wp-content/plugins/')[1]
-                    plugin = part.split('/')[0]
-                    plugins.add(plugin)
+            with limiter.hold(u):
+                return fetch_assets(u, auth, head_budget)
         except Exception:
             # Ignora errori su singole URL
-            continue
+            return None
+
+    found = {'themes': {}, 'plugins': {}}
+    for page in imap_unordered(work, urls, bounded(data.get('workers'), TP_WORKERS)):
+        if page:
+            merge_assets(found, page)
 
-    return jsonify({
-        'themes': sorted(themes),
-        'plugins': sorted(plugins)
-    })
+    return jsonify(assets_result(found))
@@ -1,7 +1,7 @@
 # wp_analyzer/users.py
 
-from flask import Blueprint, request, jsonify
 from requests.auth import HTTPBasicAuth
+from flask import Blueprint, request, jsonify
 from .utils import fetch_all
 
 bp = Blueprint('users', __name__)
@@ -22,7 +22,7 @@ def analyze_users():
         auth = HTTPBasicAuth(data['username'], data.get('password', ''))
 
     try:
-        users = fetch_all(f"{base}/wp-json/wp/v2/users", auth)
+        users = fetch_all(f"{base}/wp-json/wp/v2/users", auth, fields='id,name,slug')
         result = []
         for u in users:
             result.append({
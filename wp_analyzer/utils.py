@@ -1,49 +1,240 @@
 # wp_analyzer/utils.py
 
 import os
-import ssl
-import socket
 import json
 import subprocess
-from datetime import datetime
-import requests
+import contextvars
+import importlib.util
+from collections import deque
+from itertools import islice
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from urllib.parse import urlsplit, urlunsplit
+from bs4 import BeautifulSoup
+from . import http_cache, metrics
 
-def fetch_all(endpoint, auth=None, params=None):
+# Numero di pagine REST scaricate in parallelo dopo la prima (1 = sequenziale)
+FETCH_WORKERS = int(os.environ.get('WP_FETCH_WORKERS', '8'))
+# Parser HTML: lxml se installato (molto più veloce), altrimenti quello di stdlib
+HTML_PARSER = os.environ.get('WP_HTML_PARSER') or (
+    'lxml' if importlib.util.find_spec('lxml') else 'html.parser'
+)
+
+
+def _fetch_page(endpoint, auth, params, page, limiter=None):
+    """
+    Scarica una singola pagina di una collection REST.
+    I retry su errori di connessione, 429 e 5xx sono quelli della sessione
+    condivisa (http_client): qui gli errori rimasti vengono solo sollevati.
+    Con `limiter` (un semaforo) la richiesta occupa uno dei suoi posti.
+    """
+    page_params = dict(params, per_page=100, page=page)
+    with limiter or nullcontext(), metrics.timer('fetch'):
+        resp = http_cache.get(endpoint, auth=auth, params=page_params, timeout=10)
+    resp.raise_for_status()
+    return resp
+
+
+def fetch_all(endpoint, auth=None, params=None, workers=None, fields=None, transform=None, limiter=None,
+              on_page=None):
     """
     Recupera tutti gli elementi paginati da un endpoint WordPress REST API.
     Restituisce una lista di oggetti JSON.
+
+    La prima pagina viene scaricata da sola per leggere X-WP-TotalPages;
+    le pagine 2..N vengono poi scaricate in parallelo (al massimo `workers`
+    alla volta) mantenendo l'ordine delle pagine nel risultato.
+
+    `fields` (es. 'id,title,link') viene passato come _fields, così WordPress
+    restituisce solo i campi indicati. `transform` viene applicato agli
+    elementi di ogni pagina appena scaricata: in memoria restano solo i
+    valori trasformati, non gli oggetti REST completi.
+
+    `limiter` è un semaforo condiviso con altre chiamate (ad es. tutte le
+    collection di un inventario): ogni richiesta ne occupa un posto, così le
+    richieste contemporanee verso il sito restano entro un unico budget.
+
+    `on_page(done, total)` riceve gli incrementi di avanzamento: dopo la
+    prima pagina (1, pagine totali), poi (1, 0) per ogni pagina successiva.
+    Un'eccezione sollevata da on_page interrompe il download: le pagine
+    non ancora avviate vengono annullate.
     """
-    items = []
-    page = 1
     params = params.copy() if params else {}
-    while True:
-        params.update({'per_page': 100, 'page': page})
-        resp = requests.get(endpoint, auth=auth, params=params, timeout=10)
-        resp.raise_for_status()
-        data = resp.json()
-        if not data:
-            break
-        items.extend(data)
-        total_pages = int(resp.headers.get('X-WP-TotalPages', 0))
-        if page >= total_pages:
-            break
-        page += 1
+    if fields:
+        params['_fields'] = fields
+    workers = FETCH_WORKERS if workers is None else workers
+
+    def convert(data):
+        data = data or []
+        return [transform(x) for x in data] if transform else list(data)
+
+    resp = _fetch_page(endpoint, auth, params, 1, limiter)
+    items = convert(resp.json())
+    total_pages = int(resp.headers.get('X-WP-TotalPages', 0)) if items else 0
+    if on_page:
+        on_page(1, max(1, total_pages))
+    if total_pages <= 1:
+        return items
+
+    def load(page):
+        return convert(_fetch_page(endpoint, auth, params, page, limiter).json())
+
+    remaining = range(2, total_pages + 1)
+    if workers <= 1:
+        for page in remaining:
+            data = load(page)
+            if on_page:
+                on_page(1, 0)
+            if not data:
+                break
+            items.extend(data)
+        return items
+
+    workers = min(workers, len(remaining))
+    pool = ThreadPoolExecutor(max_workers=workers)
+    pages = iter(remaining)
+
+    def submit(page):
+        # ogni pagina eredita il contesto della richiesta (metriche per Server-Timing)
+        return pool.submit(contextvars.copy_context().run, load, page)
+
+    try:
+        # finestra di al più 2 * workers pagine, nell'ordine delle pagine:
+        # se on_page solleva (job annullato) le pagine non ancora richieste
+        # non partono più
+        window = deque(submit(page) for page in islice(pages, workers * 2))
+        while window:
+            items.extend(window.popleft().result())
+            if on_page:
+                on_page(1, 0)
+            page = next(pages, None)
+            if page is not None:
+                window.append(submit(page))
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
     return items
 
-def get_tls_days(hostname):
+def bounded(value, maximum):
+    """
+    Parametro numerico di una richiesta (workers, per_host, max_pages)
+    limitato a 1..maximum: il massimo configurato vale anche come default e per i
+    valori non validi, così una richiesta non può aprire thread a volontà.
+    """
+    try:
+        value = int(value or maximum)
+    except (TypeError, ValueError):
+        return maximum
+    return min(max(1, value), maximum)
+
+
+_END = object()
+
+
+def imap_unordered(func, items, workers):
     """
-    Ritorna i giorni mancanti alla scadenza del certificato TLS di un hostname.
+    Applica `func` a ogni elemento su un pool di `workers` thread e
+    restituisce i risultati man mano che sono pronti (ordine di completamento).
+    Tiene in volo al massimo 2 * workers elementi, così la memoria resta
+    costante anche su liste molto lunghe.
     """
+    workers = max(1, int(workers))
+    it = iter(items)
+    pool = ThreadPoolExecutor(max_workers=workers)
+    try:
+        pending = set()
+        for item in it:
+            pending.add(pool.submit(contextvars.copy_context().run, func, item))
+            if len(pending) >= workers * 2:
+                break
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                yield fut.result()
+                nxt = next(it, _END)
+                if nxt is not _END:
+                    pending.add(pool.submit(contextvars.copy_context().run, func, nxt))
+    finally:
+        # se il consumatore si interrompe, non avvia i lavori ancora in coda
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def run_stages(stages, workers):
+    """
+    Esegue un piccolo grafo di fasi su un pool di `workers` thread.
+    `stages` è un dict { nome: (dipendenze, func) }: ogni fase parte appena
+    sono concluse quelle da cui dipende e riceve i loro risultati come
+    argomenti, nell'ordine delle dipendenze. Restituisce (nome, risultato)
+    in ordine di completamento. Un'eccezione di una fase arriva al
+    consumatore e le fasi non ancora avviate vengono annullate.
+    """
+    waiting = dict(stages)
+    results = {}
+    done = set()
+    running = {}
+    pool = ThreadPoolExecutor(max_workers=max(1, int(workers)))
+
+    def start_ready():
+        for name, (deps, func) in list(waiting.items()):
+            if all(d in done for d in deps):
+                del waiting[name]
+                args = [results[d] for d in deps]
+                running[pool.submit(contextvars.copy_context().run, func, *args)] = name
+        # i risultati che nessuna fase in attesa usa più non vengono trattenuti
+        needed = {d for deps, _ in waiting.values() for d in deps}
+        for name in set(results) - needed:
+            del results[name]
+
     try:
-        ctx = ssl.create_default_context()
-        with socket.create_connection((hostname, 443), timeout=5) as sock:
-            with ctx.wrap_socket(sock, server_hostname=hostname) as ssock:
-                cert = ssock.getpeercert()
-        exp_str = cert.get('notAfter')
-        exp = datetime.strptime(exp_str, '%b %d %H:%M:%S %Y %Z')
-        return (exp - datetime.utcnow()).days
-    except Exception:
-        return None
+        start_ready()
+        while running:
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for fut in finished:
+                name = running.pop(fut)
+                value = fut.result()
+                done.add(name)
+                results[name] = value
+                yield name, value
+            start_ready()
+        if waiting:
+            raise ValueError(f"Dipendenze non risolte: {', '.join(waiting)}")
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def parse_html(html):
+    """
+    Parsa un documento HTML con BeautifulSoup, usando il parser più veloce
+    disponibile (HTML_PARSER).
+    """
+    with metrics.timer('parse'):
+        return BeautifulSoup(html, HTML_PARSER)
+
+
+def normalize_url(url):
+    """
+    Normalizza un URL per il confronto e la deduplica:
+    schema e host in minuscolo, senza porta di default né frammento,
+    path vuoto sostituito da '/'. Restituisce '' per valori non validi.
+    """
+    url = (url or '').strip()
+    if not url:
+        return ''
+    try:
+        parts = urlsplit(url)
+        port = parts.port
+    except ValueError:
+        return url
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or '').lower()
+    if ':' in host:
+        host = f"[{host}]"
+    if port and (scheme, port) not in (('http', 80), ('https', 443)):
+        host = f"{host}:{port}"
+    userinfo = parts.netloc.rpartition('@')[0]
+    if userinfo:
+        host = f"{userinfo}@{host}"
+    return urlunsplit((scheme, host, parts.path or '/', parts.query, ''))
+
 
 def compute_seo_score(seo):
     """
@@ -65,16 +256,20 @@ def compute_seo_score(seo):
     score += min(levels * 5, 40)
     return min(score, 100)
 
-def run_lighthouse(url, script_path):
+def run_lighthouse(url, script_path, form_factor=None, throttling=None):
     """
     Esegue lo script Node performance.js per generare metriche Lighthouse.
     Restituisce un dict con FCP, LCP, CLS, TBT, SI, TTI e punteggio.
     """
-    result = subprocess.run(
-        ['node', script_path, url],
-        capture_output=True,
-        text=True,
-        timeout=120
-    )
+    args = [url]
+    if form_factor or throttling:
+        args += [form_factor or 'mobile', throttling or '']
+    with metrics.timer('lighthouse'):
+        result = subprocess.run(
+            ['node', script_path, *args],
+            capture_output=True,
+            text=True,
+            timeout=120
+        )
     result.check_returncode()
     return json.loads(result.stdout)